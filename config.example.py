@@ -20,9 +20,138 @@ REGIONS = [
     "sa-east-1"
 ]
 
-# Políticas SSM reconhecidas como válidas
+# Políticas SSM reconhecidas pelo nome: usadas pelo enable_ssm.py e, na varredura,
+# quando o documento da policy não pode ser lido (sem iam:GetPolicyVersion)
 SSM_POLICIES = [
     'AmazonSSMManagedInstanceCore',
     'AmazonEC2RoleforSSM',
     'AmazonSSMFullAccess'
 ]
+
+# Ações que a role precisa conceder para a instância contar como SSM OK
+# (avaliadas nos documentos das policies gerenciadas, inline e da boundary; iam_policy.py)
+# SSM_REQUIRED_ACTIONS = [
+#     'ssm:UpdateInstanceInformation',
+#     'ssmmessages:CreateControlChannel',
+#     'ssmmessages:CreateDataChannel',
+#     'ssmmessages:OpenControlChannel',
+#     'ssmmessages:OpenDataChannel',
+# ]
+
+# Concorrência da varredura (scan_engine.py)
+# MAX_WORKERS: total de pares profile/região processados ao mesmo tempo
+# MAX_WORKERS_PER_ACCOUNT: limite por conta, para não estourar o rate limit
+MAX_WORKERS = 8
+MAX_WORKERS_PER_ACCOUNT = 2
+
+# Cache das consultas IAM (iam_cache.py)
+# IAM_CACHE_TTL: segundos até uma role/instance profile ser consultada de novo
+# IAM_CACHE_FILE: sqlite em data/ para reaproveitar o cache entre execuções (None = só memória)
+IAM_CACHE_TTL = 3600
+IAM_CACHE_FILE = 'iam-cache.sqlite'
+
+# Carrega o IAM de cada conta em lote (get_account_authorization_details),
+# uma vez por conta. Se a permissão não existir, volta à consulta por instância.
+IAM_PREFETCH = True
+
+# Modo --async (aiobotocore): máximo de pares profile/região em andamento
+ASYNC_CONCURRENCY = 64
+
+# Modo --incremental: segundos até uma instância sem mudanças ser reavaliada
+INCREMENTAL_MAX_AGE = 86400
+
+# Filtros aplicados pela própria API do EC2 (Filters do describe_instances)
+# INVENTORY_STATES: estados no ec2-inventory.csv (None = todos), ex: sem as terminated:
+#   ['pending', 'running', 'stopping', 'stopped', 'shutting-down']
+# INSTANCE_TAG_FILTERS: só instâncias com estas tags (inventário e missing), ex: {'Environment': ['prod']}
+INVENTORY_STATES = None
+INSTANCE_TAG_FILTERS = None
+
+# Rate limit adaptativo e retry (aws_retry.py)
+# RATE_LIMITS: requisições/s iniciais por serviço e por conta; a taxa cai a cada
+# throttling e volta a subir com os sucessos
+RATE_LIMITS = {
+    'ec2': 20.0,
+    'ssm': 10.0,
+    'iam': 10.0,
+}
+RETRY_MAX_ATTEMPTS = 8
+
+# enable_ssm.py: role e instance profile SSM compartilhados por conta
+# (criados uma vez ou reaproveitados se já existirem)
+SSM_ROLE_NAME = 'SSM-EC2-Role'
+SSM_INSTANCE_PROFILE_NAME = 'SSM-EC2-Profile'
+# Associações / attaches de policy em paralelo
+REMEDIATION_WORKERS = 8
+
+# install_ssm_via_runcommand.py: rollout do Run Command (MaxConcurrency / MaxErrors
+# do send_command, número ou porcentagem) e acompanhamento
+RUN_COMMAND_MAX_CONCURRENCY = '10%'
+RUN_COMMAND_MAX_ERRORS = '5%'
+RUN_COMMAND_TIMEOUT = 600        # segundos acompanhando os comandos
+RUN_COMMAND_POLL_INTERVAL = 15   # segundos entre consultas
+
+# Versão mínima do SSM Agent (agent_versions.py / install_ssm_via_runcommand.py):
+# '3' = agentes < 3.x (padrão); 'latest' = abaixo da versão mais nova encontrada na frota
+# para cada plataforma (atualiza a maior parte da frota a cada nova versão do agente)
+AGENT_MIN_VERSION = '3'
+# Instâncias por onda de atualização (None = todas em uma onda)
+AGENT_UPGRADE_WAVE_SIZE = None
+
+# Diretório dos CSVs, snapshot e histórico (None = data/ do projeto)
+DATA_DIR = None
+
+# Snapshot da última varredura em data/ (lido pelo enable_ssm.py e pelo
+# install_ssm_via_runcommand.py)
+SNAPSHOT_FILE = 'snapshot.sqlite'
+
+# Histórico de varreduras em data/ (history.py); None desativa
+HISTORY_FILE = 'history.sqlite'
+# Dias de histórico mantidos (None: sem limite)
+HISTORY_RETENTION_DAYS = 90
+
+# Relatório (report.py): linhas da tabela de instâncias pendentes
+REPORT_MAX_PENDING = 200
+
+# Trace das chamadas AWS e das fases dos scripts (tracing.py)
+# TRACE_FILE: JSON lines em data/, acrescentado a cada execução (None = desligado)
+# TRACE_OTLP_ENDPOINT: collector OpenTelemetry (OTLP/HTTP), ex: 'http://localhost:4318/v1/traces'
+TRACE_FILE = None
+TRACE_OTLP_ENDPOINT = None
+
+# Modo contínuo (watch.py)
+# WATCH_QUEUE_URL: fila SQS com os eventos do EventBridge (None = só reconciliação)
+# WATCH_QUEUE_PROFILE: profile com acesso à fila (None = o primeiro de PROFILES)
+# WATCH_RECONCILE_INTERVAL: segundos para reconciliar a frota inteira, um profile/região por vez
+WATCH_QUEUE_URL = None
+WATCH_QUEUE_PROFILE = None
+WATCH_RECONCILE_INTERVAL = 900
+WATCH_CONSUMERS = 4   # threads lendo a fila
+WATCH_PORT = 8765     # consulta HTTP em 127.0.0.1
+
+# Inventário pelo agregador do AWS Config (aggregator.py)
+# INVENTORY_SOURCE: 'direct' (EC2/SSM/IAM em cada conta) ou 'aggregator' (padrão de --source)
+# AGGREGATOR_NAME: nome do agregador (None = desligado)
+# AGGREGATOR_PROFILE: profile da conta do agregador (None = o primeiro de PROFILES)
+# AGGREGATOR_ACCOUNTS: account id -> profile, para profiles sem sso_account_id/role_arn no ~/.aws/config
+INVENTORY_SOURCE = 'direct'
+AGGREGATOR_NAME = None
+AGGREGATOR_PROFILE = None
+AGGREGATOR_REGION = 'us-east-1'
+AGGREGATOR_ACCOUNTS = {}
+
+# Descoberta de contas pelo AWS Organizations (org_accounts.py)
+# ORG_ROLE_NAME: role assumida em cada conta; definida, as contas ACTIVE da organização
+#   substituem PROFILES (None = usa PROFILES)
+# ORG_PROFILE: profile SSO com organizations:ListAccounts e sts:AssumeRole (None = o primeiro de PROFILES)
+# ORG_CREDENTIAL_CACHE: sqlite com as credenciais do STS, compartilhado pelos scripts
+#   (None = só memória; nome relativo = em data/). Contém credenciais temporárias:
+#   o padrão fica fora do repositório
+ORG_ROLE_NAME = None
+ORG_PROFILE = None
+ORG_EXTERNAL_ID = None
+ORG_EXCLUDE_ACCOUNTS = []        # account ids ignorados
+ORG_SESSION_DURATION = 3600      # segundos de validade das credenciais do AssumeRole
+ORG_ACCOUNTS_TTL = 3600          # segundos até listar as contas de novo
+ORG_CREDENTIAL_CACHE = '~/.cache/ssm-implementation/sts-cache.sqlite'
+ORG_CREDENTIAL_WORKERS = 8       # AssumeRole em paralelo
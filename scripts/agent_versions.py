@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Índice das versões do SSM Agent na frota e plano de atualização.
+
+O install_ssm_via_runcommand.py considerava desatualizado todo agente com
+int(version.split('.')[0]) < 3, linha a linha, sem saber quais versões a
+frota realmente tem. Aqui:
+
+- as versões (ex: 3.2.582.0) viram tuplas de inteiros com quatro partes;
+  o parse tem cache por texto, porque a frota tem poucas versões distintas
+- o índice agrupa as instâncias por (plataforma, profile, região, versão)
+- o alvo é AGENT_MIN_VERSION, por padrão '3' (agentes < 3.x, o critério
+  antigo); com 'latest', o alvo de cada plataforma passa a ser a versão mais
+  nova vista na frota
+- drift(): por plataforma, quantas instâncias estão abaixo do alvo, a mais
+  antiga e quantas versões atrás estão, em média (versões distintas da
+  frota entre a da instância e o alvo, contando o alvo)
+- plan(): os grupos desatualizados com instâncias Online (o Run Command só
+  chega a elas), dos agentes mais antigos para os mais novos e, na mesma
+  versão, dos grupos maiores para os menores
+- waves(): divide o plano em ondas de até N instâncias, já agrupadas por
+  (profile, região, plataforma) para o Dispatcher do run_command.py
+
+O índice guarda só contagens e InstanceIds por grupo; montá-lo e calcular o
+plano para dezenas de milhares de instâncias leva milissegundos, e o scan.py
+imprime o resumo a cada varredura (python3 benchmark_scan.py versoes).
+
+Uso:
+    python3 agent_versions.py                     # drift e plano da última varredura
+    python3 agent_versions.py --min-version 3.3
+    python3 agent_versions.py --min-version latest    # alvo: a versão mais nova da frota
+"""
+
+import argparse
+import functools
+import re
+import sys
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+
+VERSION_PATTERN = re.compile(r'^\s*v?(\d+(?:\.\d+)*)')
+
+# Partes comparadas (major.minor.patch.build)
+VERSION_PARTS = 4
+
+UNKNOWN = 'N/A'
+
+# Alvo padrão (o critério antigo: agentes < 3.x) e o valor que usa a versão mais nova da frota
+DEFAULT_MIN_VERSION = '3'
+LATEST = 'latest'
+
+# Grupo do plano: instâncias Online de uma versão em um profile/região/plataforma
+UpgradeBucket = namedtuple('UpgradeBucket', ['platform', 'profile', 'region', 'version', 'behind', 'instance_ids'])
+
+# Resumo de uma plataforma
+PlatformDrift = namedtuple('PlatformDrift', ['platform', 'target', 'total', 'current', 'outdated', 'unknown',
+                                             'oldest', 'mean_behind', 'versions'])
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_version(text):
+    """
+    '3.2.582.0' -> (3, 2, 582, 0); partes que faltam valem 0.
+
+    Returns:
+        tuple ou None para 'N/A', vazio ou texto sem versão
+    """
+    if not text:
+        return None
+    match = VERSION_PATTERN.match(text)
+    if not match:
+        return None
+    parts = tuple(int(part) for part in match.group(1).split('.')[:VERSION_PARTS])
+    return parts + (0,) * (VERSION_PARTS - len(parts))
+
+
+def format_version(version):
+    return '.'.join(str(part) for part in version) if version else UNKNOWN
+
+
+def configured_min_version():
+    """AGENT_MIN_VERSION do config.py (padrão DEFAULT_MIN_VERSION; LATEST: versão mais nova da frota)."""
+    try:
+        import config
+    except ImportError:
+        return DEFAULT_MIN_VERSION
+    return getattr(config, 'AGENT_MIN_VERSION', None) or DEFAULT_MIN_VERSION
+
+
+class VersionIndex:
+    """
+    Instâncias do SSM por (plataforma, profile, região, versão).
+
+    counts tem todas as instâncias; online só os InstanceIds Online, que são
+    os que entram no plano.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.online = {}
+        self._versions = None
+
+    def add(self, profile, region, instance_id, ping_status, agent_version, platform_type):
+        """Uma instância, na ordem das colunas do ssm-agent-status.csv."""
+        self.add_rows([(profile, region, instance_id, ping_status, agent_version, platform_type)])
+
+    def add_rows(self, rows):
+        """Linhas do ssm-agent-status.csv (listas, como as do scan.py)."""
+        counts, online = self.counts, self.online
+        for profile, region, instance_id, ping_status, agent_version, platform_type in rows:
+            key = (platform_type or UNKNOWN, profile, region, agent_version or UNKNOWN)
+            counts[key] = counts.get(key, 0) + 1
+            if ping_status == 'Online':
+                ids = online.get(key)
+                if ids is None:
+                    online[key] = [instance_id]
+                else:
+                    ids.append(instance_id)
+        self._versions = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Índice a partir de snapshot.AgentRecord (snapshot.load('agent'))."""
+        index = cls()
+        index.add_rows((record.profile, record.region, record.instance_id, record.ping_status,
+                        record.agent_version, record.platform_type) for record in records)
+        return index
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def _parsed(self):
+        """(plataforma, texto) -> versão (ou None), calculado uma vez por texto distinto."""
+        if self._versions is None:
+            self._versions = {(platform, text): parse_version(text) for platform, _, _, text in self.counts}
+        return self._versions
+
+    def versions(self):
+        """Plataforma -> versões conhecidas distintas, da mais antiga para a mais nova."""
+        seen = {}
+        for (platform, _), version in self._parsed().items():
+            if version:
+                seen.setdefault(platform, set()).add(version)
+        return {platform: sorted(versions) for platform, versions in seen.items()}
+
+    def targets(self, min_version=None):
+        """Plataforma -> versão alvo: min_version para todas, ou (None / LATEST) a mais nova de cada plataforma."""
+        minimum = parse_version(min_version) if min_version and min_version != LATEST else None
+        return {platform: minimum or versions[-1] for platform, versions in self.versions().items()}
+
+    def _outdated(self, min_version):
+        """(chave, versão, versões atrás) dos grupos abaixo do alvo da plataforma."""
+        targets = self.targets(min_version)
+        # Versões da frota até o alvo, mais o próprio alvo se nenhuma instância o tiver
+        ladders = {platform: [version for version in versions if version < targets[platform]] + [targets[platform]]
+                   for platform, versions in self.versions().items()}
+        behind = {}
+        for (platform, text), version in self._parsed().items():
+            if version and platform in targets and version < targets[platform]:
+                ladder = ladders[platform]
+                behind[(platform, text)] = (version, len(ladder) - bisect_right(ladder, version))
+        for key in self.counts:
+            found = behind.get((key[0], key[3]))
+            if found:
+                yield key, found[0], found[1]
+
+    def drift(self, min_version=None):
+        """
+        Resumo por plataforma.
+
+        Returns:
+            list: PlatformDrift, por plataforma
+        """
+        versions = self.versions()
+        targets = self.targets(min_version)
+        summary = {}
+        parsed = self._parsed()
+        for (platform, _, _, text), count in self.counts.items():
+            entry = summary.setdefault(platform, {'total': 0, 'unknown': 0})
+            entry['total'] += count
+            if parsed[(platform, text)] is None:
+                entry['unknown'] += count
+        outdated = {}
+        for key, version, behind in self._outdated(min_version):
+            entry = outdated.setdefault(key[0], {'count': 0, 'behind': 0, 'oldest': version})
+            count = self.counts[key]
+            entry['count'] += count
+            entry['behind'] += behind * count
+            entry['oldest'] = min(entry['oldest'], version)
+
+        result = []
+        for platform in sorted(summary):
+            total, unknown = summary[platform]['total'], summary[platform]['unknown']
+            late = outdated.get(platform, {'count': 0, 'behind': 0, 'oldest': None})
+            result.append(PlatformDrift(
+                platform, targets.get(platform), total, total - unknown - late['count'], late['count'], unknown,
+                late['oldest'], late['behind'] / late['count'] if late['count'] else 0.0,
+                len(versions.get(platform, ())),
+            ))
+        return result
+
+    def plan(self, min_version=None):
+        """
+        Grupos a atualizar, dos agentes mais antigos e dos grupos maiores primeiro.
+
+        Returns:
+            list: UpgradeBucket (só grupos com instâncias Online)
+        """
+        buckets = [UpgradeBucket(key[0], key[1], key[2], version, behind, self.online[key])
+                   for key, version, behind in self._outdated(min_version) if key in self.online]
+        buckets.sort(key=lambda bucket: (bucket.version, -len(bucket.instance_ids),
+                                         bucket.platform, bucket.profile, bucket.region))
+        return buckets
+
+    def summary(self, min_version=None, plan=None):
+        """Linhas de resumo do drift e do plano (impressas pelo scan.py); plan evita recalcular o plano."""
+        lines = []
+        for entry in self.drift(min_version):
+            line = (f"  {entry.platform}: alvo {format_version(entry.target)}, {entry.current} em dia, "
+                    f"{entry.outdated} desatualizados")
+            if entry.outdated:
+                line += f" (mais antiga {format_version(entry.oldest)}, {entry.mean_behind:.1f} versões atrás em média)"
+            if entry.unknown:
+                line += f", {entry.unknown} sem versão"
+            lines.append(line)
+        plan = self.plan(min_version) if plan is None else plan
+        if plan:
+            instances = sum(len(bucket.instance_ids) for bucket in plan)
+            lines.append(f"  Plano: {instances} instâncias Online em {len(plan)} grupos "
+                         f"(install_ssm_via_runcommand.py)")
+        return lines
+
+
+def waves(plan, size=None, limit=None):
+    """
+    Divide o plano em ondas de até `size` instâncias (size None: uma onda só).
+
+    Args:
+        plan: Saída de VersionIndex.plan()
+        size: Instâncias por onda
+        limit: Máximo de instâncias no total (rollout parcial)
+
+    Yields:
+        OrderedDict: (profile, região, plataforma) -> lista de InstanceId, como
+            group_targets do run_command.py, na ordem do plano
+    """
+    remaining = limit
+    wave, count = OrderedDict(), 0
+    for bucket in plan:
+        ids = bucket.instance_ids
+        while ids and remaining != 0:
+            take = len(ids)
+            if size:
+                take = min(take, size - count)
+            if remaining is not None:
+                take = min(take, remaining)
+                remaining -= take
+            wave.setdefault((bucket.profile, bucket.region, bucket.platform), []).extend(ids[:take])
+            ids = ids[take:]
+            count += take
+            if size and count == size:
+                yield wave
+                wave, count = OrderedDict(), 0
+    if count:
+        yield wave
+
+
+def main():
+    import snapshot
+
+    parser = argparse.ArgumentParser(description="Drift das versões do SSM Agent e plano de atualização")
+    parser.add_argument('--min-version', help="versão mínima, ou 'latest' para a mais nova da frota (padrão: AGENT_MIN_VERSION, '3')")
+    parser.add_argument('--top', type=int, default=20, help="grupos do plano listados")
+    args = parser.parse_args()
+
+    try:
+        index = VersionIndex.from_records(snapshot.load('agent'))
+    except FileNotFoundError:
+        print("❌ Execute check_ssm_agent.py (ou scan.py) primeiro!")
+        return 1
+    except snapshot.SnapshotVersionError as e:
+        print(f"❌ {str(e)}")
+        return 1
+
+    min_version = args.min_version or configured_min_version()
+    print(f"=== Versões do SSM Agent: {len(index)} instâncias ===")
+    for line in index.summary(min_version):
+        print(line)
+
+    plan = index.plan(min_version)
+    if not plan:
+        print("✅ Todos os agentes Online estão no alvo")
+        return 0
+    print(f"\n{'plataforma':<10} {'profile':<24} {'região':<16} {'versão':<14} {'atrás':>5} {'instâncias':>10}")
+    for bucket in plan[:args.top]:
+        print(f"{bucket.platform:<10} {bucket.profile:<24} {bucket.region:<16} {format_version(bucket.version):<14} "
+              f"{bucket.behind:>5} {len(bucket.instance_ids):>10}")
+    if len(plan) > args.top:
+        print(f"... e mais {len(plan) - args.top} grupos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
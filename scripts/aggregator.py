@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Inventário da frota a partir de um agregador do AWS Config (--source aggregator).
+
+A varredura direta chama EC2, SSM e IAM em cada profile × região e cresce
+linearmente com o número de contas. Um agregador do AWS Config já tem o
+estado de todas as contas e regiões; quatro consultas paginadas
+(select_aggregate_resource_config) trazem a frota inteira a partir de uma
+única conta:
+
+- AWS::EC2::Instance: estado, instance profile e tags de cada instância
+- AWS::IAM::Role: instance profiles, policies gerenciadas e inline e
+  permission boundary de cada role, que viram um IamIndex por conta (a mesma
+  classificação da varredura direta)
+- AWS::IAM::Policy: documentos das policies gerenciadas das contas (os das
+  policies da AWS são lidos do IAM na conta do agregador, uma vez por policy)
+- AWS::SSM::ManagedInstanceInventory: instâncias registradas no SSM
+  (requer o SSM Inventory ativo nas contas)
+
+O agregador identifica as contas pelo id, não pelo profile: a conta de cada
+profile vem do sso_account_id (ou role_arn) do ~/.aws/config, ou de
+AGGREGATOR_ACCOUNTS.
+Credenciais por conta só são usadas pela correção (enable_ssm.py).
+
+Requer, na conta do agregador: config:SelectAggregateResourceConfig (e
+iam:GetPolicy / iam:GetPolicyVersion para as policies da AWS; sem elas, essas
+policies valem pelo nome, como em SSM_POLICIES).
+"""
+
+import fnmatch
+import re
+
+from collectors import Ec2Instance, iter_aggregate_resources
+from iam_index import IamIndex
+
+DEFAULT_REGION = 'us-east-1'
+
+EC2_QUERY = ("SELECT resourceId, accountId, awsRegion, configuration.state.name, "
+             "configuration.iamInstanceProfile.arn, tags "
+             "WHERE resourceType = 'AWS::EC2::Instance'")
+
+ROLE_QUERY = ("SELECT resourceName, accountId, configuration.attachedManagedPolicies, "
+              "configuration.instanceProfileList, configuration.rolePolicyList, "
+              "configuration.permissionsBoundary "
+              "WHERE resourceType = 'AWS::IAM::Role'")
+POLICY_QUERY = ("SELECT accountId, configuration.arn, configuration.policyVersionList "
+                "WHERE resourceType = 'AWS::IAM::Policy'")
+
+SSM_QUERY = ("SELECT resourceId, accountId, awsRegion "
+             "WHERE resourceType = 'AWS::SSM::ManagedInstanceInventory'")
+
+ROLE_ARN_ACCOUNT = re.compile(r'^arn:aws[\w-]*:iam::(\d{12}):')
+
+
+def configured_aggregator():
+    """
+    Agregador conforme AGGREGATOR_NAME / AGGREGATOR_PROFILE / AGGREGATOR_REGION do config.py.
+
+    Returns:
+        dict: name, profile, region, accounts; None se AGGREGATOR_NAME não estiver definido
+    """
+    try:
+        import config
+    except ImportError:
+        return None
+    name = getattr(config, 'AGGREGATOR_NAME', None)
+    if not name:
+        return None
+    return {
+        'name': name,
+        'profile': getattr(config, 'AGGREGATOR_PROFILE', None) or config.PROFILES[0],
+        'region': getattr(config, 'AGGREGATOR_REGION', DEFAULT_REGION),
+        'accounts': getattr(config, 'AGGREGATOR_ACCOUNTS', None) or {},
+    }
+
+
+def profile_accounts(profiles):
+    """
+    Conta de cada profile lida do ~/.aws/config, sem resolver credenciais.
+
+    Returns:
+        dict: profile -> account id (None se o profile não tiver sso_account_id nem role_arn)
+    """
+    import botocore.session
+
+    known = botocore.session.Session().full_config.get('profiles', {})
+    accounts = {}
+    for profile in profiles:
+        settings = known.get(profile, {})
+        account = settings.get('sso_account_id')
+        if not account:
+            match = ROLE_ARN_ACCOUNT.match(settings.get('role_arn', ''))
+            account = match.group(1) if match else None
+        accounts[profile] = account
+    return accounts
+
+
+def account_profiles(profiles, overrides=None, lookup=profile_accounts):
+    """
+    Mapeia account id -> profile para os PROFILES.
+
+    Args:
+        profiles: PROFILES do config.py
+        overrides: AGGREGATOR_ACCOUNTS (account id -> profile), tem prioridade
+        lookup: Função profiles -> {profile: account id}
+
+    Returns:
+        tuple: ({account id: profile}, [profiles sem conta conhecida])
+    """
+    mapping = {account: profile for account, profile in (overrides or {}).items() if profile in profiles}
+    mapped = set(mapping.values())
+    pending = [profile for profile in profiles if profile not in mapped]
+    unknown = []
+    for profile, account in (lookup(pending) if pending else {}).items():
+        if account is None:
+            unknown.append(profile)
+        else:
+            # Profiles da mesma conta veem as mesmas instâncias: vale o primeiro
+            mapping.setdefault(account, profile)
+    return mapping, unknown
+
+
+def _in_list(column, values):
+    quoted = ', '.join("'" + value.replace("'", "''") + "'" for value in values)
+    return f" AND {column} IN ({quoted})"
+
+
+def _has_wildcard(values):
+    return any('*' in value or '?' in value for value in values)
+
+
+def filter_predicates(filters):
+    """
+    Filters do describe_instances (collectors.instance_filters) como predicados do SQL do Config.
+
+    instance-state-name vira configuration.state.name; tag:Chave vira
+    tags.tag ('Chave=valor'). Valores com curinga (* ?) não têm equivalente
+    no SQL e ficam só para matches_filters.
+    """
+    expression = ''
+    for item in filters or []:
+        name, values = item['Name'], item['Values']
+        if name == 'instance-state-name':
+            expression += _in_list('configuration.state.name', values)
+        elif name.startswith('tag:') and not _has_wildcard(values):
+            expression += _in_list('tags.tag', [f"{name[4:]}={value}" for value in values])
+    return expression
+
+
+def matches_filters(instance, filters):
+    """True se a instância (collectors.Ec2Instance) passa pelos mesmos Filters que o describe_instances aplica."""
+    for item in filters or []:
+        name, values = item['Name'], item['Values']
+        if name == 'instance-state-name':
+            if instance.state not in values:
+                return False
+        elif name == 'instance-id':
+            if instance.instance_id not in values:
+                return False
+        elif name.startswith('tag:'):
+            key = name[4:]
+            if not any(tag == key and any(fnmatch.fnmatchcase(value, pattern) for pattern in values)
+                       for tag, value in instance.tags):
+                return False
+    return True
+
+
+class AggregatorSource:
+    """
+    Consultas ao agregador, restritas às contas dos PROFILES e às REGIONS.
+
+    Args:
+        config_client: Cliente boto3 do Config na conta/região do agregador
+        aggregator_name: Nome do agregador
+        accounts: account id -> profile (account_profiles)
+        regions: REGIONS do config.py
+    """
+
+    def __init__(self, config_client, aggregator_name, accounts, regions):
+        self.client = config_client
+        self.name = aggregator_name
+        self.accounts = dict(accounts)
+        self.regions = list(regions)
+        self.queries = 0
+        self.results = 0
+
+    def _query(self, expression, regional=True):
+        expression += _in_list('accountId', sorted(self.accounts))
+        if regional:
+            expression += _in_list('awsRegion', self.regions)
+        self.queries += 1
+        for item in iter_aggregate_resources(self.client, self.name, expression):
+            self.results += 1
+            yield item
+
+    def ec2_instances(self, filters=None):
+        """
+        Instâncias nos mesmos registros da varredura direta.
+
+        Args:
+            filters: Filters do describe_instances (scan.ec2_filters): estados e
+                tags vão para o SQL e são conferidos de novo em cada item
+
+        Yields:
+            tuple: (profile, região, collectors.Ec2Instance)
+        """
+        for item in self._query(EC2_QUERY + filter_predicates(filters)):
+            configuration = item.get('configuration') or {}
+            instance = Ec2Instance(
+                item['resourceId'],
+                (configuration.get('state') or {}).get('name', 'unknown'),
+                [(tag['key'], tag.get('value', '')) for tag in item.get('tags') or []],
+                (configuration.get('iamInstanceProfile') or {}).get('arn'),
+            )
+            if not matches_filters(instance, filters):
+                continue
+            yield self.accounts[item['accountId']], item['awsRegion'], instance
+
+    def role_indexes(self):
+        """IamIndex de cada profile, montado das roles e policies registradas no Config (IAM é global)."""
+        indexes = {profile: IamIndex() for profile in self.accounts.values()}
+        for item in self._query(ROLE_QUERY, regional=False):
+            configuration = item.get('configuration') or {}
+            boundary = configuration.get('permissionsBoundary') or {}
+            indexes[self.accounts[item['accountId']]].add_role({
+                'RoleName': item['resourceName'],
+                'AttachedManagedPolicies': [{'PolicyName': policy['policyName'], 'PolicyArn': policy.get('policyArn')}
+                                            for policy in configuration.get('attachedManagedPolicies') or []],
+                'InstanceProfileList': [{'Arn': profile['arn'], 'InstanceProfileName': profile['instanceProfileName']}
+                                        for profile in configuration.get('instanceProfileList') or []],
+                'RolePolicyList': [{'PolicyName': policy['policyName'], 'PolicyDocument': policy['policyDocument']}
+                                   for policy in configuration.get('rolePolicyList') or []],
+                'PermissionsBoundary': {'PermissionsBoundaryArn': boundary.get('permissionsBoundaryArn')},
+            })
+        for item in self._query(POLICY_QUERY, regional=False):
+            configuration = item.get('configuration') or {}
+            indexes[self.accounts[item['accountId']]].add_policy({
+                'Arn': configuration['arn'],
+                'PolicyVersionList': [{'VersionId': version['versionId'], 'Document': version.get('document'),
+                                       'IsDefaultVersion': version.get('isDefaultVersion')}
+                                      for version in configuration.get('policyVersionList') or []],
+            })
+        return indexes
+
+    def ssm_instance_ids(self):
+        """
+        Instâncias com inventário do SSM.
+
+        Returns:
+            dict: (profile, região) -> set de InstanceId
+        """
+        registered = {}
+        for item in self._query(SSM_QUERY):
+            key = (self.accounts[item['accountId']], item['awsRegion'])
+            registered.setdefault(key, set()).add(item['resourceId'])
+        return registered
+
+    def summary(self):
+        return f"Agregador {self.name}: {self.queries} consultas, {self.results} itens"
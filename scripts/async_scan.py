@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Modo assíncrono (--async) da varredura, baseado em aiobotocore.
+
+Todas as chamadas EC2, SSM e IAM de todos os pares profile/região rodam em um
+único event loop, limitadas por um semáforo (ASYNC_CONCURRENCY). Cada endpoint
+tem um único cliente, e portanto um único pool de conexões, compartilhado por
+todas as unidades: (profile, região, serviço) para EC2/SSM e (profile, IAM)
+para o IAM, que é global.
+
+Comparado ao scan_engine com threads, o custo de memória por unidade em
+andamento é só o de uma coroutine, o que permite varrer centenas de pares
+profile/região ao mesmo tempo.
+
+As linhas são montadas pelas mesmas funções dos scripts síncronos e entregues
+como UnitResult na ordem PROFILES × REGIONS, então os CSVs são idênticos.
+
+Requer: pip install aiobotocore
+"""
+
+import asyncio
+import contextlib
+import functools
+import time
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import AioSession
+except ImportError:
+    AioSession = None
+
+from botocore.exceptions import ClientError
+
+from aws_retry import DEFAULT_MAX_ATTEMPTS
+from iam_index import AUTHORIZATION_FILTER, IamIndex
+from iam_policy import UNREADABLE_ERRORS, PolicyEvaluator, build_role_detail, parse_document, role_detail_from
+from scan_engine import UnitResult
+
+DEFAULT_CONCURRENCY = 64
+
+
+def available():
+    return AioSession is not None
+
+
+def configured_concurrency():
+    try:
+        import config
+    except ImportError:
+        return DEFAULT_CONCURRENCY
+    return getattr(config, 'ASYNC_CONCURRENCY', DEFAULT_CONCURRENCY)
+
+
+class AsyncClientPool:
+    """
+    Clientes aiobotocore compartilhados por endpoint.
+
+    Uma AioSession por profile (credenciais resolvidas uma vez) e um cliente
+    por (profile, região, serviço). Usado como `async with`.
+    """
+
+    def __init__(self, max_pool_connections):
+        # Sem os eventos síncronos do aws_retry: usa o retry adaptativo nativo do botocore
+        self.config = AioConfig(max_pool_connections=max_pool_connections,
+                                retries={'mode': 'adaptive', 'max_attempts': DEFAULT_MAX_ATTEMPTS})
+        self._sessions = {}
+        self._clients = {}
+        self._lock = asyncio.Lock()
+        self._stack = contextlib.AsyncExitStack()
+
+    async def __aenter__(self):
+        await self._stack.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._stack.__aexit__(*exc)
+
+    async def client(self, profile, region, service):
+        # IAM é global: um cliente por profile atende todas as regiões
+        key = (profile, None if service == 'iam' else region, service)
+        async with self._lock:
+            if key not in self._clients:
+                session = self._sessions.get(profile)
+                if session is None:
+                    session = self._sessions[profile] = AioSession(profile=profile)
+                context = session.create_client(service, region_name=region, config=self.config)
+                self._clients[key] = await self._stack.enter_async_context(context)
+            return self._clients[key]
+
+
+async def paginate(client, operation, **kwargs):
+    """Equivalente assíncrono dos coletores: produz uma página por vez."""
+    paginator = client.get_paginator(operation)
+    async for page in paginator.paginate(**kwargs):
+        yield page
+
+
+def _not_found(error):
+    return error.response.get('Error', {}).get('Code') == 'NoSuchEntity'
+
+
+class AsyncIamResolver:
+    """
+    Resolução IAM assíncrona com a mesma semântica do check_ssm_status.
+
+    O índice em lote é carregado uma vez por conta; se falhar, usa
+    get_instance_profile e as consultas de role_detail memorizadas por conta.
+    Os documentos das policies gerenciadas são lidos uma vez por ARN e
+    guardados no PolicyEvaluator. Com `cache` (IamCache, IAM_CACHE_FILE /
+    IAM_CACHE_TTL), as mesmas entradas do modo síncrono são lidas e gravadas.
+    Como na versão síncrona, só NoSuchEntity vira "sem role"/"sem policy";
+    outros erros falham a unidade e não ficam memorizados.
+    """
+
+    def __init__(self, prefetch=True, evaluator=None, cache=None):
+        self.prefetch = prefetch
+        self.evaluator = evaluator or PolicyEvaluator()
+        self.cache = cache
+        self.errors = {}
+        self._tasks = {}
+
+    def _once(self, key, coroutine_fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(coroutine_fn())
+            task.add_done_callback(functools.partial(self._forget_failed, key))
+        return task
+
+    def _forget_failed(self, key, task):
+        # Quem já esperava recebe o erro; a próxima consulta da mesma chave tenta de novo
+        if (task.cancelled() or task.exception() is not None) and self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def _cached(self, account, kind, key, fetch):
+        """Como IamCache.get, com a consulta assíncrona `fetch`; erros não são cacheados."""
+        if self.cache is None:
+            return await fetch()
+        found, value = self.cache.lookup(account, kind, key)
+        if not found:
+            value = await fetch()
+            self.cache.store(account, kind, key, value)
+        return value
+
+    async def index(self, account, iam):
+        if not self.prefetch:
+            return None
+
+        async def load():
+            try:
+                pages = [page async for page in paginate(iam, 'get_account_authorization_details', Filter=AUTHORIZATION_FILTER)]
+            except Exception as e:
+                self.errors[account] = e
+                return None
+            return IamIndex.from_pages(pages)
+
+        return await self._once((account, 'index'), load)
+
+    async def role_for_instance_profile(self, account, iam, instance_profile_arn):
+        async def fetch():
+            response = await iam.get_instance_profile(InstanceProfileName=instance_profile_arn.split('/')[-1])
+            roles = response['InstanceProfile'].get('Roles', [])
+            return roles[0]['RoleName'] if roles else None
+
+        async def load():
+            try:
+                return await self._cached(account, 'instance-profile', instance_profile_arn, fetch)
+            except ClientError as e:
+                if _not_found(e):
+                    return None
+                raise
+
+        return await self._once((account, 'instance-profile', instance_profile_arn), load)
+
+    async def role_detail(self, account, iam, role_name):
+        """iam_policy.RoleDetail da role, ou None se a role não existir."""
+        async def fetch():
+            role = (await iam.get_role(RoleName=role_name))['Role']
+            attached = (await iam.list_attached_role_policies(RoleName=role_name))['AttachedPolicies']
+            names = (await iam.list_role_policies(RoleName=role_name))['PolicyNames']
+            inline = [(await iam.get_role_policy(RoleName=role_name, PolicyName=name))['PolicyDocument']
+                      for name in names]
+            return list(build_role_detail(role, attached, inline))
+
+        async def load():
+            try:
+                return role_detail_from(await self._cached(account, 'role-detail', role_name, fetch))
+            except ClientError as e:
+                if _not_found(e):
+                    return None
+                raise
+
+        return await self._once((account, 'role-detail', role_name), load)
+
+    async def load_policies(self, iam, detail, local=None):
+        """Lê os documentos das policies gerenciadas da role que o evaluator ainda não tem."""
+        evaluator = self.evaluator
+
+        for arn in evaluator.pending(detail, local):
+            async def load(arn=arn):
+                account = arn.split(':')[4] or 'aws'
+
+                async def fetch_version():
+                    return (await iam.get_policy(PolicyArn=arn))['Policy']['DefaultVersionId']
+
+                try:
+                    version_id = await self._cached(account, 'policy-version', arn, fetch_version)
+
+                    async def fetch_document():
+                        evaluator.fetched += 1
+                        response = await iam.get_policy_version(PolicyArn=arn, VersionId=version_id)
+                        return parse_document(response['PolicyVersion']['Document'])
+
+                    document = await self._cached(account, 'policy-document', f"{arn}:{version_id}", fetch_document)
+                except ClientError as e:
+                    code = e.response.get('Error', {}).get('Code')
+                    if code == 'NoSuchEntity':
+                        evaluator.store(arn, None, None)
+                    elif code in UNREADABLE_ERRORS:
+                        evaluator.mark_unreadable(arn)
+                    else:
+                        raise
+                    return
+                evaluator.store(arn, version_id, document)
+
+            await self._once(('policy', arn), load)
+
+
+def run_units_async(profiles, regions, unit_factory, concurrency=None):
+    """
+    Executa as unidades em um único event loop.
+
+    Args:
+        profiles: Lista de profiles AWS
+        regions: Lista de regiões AWS
+        unit_factory: Recebe o AsyncClientPool e retorna a coroutine
+            unit(profile, region)
+        concurrency: Máximo de unidades em andamento (ASYNC_CONCURRENCY)
+
+    Returns:
+        list: UnitResult na ordem PROFILES × REGIONS
+    """
+    if not available():
+        raise RuntimeError("aiobotocore não está instalado (pip install aiobotocore)")
+    concurrency = max(1, concurrency or configured_concurrency())
+
+    async def runner():
+        semaphore = asyncio.Semaphore(concurrency)
+        async with AsyncClientPool(max_pool_connections=concurrency) as pool:
+            unit = unit_factory(pool)
+
+            async def run(profile, region):
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        value = await unit(profile, region)
+                    except Exception as e:
+                        return UnitResult(profile, region, None, e, time.perf_counter() - start)
+                    return UnitResult(profile, region, value, None, time.perf_counter() - start)
+
+            return await asyncio.gather(*(run(p, r) for p in profiles for r in regions))
+
+    return asyncio.run(runner())
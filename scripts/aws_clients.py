@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Pool de sessões e clientes boto3 compartilhado pelos scripts.
+
+Criar um boto3.Session carrega os modelos do botocore e resolve as
+credenciais SSO do profile; criar um cliente monta o modelo do serviço. As
+duas coisas custam centenas de milissegundos e bastante memória, e os scripts
+faziam isso a cada profile/região (o enable_ssm.py, a cada instância).
+
+O pool mantém:
+- uma sessão por profile, com as credenciais resolvidas uma única vez
+- um cliente por (profile, região, serviço); o IAM é global, então há um
+  único cliente IAM por profile
+
+Clientes boto3 são thread-safe, sessões não: a criação é serializada por
+profile e os clientes prontos são compartilhados entre as threads do
+scan_engine.
+
+O pool também mede o tempo gasto criando sessões e clientes e quantas vezes
+um cliente foi reaproveitado (summary()).
+
+Todo cliente criado pelo pool recebe o rate limiter e a política de retry de
+aws_retry.py e, com TRACE_FILE / TRACE_OTLP_ENDPOINT, o trace de tracing.py.
+
+Com ORG_ROLE_NAME, as contas vêm do AWS Organizations e as sessões usam as
+credenciais de assume-role em cache de org_accounts.py: cada script chama
+discover_accounts() no início do main() (importar o módulo não faz chamadas
+à AWS).
+"""
+
+import contextlib
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+from aws_retry import configured_retry
+from org_accounts import configured_discovery
+from tracing import configured_tracer
+
+# Conexões HTTP por cliente; deve cobrir o número de threads que usam o mesmo cliente
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+
+GLOBAL_SERVICES = {'iam'}
+
+
+class ClientPool:
+    """
+    Sessões e clientes boto3 por (profile, região, serviço).
+
+    Args:
+        session_factory: Função profile -> boto3.Session (padrão: sessão SSO do profile)
+        max_pool_connections: Conexões HTTP de cada cliente
+        retry: AdaptiveRetry registrado em cada cliente; None mantém o retry do botocore
+        tracer: Tracer registrado em cada cliente (opcional)
+    """
+
+    def __init__(self, session_factory=None, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS, retry=None,
+                 tracer=None):
+        self.session_factory = session_factory or (lambda profile: boto3.Session(profile_name=profile))
+        self.retry = retry
+        self.tracer = tracer
+        if retry:
+            # O retry nativo fica desligado: a política do AdaptiveRetry decide sozinha
+            self.config = Config(max_pool_connections=max_pool_connections,
+                                 retries={'mode': 'standard', 'total_max_attempts': 1})
+        else:
+            self.config = Config(max_pool_connections=max_pool_connections)
+        self.sessions_created = 0
+        self.clients_created = 0
+        self.reused = 0
+        self.session_time = 0.0
+        self.client_time = 0.0
+        self._sessions = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._profile_locks = {}
+
+    def _profile_lock(self, profile):
+        with self._lock:
+            return self._profile_locks.setdefault(profile, threading.Lock())
+
+    def session(self, profile):
+        """Sessão do profile, criada (e com credenciais resolvidas) só na primeira vez."""
+        with self._profile_lock(profile):
+            return self._session(profile)
+
+    def _session(self, profile):
+        session = self._sessions.get(profile)
+        if session is None:
+            start = time.perf_counter()
+            with self.phase('credentials', profile=profile):
+                session = self.session_factory(profile)
+                # Resolve as credenciais agora, uma vez por profile
+                session.get_credentials()
+            self.session_time += time.perf_counter() - start
+            self.sessions_created += 1
+            self._sessions[profile] = session
+        return session
+
+    def client(self, profile, region, service):
+        """Cliente boto3 compartilhado para (profile, região, serviço)."""
+        key = (profile, None if service in GLOBAL_SERVICES else region, service)
+        client = self._clients.get(key)
+        if client is not None:
+            self.reused += 1
+            return client
+
+        with self._profile_lock(profile):
+            client = self._clients.get(key)
+            if client is not None:
+                self.reused += 1
+                return client
+            session = self._session(profile)
+            start = time.perf_counter()
+            client = session.client(service, region_name=region, config=self.config)
+            if self.retry:
+                self.retry.register(client, profile)
+            if self.tracer:
+                self.tracer.register(client, profile)
+            self.client_time += time.perf_counter() - start
+            self.clients_created += 1
+            self._clients[key] = client
+        return client
+
+    def phase(self, name, **attributes):
+        """Mede um trecho no trace (sem efeito com o trace desligado)."""
+        if self.tracer:
+            return self.tracer.span(name, **attributes)
+        return contextlib.nullcontext()
+
+    def summary(self):
+        summary = (f"Pool AWS: {self.sessions_created} sessões ({self.session_time:.2f}s), "
+                   f"{self.clients_created} clientes ({self.client_time:.2f}s), "
+                   f"{self.reused} reutilizações")
+        if hasattr(self.session_factory, 'summary'):
+            summary += "\n" + self.session_factory.summary()
+        if self.retry:
+            summary += "\n" + self.retry.summary()
+        if self.tracer:
+            summary += "\n" + self.tracer.summary()
+        return summary
+
+
+POOL = ClientPool(retry=configured_retry(), tracer=configured_tracer())
+
+# AssumeRoleSessions da descoberta pelo Organizations (discover_accounts), ou None
+DISCOVERY = None
+_discovered = False
+_discovery_lock = threading.Lock()
+
+
+def discover_accounts(profiles=()):
+    """
+    Contas a varrer, com a descoberta pelo Organizations se ORG_ROLE_NAME estiver definido.
+
+    Na primeira chamada, com a descoberta ligada, as contas da organização
+    passam a ser os profiles e o POOL usa as credenciais de assume-role; as
+    chamadas seguintes reaproveitam o resultado.
+
+    Args:
+        profiles: PROFILES do config.py, usados com a descoberta desligada (ou se ela falhar)
+
+    Returns:
+        list: Profiles a varrer
+    """
+    global DISCOVERY, _discovered
+    with _discovery_lock:
+        if not _discovered:
+            DISCOVERY = configured_discovery()
+            if DISCOVERY:
+                POOL.session_factory = DISCOVERY
+            _discovered = True
+    return list(DISCOVERY.accounts) if DISCOVERY else list(profiles)
+
+
+def get_client(profile, region, service):
+    """Atalho para o pool compartilhado por todos os scripts."""
+    return POOL.client(profile, region, service)
+
+
+def phase(name, **attributes):
+    """Mede uma fase do main() no trace do pool compartilhado."""
+    return POOL.phase(name, **attributes)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Rate limiter adaptativo e política de retry para as chamadas AWS.
+
+Sob carga, ThrottlingException virava resultado errado: a role era marcada
+NO_SSM e depois "corrigida" pelo enable_ssm.py. Aqui cada cliente do pool
+ganha, via eventos do botocore:
+
+- before-send: um token bucket por (conta, serviço) limita a taxa de
+  requisições. A taxa cai pela metade a cada throttling e volta a subir aos
+  poucos a cada sucesso (AIMD), convergindo para o limite real da API.
+- needs-retry: decide se a tentativa falhou por erro transitório (throttling,
+  5xx, timeout/conexão) e quanto esperar (backoff exponencial com jitter).
+  Erros definitivos (AccessDenied, NoSuchEntity, validação) não são repetidos.
+- after-call: sucesso realimenta o token bucket.
+
+O retry nativo do botocore é desligado nesses clientes (total_max_attempts=1),
+para que só esta política decida. As métricas (retries, throttles, tempo de
+espera) ficam em AdaptiveRetry.summary().
+"""
+
+import random
+import threading
+import time
+
+THROTTLING_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled',
+    'RequestThrottledException', 'RequestLimitExceeded', 'TooManyRequestsException',
+    'EC2ThrottledException', 'SlowDown', 'PriorRequestNotComplete',
+}
+
+TRANSIENT_CODES = {
+    'RequestTimeout', 'RequestTimeoutException', 'InternalError', 'InternalFailure',
+    'ServiceUnavailable', 'Unavailable', 'IDPCommunicationError',
+}
+
+TRANSIENT_STATUS = {500, 502, 503, 504}
+
+# Requisições por segundo iniciais por serviço (RATE_LIMITS no config.py)
+DEFAULT_RATES = {
+    'ec2': 20.0,
+    'ssm': 10.0,
+    'iam': 10.0,
+    'sts': 10.0,
+    # SQS praticamente não tem limite de taxa; o teto só evita laços sem espera no watch.py
+    'sqs': 1000.0,
+}
+DEFAULT_RATE = 10.0
+
+DEFAULT_MAX_ATTEMPTS = 8
+BASE_DELAY = 0.25
+MAX_DELAY = 20.0
+
+
+def error_code(response):
+    """Código de erro de uma resposta (http_response, parsed) do botocore."""
+    if not response:
+        return None
+    return response[1].get('Error', {}).get('Code')
+
+
+def classify(response, caught_exception):
+    """
+    Classifica o resultado de uma tentativa.
+
+    Returns:
+        str: 'throttle', 'transient' ou None (sucesso ou erro definitivo)
+    """
+    if caught_exception is not None:
+        # Erros de conexão/timeout do botocore chegam como exceção, sem resposta
+        return 'transient'
+    if response is None:
+        return None
+    code = error_code(response)
+    if code in THROTTLING_CODES:
+        return 'throttle'
+    if code in TRANSIENT_CODES or response[0].status_code in TRANSIENT_STATUS:
+        return 'transient'
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket com taxa adaptativa (AIMD).
+
+    Args:
+        rate: Requisições por segundo iniciais (também o teto)
+        min_rate: Taxa mínima após throttlings seguidos
+    """
+
+    def __init__(self, rate, min_rate=0.5):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token; retorna os segundos esperados."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class AdaptiveRetry:
+    """
+    Registra rate limit e retry nos clientes boto3 e acumula métricas.
+
+    Args:
+        rates: Dict serviço -> requisições por segundo iniciais
+        max_attempts: Tentativas por chamada (incluindo a primeira)
+    """
+
+    def __init__(self, rates=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.max_attempts = max_attempts
+        self.retries = 0
+        self.throttles = 0
+        self.give_ups = 0
+        self.limiter_wait = 0.0
+        self.backoff_wait = 0.0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, account, service):
+        with self._lock:
+            key = (account, service)
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rates.get(service, DEFAULT_RATE))
+            return self._buckets[key]
+
+    def register(self, client, account):
+        """Conecta os handlers nos eventos do cliente (cada cliente tem seus próprios eventos)."""
+        service = client.meta.service_model.service_name
+        bucket = self.bucket(account, service)
+        events = client.meta.events
+
+        def before_send(**kwargs):
+            waited = bucket.acquire()
+            if waited:
+                with self._lock:
+                    self.limiter_wait += waited
+
+        def needs_retry(response=None, attempts=1, caught_exception=None, **kwargs):
+            kind = classify(response, caught_exception)
+            if kind is None:
+                return None
+            if kind == 'throttle':
+                bucket.on_throttle()
+            with self._lock:
+                if kind == 'throttle':
+                    self.throttles += 1
+                if attempts >= self.max_attempts:
+                    self.give_ups += 1
+                    return None
+                self.retries += 1
+                delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempts))
+                self.backoff_wait += delay
+            return delay
+
+        def after_call(http_response=None, **kwargs):
+            if http_response is not None and http_response.status_code < 400:
+                bucket.on_success()
+
+        events.register('before-send', before_send)
+        # Antes do handler de retry nativo, que fica sem efeito com total_max_attempts=1
+        events.register_first('needs-retry', needs_retry)
+        events.register('after-call', after_call)
+
+    def summary(self):
+        return (f"Retry AWS: {self.retries} retries, {self.throttles} throttles, "
+                f"{self.give_ups} desistências, espera {self.limiter_wait:.1f}s (rate limit) "
+                f"+ {self.backoff_wait:.1f}s (backoff)")
+
+
+def configured_retry():
+    """AdaptiveRetry com RATE_LIMITS / RETRY_MAX_ATTEMPTS do config.py, se definidos."""
+    try:
+        import config
+    except ImportError:
+        return AdaptiveRetry()
+    return AdaptiveRetry(
+        rates=getattr(config, 'RATE_LIMITS', None),
+        max_attempts=getattr(config, 'RETRY_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+    )
@@ -0,0 +1,847 @@
+#!/usr/bin/env python3
+"""
+Substituto local da AWS para o benchmark_suite.py.
+
+Simula EC2, SSM, IAM, o agregador do AWS Config e o Organizations de uma
+frota sintética com N contas × M regiões × K instâncias, com a mistura de
+casos que os scripts tratam: role com SSM, sem role, role sem policy SSM e
+instâncias paradas; no SSM, agentes atuais e desatualizados, Linux e Windows.
+As policies têm documentos (as da AWS em AWS_MANAGED_POLICIES; as da conta,
+inline e permission boundaries podem ser acrescentadas em StandInAWS.iam).
+
+Respostas roteirizadas (o Stubber do botocore, ou um handler de before-send
+como em tests/) bastam para testar uma chamada, mas o benchmark precisa de
+uma frota inteira com estado: attach de policy que muda a próxima
+verificação, instâncias que registram no SSM, latência e throttling por
+chamada. Por isso os clientes daqui imitam o que os scripts usam do botocore:
+- operações com os mesmos nomes e parâmetros, paginadas por MaxResults /
+  NextToken (ou Marker no IAM), uma chamada por página
+- client.meta.events com os eventos before-call, request-created,
+  before-send, needs-retry e after-call, então o rate limiter e o retry de
+  aws_retry.py (e o trace de tracing.py) rodam como em produção
+- ClientError com o código da API, inclusive throttling injetado
+  (`throttle_rate`) e propagação de instance profiles novos no EC2
+
+Cada chamada dorme `latency` segundos e é contada por serviço/operação
+(StandInAWS.calls). Nada acessa a rede.
+
+Para o watch.py há também uma fila SQS local (StandInQueue) e métodos que
+alteram a frota publicando na fila os mesmos eventos que o EventBridge
+entregaria (mudança de estado EC2, registro no SSM, associação de instance
+profile), com ou sem aviso (notify=False simula um evento perdido).
+"""
+
+import fnmatch
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import types
+from collections import Counter, deque
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+
+SSM_POLICY = 'AmazonSSMManagedInstanceCore'
+
+# Documentos (resumidos) das policies da AWS usadas pela frota
+AWS_MANAGED_POLICIES = {
+    SSM_POLICY: {'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Allow', 'Action': ['ssm:DescribeAssociation', 'ssm:GetDocument', 'ssm:UpdateInstanceInformation',
+                                       'ssm:ListInstanceAssociations'], 'Resource': '*'},
+        {'Effect': 'Allow', 'Action': ['ssmmessages:CreateControlChannel', 'ssmmessages:CreateDataChannel',
+                                       'ssmmessages:OpenControlChannel', 'ssmmessages:OpenDataChannel'],
+         'Resource': '*'},
+        {'Effect': 'Allow', 'Action': ['ec2messages:GetMessages', 'ec2messages:SendReply'], 'Resource': '*'},
+    ]},
+    'AmazonSSMFullAccess': {'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Allow', 'Action': ['ssm:*', 'ssmmessages:*', 'ec2messages:*'], 'Resource': '*'},
+    ]},
+    'CloudWatchAgentServerPolicy': {'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Allow', 'Action': ['cloudwatch:PutMetricData', 'logs:PutLogEvents'], 'Resource': '*'},
+        {'Effect': 'Allow', 'Action': 'ssm:GetParameter', 'Resource': 'arn:aws:ssm:*:*:parameter/AmazonCloudWatch-*'},
+    ]},
+    'AmazonS3ReadOnlyAccess': {'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Allow', 'Action': ['s3:Get*', 's3:List*'], 'Resource': '*'},
+    ]},
+}
+
+# Access key das credenciais do AssumeRole, seguida do account id
+ASSUMED_KEY_PREFIX = 'ASIASTANDIN'
+
+# Mistura da frota, em fração das instâncias de cada profile/região
+DEFAULT_MIX = {
+    'ok': 0.5,            # role com SSM_POLICY
+    'no_role': 0.25,      # sem instance profile
+    'non_compliant': 0.15,  # role sem policy SSM
+    'stopped': 0.1,       # parada (com role com SSM)
+}
+
+# Fração das instâncias com role SSM registradas no SSM, e das registradas com agente < 3
+REGISTERED = 0.9
+OUTDATED = 0.2
+WINDOWS = 0.1
+
+
+class FleetSpec:
+    """
+    Tamanho e composição da frota sintética.
+
+    Args:
+        accounts / regions / instances: N contas, M regiões, K instâncias por conta/região
+        mix: Frações de DEFAULT_MIX
+    """
+
+    def __init__(self, accounts, regions, instances, mix=None):
+        self.profiles = [f"account{n:03d}" for n in range(accounts)]
+        self.regions = [f"region-{n}" for n in range(regions)]
+        self.instances = instances
+        self.mix = dict(DEFAULT_MIX, **(mix or {}))
+
+    def kind(self, n):
+        """Tipo da n-ésima instância, distribuído de forma determinística conforme mix."""
+        position = (n * 0.6180339887) % 1
+        for kind, share in self.mix.items():
+            if position < share:
+                return kind
+            position -= share
+        return 'ok'
+
+
+class StandInAWS:
+    """
+    Estado de todas as contas e contadores de chamadas.
+
+    Args:
+        spec: FleetSpec
+        latency: Segundos por chamada
+        throttle_rate: Probabilidade de uma chamada responder com throttling
+        propagation: Associações recusadas antes de um instance profile novo ficar visível no EC2
+        seed: Semente do throttling
+    """
+
+    def __init__(self, spec, latency=0.0, throttle_rate=0.0, propagation=1, seed=0):
+        self.spec = spec
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.propagation = propagation
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.instances = {}
+        self.ssm = {}
+        self.iam = {}
+        self.commands = {}
+        self.event_queue = None
+        self.published = 0
+        self._by_id = {}
+        for account, profile in enumerate(spec.profiles):
+            self.iam[profile] = self._account_iam(account)
+            for region in spec.regions:
+                self._populate(profile, account, region)
+
+    def _account_iam(self, account):
+        roles = {}
+        profiles = {}
+        for n in range(3):
+            roles[f"app-ok-{n}"] = [SSM_POLICY, 'CloudWatchAgentServerPolicy']
+            profiles[f"app-ok-{n}"] = {'roles': [f"app-ok-{n}"], 'pending': 0}
+        for n in range(2):
+            roles[f"app-legacy-{n}"] = ['AmazonS3ReadOnlyAccess']
+            profiles[f"app-legacy-{n}"] = {'roles': [f"app-legacy-{n}"], 'pending': 0}
+        # policies: policies da conta (nome -> documento); inline: role -> {nome: documento};
+        # boundaries: role -> ARN da permission boundary
+        return {'account_id': f"{100000000000 + account:012d}", 'roles': roles, 'profiles': profiles,
+                'policies': {}, 'inline': {}, 'boundaries': {}}
+
+    def _populate(self, profile, account, region):
+        account_id = self.iam[profile]['account_id']
+        instances = []
+        registered = []
+        for n in range(self.spec.instances):
+            kind = self.spec.kind(n)
+            instance_id = f"i-{account:05x}{self.spec.regions.index(region):02x}{n:010x}"
+            instance = {
+                'InstanceId': instance_id,
+                'State': {'Name': 'stopped' if kind == 'stopped' else 'running'},
+                'LaunchTime': f"2026-01-{n % 28 + 1:02d}T00:00:00Z",
+                'Tags': [{'Key': 'Name', 'Value': f"{kind}-{n}"}],
+            }
+            if kind in ('ok', 'stopped'):
+                profile_name = f"app-ok-{n % 3}"
+            elif kind == 'non_compliant':
+                profile_name = f"app-legacy-{n % 2}"
+            else:
+                profile_name = None
+            if profile_name:
+                instance['IamInstanceProfile'] = {
+                    'Arn': f"arn:aws:iam::{account_id}:instance-profile/{profile_name}"}
+            instances.append(instance)
+            self._by_id[instance_id] = ((profile, region), instance)
+
+            if kind == 'ok' and (n * 0.7548776662) % 1 < REGISTERED:
+                fraction = (n * 0.5698402910) % 1
+                registered.append({
+                    'InstanceId': instance_id,
+                    'PingStatus': 'Online' if n % 17 else 'ConnectionLost',
+                    'AgentVersion': '2.3.1319.0' if fraction < OUTDATED else '3.3.40.0',
+                    'PlatformType': 'Windows' if fraction > 1 - WINDOWS else 'Linux',
+                })
+        self.instances[(profile, region)] = instances
+        self.ssm[(profile, region)] = registered
+
+    def session(self, profile):
+        """session_factory do ClientPool."""
+        return StandInSession(self, profile)
+
+    def assumed_session(self, refresh):
+        """refreshable_session do org_accounts.py: a conta vem da access key do AssumeRole."""
+        account_id = refresh()['access_key'][len(ASSUMED_KEY_PREFIX):]
+        profile = next(profile for profile, iam in self.iam.items() if iam['account_id'] == account_id)
+        return StandInSession(self, profile)
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def enable_events(self, queue_url=None):
+        """Cria a fila SQS que recebe os eventos da frota; retorna a URL."""
+        self.event_queue = StandInQueue(queue_url or f"https://sqs.{self.spec.regions[0]}.amazonaws.com/"
+                                                     f"{self.iam[self.spec.profiles[0]]['account_id']}/ssm-watch")
+        return self.event_queue.url
+
+    def publish(self, profile, region, source, detail_type, detail):
+        """Publica um evento no formato do EventBridge na fila (se houver)."""
+        if self.event_queue is None:
+            return
+        with self._lock:
+            self.published += 1
+            sequence = self.published
+        self.event_queue.put(json.dumps({
+            'version': '0', 'id': f"evt-{sequence:010d}", 'detail-type': detail_type, 'source': source,
+            'account': self.iam[profile]['account_id'], 'region': region,
+            'time': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'), 'detail': detail,
+        }))
+
+    def instance(self, instance_id):
+        return self._by_id[instance_id][1]
+
+    def instance_ids(self):
+        return list(self._by_id)
+
+    def in_ssm(self, instance_id):
+        key, _ = self._by_id[instance_id]
+        return any(item['InstanceId'] == instance_id for item in self.ssm[key])
+
+    def set_state(self, instance_id, state, notify=True):
+        """Muda o estado de uma instância (EC2 Instance State-change Notification)."""
+        (profile, region), instance = self._by_id[instance_id]
+        instance['State'] = {'Name': state}
+        if notify:
+            self.publish(profile, region, 'aws.ec2', 'EC2 Instance State-change Notification',
+                         {'instance-id': instance_id, 'state': state})
+
+    def register_ssm(self, instance_id, notify=True):
+        """Registra a instância no SSM (chamada UpdateInstanceInformation do agente, via CloudTrail)."""
+        (profile, region), _ = self._by_id[instance_id]
+        registered = self.ssm[(profile, region)]
+        with self._lock:
+            if not any(item['InstanceId'] == instance_id for item in registered):
+                registered.append({'InstanceId': instance_id, 'PingStatus': 'Online',
+                                   'AgentVersion': '3.3.40.0', 'PlatformType': 'Linux'})
+        if notify:
+            self.publish(profile, region, 'aws.ssm', 'AWS API Call via CloudTrail',
+                         {'eventSource': 'ssm.amazonaws.com', 'eventName': 'UpdateInstanceInformation',
+                          'requestParameters': {'instanceId': instance_id}})
+
+    def deregister_ssm(self, instance_id, notify=True):
+        (profile, region), _ = self._by_id[instance_id]
+        key = (profile, region)
+        with self._lock:
+            self.ssm[key] = [item for item in self.ssm[key] if item['InstanceId'] != instance_id]
+        if notify:
+            self.publish(profile, region, 'aws.ssm', 'AWS API Call via CloudTrail',
+                         {'eventSource': 'ssm.amazonaws.com', 'eventName': 'DeregisterManagedInstance',
+                          'requestParameters': {'instanceId': instance_id}})
+
+    def missing(self):
+        """Instâncias running fora do SSM, por (profile, região): o resultado esperado."""
+        result = {}
+        for key, instances in self.instances.items():
+            in_ssm = {item['InstanceId'] for item in self.ssm[key]}
+            result[key] = {i['InstanceId'] for i in instances
+                           if i['State']['Name'] == 'running' and i['InstanceId'] not in in_ssm}
+        return result
+
+    def _maybe_throttle(self):
+        with self._lock:
+            return self.throttle_rate and self._random.random() < self.throttle_rate
+
+
+class StandInQueue:
+    """
+    Fila SQS em memória, com long polling.
+
+    Mensagens recebidas saem da fila; não há reentrega por visibility timeout.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.received = 0
+        self.deleted = 0
+        self._messages = deque()
+        self._condition = threading.Condition()
+
+    def put(self, body):
+        with self._condition:
+            self._messages.append(body)
+            self._condition.notify()
+
+    def get(self, count, wait):
+        deadline = time.monotonic() + wait
+        with self._condition:
+            while not self._messages:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+            batch = [self._messages.popleft() for _ in range(min(count, len(self._messages)))]
+            self.received += len(batch)
+            return batch
+
+    def __len__(self):
+        return len(self._messages)
+
+
+class StandInSession:
+    def __init__(self, aws, profile):
+        self.aws = aws
+        self.profile = profile
+
+    def get_credentials(self):
+        return types.SimpleNamespace(access_key='standin', secret_key='standin', token=None)
+
+    def client(self, service, region_name=None, config=None):
+        return StandInClient(self.aws, self.profile, region_name, service)
+
+
+class EventHooks:
+    """Subconjunto de botocore.hooks usado por aws_retry.py e tracing.py."""
+
+    def __init__(self):
+        self._handlers = {}
+
+    def register(self, event, handler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def register_first(self, event, handler):
+        self._handlers.setdefault(event, []).insert(0, handler)
+
+    def emit(self, event, **kwargs):
+        """Chama todos os handlers e retorna a primeira resposta não nula, como o botocore."""
+        response = None
+        for handler in self._handlers.get(event, []):
+            result = handler(**kwargs)
+            if response is None:
+                response = result
+        return response
+
+
+class StandInPaginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        if PaginationConfig and PaginationConfig.get('PageSize'):
+            kwargs['MaxResults'] = PaginationConfig['PageSize']
+        while True:
+            page = getattr(self.client, self.operation)(**kwargs)
+            yield page
+            token = page.get('NextToken')
+            if not token:
+                return
+            kwargs['NextToken'] = token
+
+
+def _page(items, key, MaxResults=None, NextToken=None, default_size=50):
+    start = int(NextToken or 0)
+    size = MaxResults or default_size
+    page = {key: items[start:start + size]}
+    if start + size < len(items):
+        page['NextToken'] = str(start + size)
+    return page
+
+
+class StandInClient:
+    """Cliente de um serviço para (profile, região)."""
+
+    def __init__(self, aws, profile, region, service):
+        self.aws = aws
+        self.profile = profile
+        self.region = region
+        self.service = service
+        self.meta = types.SimpleNamespace(
+            events=EventHooks(),
+            region_name=region,
+            service_model=types.SimpleNamespace(service_name=service),
+        )
+
+    def get_paginator(self, operation):
+        return StandInPaginator(self, operation)
+
+    def get_waiter(self, name):
+        def wait(**kwargs):
+            self.get_instance_profile(**kwargs)
+        return types.SimpleNamespace(wait=wait)
+
+    def _call(self, operation, handler, **params):
+        """
+        Executa uma operação com latência e throttling, emitindo os eventos do
+        botocore na mesma ordem: before-call, request-created, before-send e
+        needs-retry a cada tentativa, after-call no fim (também em erro).
+        """
+        events = self.meta.events
+        model = types.SimpleNamespace(name=operation)
+        context = {}
+        events.emit('before-call', model=model, params=params, context=context)
+        request = types.SimpleNamespace(context=context, body=json.dumps(params, default=str).encode())
+        events.emit('request-created', request=request, operation_name=operation)
+        attempts = 0
+        while True:
+            attempts += 1
+            events.emit('before-send', request=request)
+            self.aws.calls[f"{self.service}:{operation}"] += 1
+            if self.aws.latency:
+                time.sleep(self.aws.latency)
+
+            error = None
+            if self.aws._maybe_throttle():
+                self.aws.throttled[self.service] += 1
+                error = {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}
+            else:
+                try:
+                    result = handler()
+                except ClientError as e:
+                    error = e.response
+
+            parsed = result if error is None else error
+            http_response = types.SimpleNamespace(status_code=200 if error is None else 400,
+                                                  content=json.dumps(parsed, default=str).encode())
+            delay = events.emit('needs-retry', response=(http_response, parsed), attempts=attempts,
+                                caught_exception=None, request_dict={'context': context})
+            if delay is None:
+                break
+            time.sleep(delay)
+
+        events.emit('after-call', http_response=http_response, parsed=parsed, model=model, context=context)
+        if error is not None:
+            raise ClientError(error, operation)
+        return result
+
+    @staticmethod
+    def _error(code, operation, message=''):
+        return ClientError({'Error': {'Code': code, 'Message': message or code}}, operation)
+
+    # EC2
+    def describe_instances(self, Filters=None, MaxResults=None, NextToken=None):
+        def handler():
+            instances = self.aws.instances[(self.profile, self.region)]
+            for f in Filters or []:
+                if f['Name'] == 'instance-state-name':
+                    instances = [i for i in instances if i['State']['Name'] in f['Values']]
+                elif f['Name'] == 'instance-id':
+                    instances = [i for i in instances if i['InstanceId'] in f['Values']]
+                elif f['Name'].startswith('tag:'):
+                    # Valores com curinga (* ?), como no EC2
+                    key = f['Name'][4:]
+                    instances = [i for i in instances
+                                 if any(t['Key'] == key and any(fnmatch.fnmatchcase(t['Value'], v) for v in f['Values'])
+                                        for t in i['Tags'])]
+            page = _page(instances, 'Instances', MaxResults, NextToken, default_size=1000)
+            page['Reservations'] = [{'Instances': page.pop('Instances')}]
+            return page
+        return self._call('DescribeInstances', handler,
+                          Filters=Filters, MaxResults=MaxResults, NextToken=NextToken)
+
+    def associate_iam_instance_profile(self, IamInstanceProfile, InstanceId):
+        def handler():
+            iam = self.aws.iam[self.profile]
+            instance_profile = iam['profiles'].get(IamInstanceProfile['Name'])
+            with self.aws._lock:
+                if instance_profile is None or instance_profile['pending'] > 0:
+                    if instance_profile:
+                        instance_profile['pending'] -= 1
+                    raise self._error('InvalidParameterValue', 'AssociateIamInstanceProfile',
+                                      "Invalid IAM Instance Profile name")
+            for instance in self.aws.instances[(self.profile, self.region)]:
+                if instance['InstanceId'] == InstanceId:
+                    if instance.get('IamInstanceProfile'):
+                        raise self._error('IncorrectState', 'AssociateIamInstanceProfile')
+                    instance['IamInstanceProfile'] = {
+                        'Arn': f"arn:aws:iam::{iam['account_id']}:instance-profile/{IamInstanceProfile['Name']}"}
+                    self.aws.publish(self.profile, self.region, 'aws.ec2', 'AWS API Call via CloudTrail',
+                                     {'eventSource': 'ec2.amazonaws.com',
+                                      'eventName': 'AssociateIamInstanceProfile',
+                                      'requestParameters': {'AssociateIamInstanceProfileRequest': {
+                                          'InstanceId': InstanceId, 'IamInstanceProfile': IamInstanceProfile}}})
+                    return {'IamInstanceProfileAssociation': {'State': 'associating'}}
+            raise self._error('InvalidInstanceID.NotFound', 'AssociateIamInstanceProfile')
+        return self._call('AssociateIamInstanceProfile', handler,
+                          IamInstanceProfile=IamInstanceProfile, InstanceId=InstanceId)
+
+    # SSM
+    def describe_instance_information(self, Filters=None, MaxResults=None, NextToken=None):
+        def handler():
+            registered = self.aws.ssm[(self.profile, self.region)]
+            for f in Filters or []:
+                if f['Key'] == 'InstanceIds':
+                    registered = [i for i in registered if i['InstanceId'] in f['Values']]
+                elif f['Key'] == 'PingStatus':
+                    registered = [i for i in registered if i['PingStatus'] in f['Values']]
+            return _page(registered, 'InstanceInformationList', MaxResults, NextToken)
+        return self._call('DescribeInstanceInformation', handler,
+                          Filters=Filters, MaxResults=MaxResults, NextToken=NextToken)
+
+    def send_command(self, DocumentName, InstanceIds=None, Targets=None, **kwargs):
+        def handler():
+            if Targets:
+                registered = [i['InstanceId'] for i in self.aws.ssm[(self.profile, self.region)]]
+                instance_ids = registered[::7]
+            else:
+                instance_ids = list(InstanceIds)
+            # Id determinístico: o resultado do benchmark não depende da ordem das threads
+            digest = hashlib.sha1(f"{self.profile}|{self.region}|{DocumentName}|{','.join(instance_ids)}"
+                                  .encode()).hexdigest()[:12]
+            command_id = f"cmd-{digest}"
+            with self.aws._lock:
+                self.aws.commands[command_id] = {'key': (self.profile, self.region), 'polls': 0,
+                                                 'instances': instance_ids}
+            return {'Command': {'CommandId': command_id, 'Status': 'Pending'}}
+        return self._call('SendCommand', handler,
+                          DocumentName=DocumentName, InstanceIds=InstanceIds, Targets=Targets)
+
+    def _command_status(self, command):
+        return 'Success' if command['polls'] >= 1 else 'InProgress'
+
+    def list_commands(self, Filters=None, MaxResults=None, NextToken=None, CommandId=None):
+        def handler():
+            with self.aws._lock:
+                commands = [(command_id, command) for command_id, command in self.aws.commands.items()
+                            if command['key'] == (self.profile, self.region)]
+                if not NextToken:
+                    for _, command in commands:
+                        command['polls'] += 1
+                items = [{'CommandId': command_id, 'Status': self._command_status(command)}
+                         for command_id, command in commands]
+            return _page(items, 'Commands', MaxResults, NextToken)
+        return self._call('ListCommands', handler,
+                          Filters=Filters, MaxResults=MaxResults, NextToken=NextToken, CommandId=CommandId)
+
+    def list_command_invocations(self, CommandId, MaxResults=None, NextToken=None, Details=False):
+        def handler():
+            command = self.aws.commands[CommandId]
+            status = self._command_status(command)
+            items = [{'InstanceId': instance_id, 'CommandId': CommandId,
+                      'Status': 'Failed' if status == 'Success' and instance_id.endswith('7') else status}
+                     for instance_id in command['instances']]
+            return _page(items, 'CommandInvocations', MaxResults, NextToken)
+        return self._call('ListCommandInvocations', handler,
+                          CommandId=CommandId, MaxResults=MaxResults, NextToken=NextToken, Details=Details)
+
+    # IAM
+    def _account(self):
+        return self.aws.iam[self.profile]
+
+    def _policy_arn(self, name):
+        iam = self._account()
+        if name in iam['policies']:
+            return f"arn:aws:iam::{iam['account_id']}:policy/{name}"
+        return f"arn:aws:iam::aws:policy/{name}"
+
+    def _policy_document(self, arn):
+        """Documento da policy pelo ARN (versão v1), ou None se não existir."""
+        name = arn.split('/')[-1]
+        if ':iam::aws:policy/' in arn:
+            return AWS_MANAGED_POLICIES.get(name)
+        return self._account()['policies'].get(name)
+
+    def _attached(self, policies):
+        return [{'PolicyName': policy, 'PolicyArn': self._policy_arn(policy)} for policy in policies]
+
+    def get_account_authorization_details(self, Filter=None, MaxResults=None, NextToken=None):
+        def handler():
+            iam = self._account()
+            details = []
+            for role_name, policies in sorted(iam['roles'].items()):
+                detail = {
+                    'RoleName': role_name,
+                    'InstanceProfileList': [
+                        {'InstanceProfileName': name,
+                         'Arn': f"arn:aws:iam::{iam['account_id']}:instance-profile/{name}"}
+                        for name, instance_profile in sorted(iam['profiles'].items())
+                        if role_name in instance_profile['roles']
+                    ],
+                    'AttachedManagedPolicies': self._attached(policies),
+                    'RolePolicyList': [{'PolicyName': name, 'PolicyDocument': document}
+                                       for name, document in sorted(iam['inline'].get(role_name, {}).items())],
+                }
+                if role_name in iam['boundaries']:
+                    detail['PermissionsBoundary'] = {'PermissionsBoundaryType': 'Policy',
+                                                     'PermissionsBoundaryArn': iam['boundaries'][role_name]}
+                details.append(detail)
+            page = _page(details, 'RoleDetailList', MaxResults, NextToken, default_size=100)
+            if 'LocalManagedPolicy' in (Filter or []) and NextToken is None:
+                page['Policies'] = [
+                    {'PolicyName': name, 'Arn': self._policy_arn(name), 'DefaultVersionId': 'v1',
+                     'PolicyVersionList': [{'VersionId': 'v1', 'IsDefaultVersion': True, 'Document': document}]}
+                    for name, document in sorted(iam['policies'].items())
+                ]
+            return page
+        return self._call('GetAccountAuthorizationDetails', handler,
+                          Filter=Filter, MaxResults=MaxResults, NextToken=NextToken)
+
+    def get_policy(self, PolicyArn):
+        def handler():
+            if self._policy_document(PolicyArn) is None:
+                raise self._error('NoSuchEntity', 'GetPolicy')
+            return {'Policy': {'Arn': PolicyArn, 'PolicyName': PolicyArn.split('/')[-1], 'DefaultVersionId': 'v1'}}
+        return self._call('GetPolicy', handler, PolicyArn=PolicyArn)
+
+    def get_policy_version(self, PolicyArn, VersionId):
+        def handler():
+            document = self._policy_document(PolicyArn)
+            if document is None or VersionId != 'v1':
+                raise self._error('NoSuchEntity', 'GetPolicyVersion')
+            return {'PolicyVersion': {'Document': document, 'VersionId': VersionId, 'IsDefaultVersion': True}}
+        return self._call('GetPolicyVersion', handler, PolicyArn=PolicyArn, VersionId=VersionId)
+
+    def get_role(self, RoleName):
+        def handler():
+            iam = self._account()
+            if RoleName not in iam['roles']:
+                raise self._error('NoSuchEntity', 'GetRole')
+            role = {'RoleName': RoleName, 'Arn': f"arn:aws:iam::{iam['account_id']}:role/{RoleName}"}
+            if RoleName in iam['boundaries']:
+                role['PermissionsBoundary'] = {'PermissionsBoundaryType': 'Policy',
+                                               'PermissionsBoundaryArn': iam['boundaries'][RoleName]}
+            return {'Role': role}
+        return self._call('GetRole', handler, RoleName=RoleName)
+
+    def list_role_policies(self, RoleName, **kwargs):
+        def handler():
+            iam = self._account()
+            if RoleName not in iam['roles']:
+                raise self._error('NoSuchEntity', 'ListRolePolicies')
+            return {'PolicyNames': sorted(iam['inline'].get(RoleName, {}))}
+        return self._call('ListRolePolicies', handler, RoleName=RoleName)
+
+    def get_role_policy(self, RoleName, PolicyName):
+        def handler():
+            document = self._account()['inline'].get(RoleName, {}).get(PolicyName)
+            if document is None:
+                raise self._error('NoSuchEntity', 'GetRolePolicy')
+            return {'RoleName': RoleName, 'PolicyName': PolicyName, 'PolicyDocument': document}
+        return self._call('GetRolePolicy', handler, RoleName=RoleName, PolicyName=PolicyName)
+
+    def get_instance_profile(self, InstanceProfileName):
+        def handler():
+            instance_profile = self._account()['profiles'].get(InstanceProfileName)
+            if instance_profile is None:
+                raise self._error('NoSuchEntity', 'GetInstanceProfile')
+            return {'InstanceProfile': {'InstanceProfileName': InstanceProfileName,
+                                        'Roles': [{'RoleName': name} for name in instance_profile['roles']]}}
+        return self._call('GetInstanceProfile', handler, InstanceProfileName=InstanceProfileName)
+
+    def list_attached_role_policies(self, RoleName, **kwargs):
+        def handler():
+            policies = self._account()['roles'].get(RoleName)
+            if policies is None:
+                raise self._error('NoSuchEntity', 'ListAttachedRolePolicies')
+            return {'AttachedPolicies': self._attached(policies)}
+        return self._call('ListAttachedRolePolicies', handler, RoleName=RoleName)
+
+    def create_role(self, RoleName, **kwargs):
+        def handler():
+            roles = self._account()['roles']
+            with self.aws._lock:
+                if RoleName in roles:
+                    raise self._error('EntityAlreadyExists', 'CreateRole')
+                roles[RoleName] = []
+            return {'Role': {'RoleName': RoleName}}
+        return self._call('CreateRole', handler, RoleName=RoleName)
+
+    def attach_role_policy(self, RoleName, PolicyArn):
+        def handler():
+            policies = self._account()['roles'].get(RoleName)
+            if policies is None:
+                raise self._error('NoSuchEntity', 'AttachRolePolicy')
+            policy_name = PolicyArn.split('/')[-1]
+            with self.aws._lock:
+                if policy_name not in policies:
+                    policies.append(policy_name)
+            return {}
+        return self._call('AttachRolePolicy', handler, RoleName=RoleName, PolicyArn=PolicyArn)
+
+    def create_instance_profile(self, InstanceProfileName):
+        def handler():
+            profiles = self._account()['profiles']
+            with self.aws._lock:
+                if InstanceProfileName in profiles:
+                    raise self._error('EntityAlreadyExists', 'CreateInstanceProfile')
+                profiles[InstanceProfileName] = {'roles': [], 'pending': self.aws.propagation}
+            return {'InstanceProfile': {'InstanceProfileName': InstanceProfileName}}
+        return self._call('CreateInstanceProfile', handler, InstanceProfileName=InstanceProfileName)
+
+    def add_role_to_instance_profile(self, InstanceProfileName, RoleName):
+        def handler():
+            instance_profile = self._account()['profiles'].get(InstanceProfileName)
+            if instance_profile is None:
+                raise self._error('NoSuchEntity', 'AddRoleToInstanceProfile')
+            if instance_profile['roles']:
+                raise self._error('LimitExceeded', 'AddRoleToInstanceProfile')
+            instance_profile['roles'].append(RoleName)
+            return {}
+        return self._call('AddRoleToInstanceProfile', handler,
+                          InstanceProfileName=InstanceProfileName, RoleName=RoleName)
+
+    # Config (agregador): o SQL é reduzido a resourceType e às listas IN de accountId,
+    # awsRegion, configuration.state.name e tags.tag ('Chave=valor', uma lista por chave)
+    def _aggregate_items(self, expression):
+        def in_list(column):
+            match = re.search(re.escape(column) + r" IN \(([^)]*)\)", expression)
+            return set(re.findall(r"'([^']*)'", match.group(1))) if match else None
+
+        resource_type = re.search(r"resourceType = '([^']+)'", expression).group(1)
+        accounts = in_list('accountId')
+        regions = in_list('awsRegion')
+        states = in_list('configuration.state.name')
+        tag_lists = [set(re.findall(r"'([^']*)'", group))
+                     for group in re.findall(r"tags\.tag IN \(([^)]*)\)", expression)]
+        items = []
+        for profile, iam in self.aws.iam.items():
+            account_id = iam['account_id']
+            if accounts is not None and account_id not in accounts:
+                continue
+            if resource_type == 'AWS::IAM::Role':
+                for role_name, policies in sorted(iam['roles'].items()):
+                    configuration = {
+                        'attachedManagedPolicies': [
+                            {'policyName': policy,
+                             'policyArn': (f"arn:aws:iam::{account_id}:policy/{policy}" if policy in iam['policies']
+                                           else f"arn:aws:iam::aws:policy/{policy}")}
+                            for policy in policies
+                        ],
+                        'instanceProfileList': [
+                            {'instanceProfileName': name,
+                             'arn': f"arn:aws:iam::{account_id}:instance-profile/{name}"}
+                            for name, instance_profile in sorted(iam['profiles'].items())
+                            if role_name in instance_profile['roles']
+                        ],
+                        # O Config guarda os documentos URL-encoded
+                        'rolePolicyList': [{'policyName': name, 'policyDocument': quote(json.dumps(document))}
+                                           for name, document in sorted(iam['inline'].get(role_name, {}).items())],
+                    }
+                    if role_name in iam['boundaries']:
+                        configuration['permissionsBoundary'] = {'permissionsBoundaryType': 'Policy',
+                                                                'permissionsBoundaryArn': iam['boundaries'][role_name]}
+                    items.append({'resourceName': role_name, 'accountId': account_id, 'configuration': configuration})
+                continue
+            if resource_type == 'AWS::IAM::Policy':
+                for name, document in sorted(iam['policies'].items()):
+                    items.append({'accountId': account_id, 'configuration': {
+                        'arn': f"arn:aws:iam::{account_id}:policy/{name}",
+                        'policyVersionList': [{'versionId': 'v1', 'isDefaultVersion': True,
+                                               'document': quote(json.dumps(document))}],
+                    }})
+                continue
+            for region in self.aws.spec.regions:
+                if regions is not None and region not in regions:
+                    continue
+                if resource_type == 'AWS::EC2::Instance':
+                    for instance in self.aws.instances[(profile, region)]:
+                        if states is not None and instance['State']['Name'] not in states:
+                            continue
+                        tags = {f"{tag['Key']}={tag['Value']}" for tag in instance['Tags']}
+                        if not all(tags & accepted for accepted in tag_lists):
+                            continue
+                        configuration = {'state': {'name': instance['State']['Name']}}
+                        if 'IamInstanceProfile' in instance:
+                            configuration['iamInstanceProfile'] = {'arn': instance['IamInstanceProfile']['Arn']}
+                        items.append({'resourceId': instance['InstanceId'], 'accountId': account_id,
+                                      'awsRegion': region, 'configuration': configuration,
+                                      'tags': [{'key': tag['Key'], 'value': tag['Value']}
+                                               for tag in instance['Tags']]})
+                elif resource_type == 'AWS::SSM::ManagedInstanceInventory':
+                    for info in self.aws.ssm[(profile, region)]:
+                        items.append({'resourceId': info['InstanceId'], 'accountId': account_id,
+                                      'awsRegion': region})
+        return [json.dumps(item) for item in items]
+
+    def select_aggregate_resource_config(self, Expression, ConfigurationAggregatorName, Limit=None,
+                                         MaxResults=None, NextToken=None):
+        def handler():
+            # Resultado da consulta guardado no cliente: as páginas seguintes só recortam a lista
+            cache = self.__dict__.setdefault('_aggregate_cache', {})
+            if NextToken is None or Expression not in cache:
+                cache[Expression] = self._aggregate_items(Expression)
+            items = cache[Expression]
+            return _page(items, 'Results', Limit or MaxResults, NextToken, default_size=100)
+        return self._call('SelectAggregateResourceConfig', handler, Expression=Expression,
+                          ConfigurationAggregatorName=ConfigurationAggregatorName,
+                          Limit=Limit or MaxResults, NextToken=NextToken)
+
+    # Organizations: cada profile é uma conta com o mesmo nome
+    def list_accounts(self, MaxResults=None, NextToken=None):
+        def handler():
+            accounts = [{'Id': iam['account_id'], 'Name': profile, 'Status': 'ACTIVE'}
+                        for profile, iam in self.aws.iam.items()]
+            return _page(accounts, 'Accounts', MaxResults, NextToken, default_size=20)
+        return self._call('ListAccounts', handler, MaxResults=MaxResults, NextToken=NextToken)
+
+    # STS
+    def assume_role(self, RoleArn, RoleSessionName, DurationSeconds=3600, ExternalId=None):
+        def handler():
+            account_id = RoleArn.split(':')[4]
+            if account_id not in {iam['account_id'] for iam in self.aws.iam.values()}:
+                raise self._error('AccessDenied', 'AssumeRole')
+            return {'Credentials': {
+                'AccessKeyId': ASSUMED_KEY_PREFIX + account_id,
+                'SecretAccessKey': 'standin',
+                'SessionToken': 'standin',
+                'Expiration': datetime.fromtimestamp(time.time() + DurationSeconds, timezone.utc),
+            }}
+        return self._call('AssumeRole', handler, RoleArn=RoleArn, RoleSessionName=RoleSessionName,
+                          DurationSeconds=DurationSeconds)
+
+    def get_caller_identity(self):
+        def handler():
+            account_id = self._account()['account_id']
+            return {'Account': account_id, 'Arn': f"arn:aws:sts::{account_id}:assumed-role/standin/{self.profile}"}
+        return self._call('GetCallerIdentity', handler)
+
+    # SQS
+    def _queue(self, QueueUrl):
+        queue = self.aws.event_queue
+        if queue is None or queue.url != QueueUrl:
+            raise self._error('AWS.SimpleQueueService.NonExistentQueue', 'ReceiveMessage')
+        return queue
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, **kwargs):
+        def handler():
+            bodies = self._queue(QueueUrl).get(MaxNumberOfMessages, WaitTimeSeconds)
+            return {'Messages': [{'MessageId': str(n), 'ReceiptHandle': str(n), 'Body': body}
+                                 for n, body in enumerate(bodies)]} if bodies else {}
+        return self._call('ReceiveMessage', handler, QueueUrl=QueueUrl, MaxNumberOfMessages=MaxNumberOfMessages,
+                          WaitTimeSeconds=WaitTimeSeconds)
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        def handler():
+            queue = self._queue(QueueUrl)
+            with self.aws._lock:
+                queue.deleted += len(Entries)
+            return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+        return self._call('DeleteMessageBatch', handler, QueueUrl=QueueUrl, Entries=Entries)
@@ -0,0 +1,1208 @@
+#!/usr/bin/env python3
+"""
+Benchmarks da varredura com clientes AWS simulados.
+
+Não acessa a AWS: os clientes EC2/SSM/IAM são stubs em memória que dormem
+uma latência fixa por chamada, simulando o tempo de rede. Aqui só se mede; a
+correção (instâncias de todas as páginas, chamadas por operação, plano sem
+repetições, um resultado por instância) é conferida nos testes em tests/.
+
+- escala: tempo total de uma varredura PROFILES × REGIONS por número de workers
+- paginacao: pico de memória dos coletores, gravando linha a linha vs
+  materializando a lista
+- payload: bytes, tempo de parse e memória do describe_instances /
+  describe_instance_information com e sem Filters, guardando os dicts da API
+  vs os registros mínimos de collectors.py
+- iam: chamadas IAM por instância (direto, com cache e com carga em lote)
+- politicas: classificação de milhares de roles pelos documentos das
+  policies (iam_policy.py) vs pelo nome, com as chamadas IAM por conta
+- pool: custo de criar sessões/clientes boto3 por iteração vs reaproveitar
+  do pool (usa boto3 real, sem rede)
+- remediacao: chamadas e tempo do enable_ssm.py (uma role por instância +
+  sleep de 10s) vs o plano por conta do remediation.py
+- runcommand: chamadas do Run Command por instância vs despacho em lote com
+  acompanhamento por região (run_command.py)
+- snapshot: tempo e pico de memória para filtrar o inventário a partir do CSV
+  (csv.DictReader) vs snapshot.py
+- historico: tempo das consultas do history.py sobre semanas de varreduras
+- versoes: índice de versões do agente, drift e plano de atualização
+  (agent_versions.py) sobre dezenas de milhares de instâncias
+- relatorio: tempo do report.py (carga do snapshot, agregações e Markdown)
+  vs as mesmas contagens com laços sobre os registros
+- watch: carga inicial, vazão de eventos e reconciliação do watch.py contra
+  a AWS local de aws_standin.py (com fila SQS e eventos perdidos)
+
+Uso:
+    python3 benchmark_scan.py
+    python3 benchmark_scan.py escala --accounts 40 --regions 6 --latency 0.1 --workers 1,4,16,32
+    python3 benchmark_scan.py paginacao --instances 10000
+    python3 benchmark_scan.py payload --instances 20000
+    python3 benchmark_scan.py iam --accounts 40 --regions 6
+    python3 benchmark_scan.py politicas --accounts 40 --roles 250
+    python3 benchmark_scan.py pool --accounts 10
+    python3 benchmark_scan.py remediacao --accounts 5 --instances 200
+    python3 benchmark_scan.py runcommand --accounts 5 --instances 2000
+    python3 benchmark_scan.py snapshot --rows 200000
+    python3 benchmark_scan.py historico --scans 28 --rows 20000
+    python3 benchmark_scan.py versoes --instances 50000
+    python3 benchmark_scan.py relatorio --rows 100000
+    python3 benchmark_scan.py watch --accounts 5 --instances 2000 --events 50000
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter
+
+# Os scripts importam config.py; o benchmark usa uma configuração sintética
+# para não depender das contas reais.
+if 'config' not in sys.modules and importlib.util.find_spec('config') is None:
+    sys.modules['config'] = types.SimpleNamespace(
+        PROFILES=[], REGIONS=[],
+        SSM_POLICIES=['AmazonSSMManagedInstanceCore', 'AmazonEC2RoleforSSM', 'AmazonSSMFullAccess'],
+    )
+
+from botocore.exceptions import ClientError
+
+import agent_versions
+import collectors
+import scan
+from iam_cache import IamCache
+from iam_index import AccountIndexes, prefetch_iam_index
+from iam_policy import PolicyEvaluator
+from remediation import Remediator, build_plan
+from run_command import Dispatcher, Target, group_targets
+from history import HistoryStore
+from snapshot import InventoryRecord, SnapshotStore
+from scan_engine import run_units
+from aws_clients import ClientPool
+from aws_retry import configured_retry
+from aws_standin import AWS_MANAGED_POLICIES, SSM_POLICY, FleetSpec, StandInAWS
+from watch import Watcher
+
+
+class StubPaginator:
+    """Paginator simulado: gera as páginas sob demanda, respeitando PageSize."""
+
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        page_size = (PaginationConfig or {}).get('PageSize', 50)
+        source, key = {
+            'describe_instances': (self.client.fleet.instances, 'Reservations'),
+            'describe_instance_information': (self.client.fleet.ssm_instances, 'InstanceInformationList'),
+            'get_account_authorization_details': (self.client.fleet.roles, 'RoleDetailList'),
+        }[self.operation]
+
+        page = []
+        pages = 0
+        for item in source():
+            page.append(item)
+            if len(page) == page_size:
+                self.client._call()
+                pages += 1
+                yield self._page(key, page)
+                page = []
+        if page or not pages:
+            self.client._call()
+            yield self._page(key, page)
+
+    @staticmethod
+    def _page(key, items):
+        if key == 'Reservations':
+            return {key: [{'Instances': items}]}
+        return {key: items}
+
+
+class StubClient:
+    """Cliente simulado: responde a partir de uma frota sintética e dorme `latency` por chamada."""
+
+    def __init__(self, fleet, latency):
+        self.fleet = fleet
+        self.latency = latency
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_paginator(self, operation):
+        return StubPaginator(self, operation)
+
+    # IAM
+    def get_instance_profile(self, InstanceProfileName):
+        self._call()
+        return {'InstanceProfile': {'Roles': [{'RoleName': f"role-{InstanceProfileName}"}]}}
+
+    def list_attached_role_policies(self, RoleName):
+        self._call()
+        return {'AttachedPolicies': [{'PolicyName': SSM_POLICY, 'PolicyArn': f"arn:aws:iam::aws:policy/{SSM_POLICY}"}]}
+
+    def get_role(self, RoleName):
+        self._call()
+        return {'Role': {'RoleName': RoleName}}
+
+    def list_role_policies(self, RoleName):
+        self._call()
+        return {'PolicyNames': []}
+
+    def get_policy(self, PolicyArn):
+        self._call()
+        return {'Policy': {'DefaultVersionId': 'v1'}}
+
+    def get_policy_version(self, PolicyArn, VersionId):
+        self._call()
+        return {'PolicyVersion': {'Document': AWS_MANAGED_POLICIES[PolicyArn.split('/')[-1]]}}
+
+
+class SyntheticFleet:
+    """
+    Frota sintética gerada sob demanda: metade com role, 2/3 registradas no SSM.
+
+    As instâncias não ficam em memória; cada iteração gera de novo, para que o
+    benchmark de paginação meça só o que o coletor retém.
+    """
+
+    def __init__(self, size):
+        self.size = size
+
+    def instances(self):
+        for n in range(self.size):
+            instance = {
+                'InstanceId': f"i-{n:017x}",
+                'State': {'Name': 'running'},
+                'Tags': [{'Key': 'Name', 'Value': f"bench-{n}"}],
+                # Payload típico que o inventário descarta
+                'BlockDeviceMappings': [{'DeviceName': '/dev/xvda', 'Ebs': {'VolumeId': f"vol-{n:017x}"}}],
+                'NetworkInterfaces': [{'NetworkInterfaceId': f"eni-{n:017x}", 'PrivateIpAddress': '10.0.0.1'}],
+            }
+            if n % 2 == 0:
+                instance['IamInstanceProfile'] = {'Arn': f"arn:aws:iam::123456789012:instance-profile/profile-{n % 5}"}
+            yield instance
+
+    def roles(self):
+        for n in range(5):
+            yield {
+                'RoleName': f"role-profile-{n}",
+                'InstanceProfileList': [{
+                    'InstanceProfileName': f"profile-{n}",
+                    'Arn': f"arn:aws:iam::123456789012:instance-profile/profile-{n}",
+                }],
+                'AttachedManagedPolicies': [{'PolicyName': SSM_POLICY,
+                                             'PolicyArn': f"arn:aws:iam::aws:policy/{SSM_POLICY}"}],
+            }
+
+    def ssm_instances(self):
+        for n in range(self.size):
+            if n % 3:
+                yield {
+                    'InstanceId': f"i-{n:017x}",
+                    'PingStatus': 'Online',
+                    'AgentVersion': '3.2.582.0',
+                    'PlatformType': 'Linux',
+                }
+
+
+def make_unit(fleet, latency, outputs=scan.ALL_OUTPUTS):
+    """Unidade equivalente ao que scan.py faz por profile/região."""
+    def unit(profile, region):
+        client = StubClient(fleet, latency)
+        scan.collect_region(client, client, client, profile, region, outputs)
+        return client.calls
+    return unit
+
+
+def bench_scaling(args):
+    """Tempo total da varredura para diferentes números de workers."""
+    profiles = [f"account{n}" for n in range(args.accounts)]
+    regions = [f"region-{n}" for n in range(args.regions)]
+    unit = make_unit(SyntheticFleet(args.instances), args.latency)
+
+    print(f"=== Benchmark: {len(profiles)} contas × {len(regions)} regiões, "
+          f"{args.instances} instâncias, {args.latency * 1000:.0f} ms/chamada ===\n")
+    print(f"{'workers':>8} {'tempo (s)':>10} {'speedup':>8} {'chamadas':>9}")
+
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        start = time.perf_counter()
+        calls = sum(r.value for r in run_units(profiles, regions, unit, workers, args.per_account))
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x {calls:>9}")
+
+
+def pagination_peak(size, materialize):
+    """
+    Varredura de inventário de `size` instâncias com o pico de memória medido.
+
+    Roda em um processo novo (bench_pagination): o estado do módulo scan
+    (POLICIES, documentos já lidos) não passa de uma medição para a outra.
+    """
+    fleet = SyntheticFleet(size)
+    client = StubClient(fleet, 0)
+    # As linhas vão para /dev/null, como para um CSV em disco: só o coletor retém memória
+    with open(os.devnull, 'w', newline='') as sink:
+        writer = csv.writer(sink)
+        tracemalloc.start()
+        instances = collectors.iter_ec2_instances(client)
+        if materialize:
+            instances = list(instances)
+        count = 0
+        for instance in instances:
+            iam_role, ssm_status = scan.classify_instance(instance, client, 'bench')
+            writer.writerow(scan.inventory_row('bench', 'region', instance, iam_role, ssm_status))
+            count += 1
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return count, client.calls, peak
+
+
+def bench_pagination(args):
+    """
+    Pico de memória dos coletores.
+
+    Compara o pico ao gravar as linhas direto no CSV (streaming) com o pico ao
+    materializar a lista inteira de instâncias, cada modo em um processo novo.
+    """
+    context = multiprocessing.get_context('fork')
+
+    print(f"=== Paginação: {args.instances} instâncias, página de {collectors.EC2_PAGE_SIZE} ===\n")
+
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        count, ec2_pages, streaming_peak = pool.apply(pagination_peak, (args.instances, False))
+        _, _, materialized_peak = pool.apply(pagination_peak, (args.instances, True))
+
+    print(f"EC2: {count} instâncias ({ec2_pages} chamadas, incluindo IAM)")
+    print(f"Pico de memória (streaming):    {streaming_peak / 1024:>10.0f} KiB")
+    print(f"Pico de memória (lista inteira): {materialized_peak / 1024:>10.0f} KiB")
+
+
+def full_instance(n):
+    """Documento completo de describe_instances, como a API devolve (estados e tags variados)."""
+    state = ('running', 'running', 'running', 'stopped', 'terminated')[n % 5]
+    environment = 'prod' if n % 2 else 'dev'
+    subnet, vpc, eni = f"subnet-{n % 8:017x}", f"vpc-{n % 2:017x}", f"eni-{n:017x}"
+    groups = [{'GroupName': f"sg-app-{n % 4}", 'GroupId': f"sg-{n % 4:017x}"},
+              {'GroupName': 'sg-default', 'GroupId': f"sg-{99:017x}"}]
+    ip = f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}"
+    instance = {
+        'AmiLaunchIndex': 0, 'ImageId': f"ami-{n % 10:017x}", 'InstanceId': f"i-{n:017x}",
+        'InstanceType': 'm5.large', 'KeyName': 'ops', 'LaunchTime': f"2026-01-{n % 28 + 1:02d}T00:00:00+00:00",
+        'Monitoring': {'State': 'disabled'},
+        'Placement': {'AvailabilityZone': f"us-east-1{'abc'[n % 3]}", 'GroupName': '', 'Tenancy': 'default'},
+        'PrivateDnsName': f"ip-{ip.replace('.', '-')}.ec2.internal", 'PrivateIpAddress': ip,
+        'ProductCodes': [], 'PublicDnsName': '', 'State': {'Code': 16, 'Name': state},
+        'StateTransitionReason': '', 'SubnetId': subnet, 'VpcId': vpc, 'Architecture': 'x86_64',
+        'BlockDeviceMappings': [
+            {'DeviceName': device, 'Ebs': {'AttachTime': '2026-01-01T00:00:00+00:00', 'DeleteOnTermination': True,
+                                           'Status': 'attached', 'VolumeId': f"vol-{n * 2 + k:017x}"}}
+            for k, device in enumerate(['/dev/xvda', '/dev/xvdb'])
+        ],
+        'ClientToken': f"token-{n}", 'EbsOptimized': True, 'EnaSupport': True, 'Hypervisor': 'xen',
+        'NetworkInterfaces': [{
+            'Attachment': {'AttachTime': '2026-01-01T00:00:00+00:00', 'AttachmentId': f"eni-attach-{n:017x}",
+                           'DeleteOnTermination': True, 'DeviceIndex': 0, 'Status': 'attached',
+                           'NetworkCardIndex': 0},
+            'Description': '', 'Groups': groups, 'Ipv6Addresses': [], 'MacAddress': '0a:00:00:00:00:00',
+            'NetworkInterfaceId': eni, 'OwnerId': '123456789012', 'PrivateIpAddress': ip,
+            'PrivateIpAddresses': [{'Primary': True, 'PrivateIpAddress': ip}],
+            'SourceDestCheck': True, 'Status': 'in-use', 'SubnetId': subnet, 'VpcId': vpc,
+            'InterfaceType': 'interface',
+        }],
+        'RootDeviceName': '/dev/xvda', 'RootDeviceType': 'ebs', 'SecurityGroups': groups, 'SourceDestCheck': True,
+        'Tags': [{'Key': 'Name', 'Value': f"app-{n}"}, {'Key': 'Environment', 'Value': environment},
+                 {'Key': 'Team', 'Value': f"team-{n % 7}"}, {'Key': 'CostCenter', 'Value': f"cc-{n % 13}"}],
+        'VirtualizationType': 'hvm', 'CpuOptions': {'CoreCount': 1, 'ThreadsPerCore': 2},
+        'CapacityReservationSpecification': {'CapacityReservationPreference': 'open'},
+        'HibernationOptions': {'Configured': False},
+        'MetadataOptions': {'State': 'applied', 'HttpTokens': 'required', 'HttpPutResponseHopLimit': 2,
+                            'HttpEndpoint': 'enabled', 'HttpProtocolIpv6': 'disabled',
+                            'InstanceMetadataTags': 'disabled'},
+        'EnclaveOptions': {'Enabled': False}, 'PlatformDetails': 'Linux/UNIX', 'UsageOperation': 'RunInstances',
+        'MaintenanceOptions': {'AutoRecovery': 'default'}, 'CurrentInstanceBootMode': 'legacy-bios',
+    }
+    if n % 4:
+        instance['IamInstanceProfile'] = {'Arn': f"arn:aws:iam::123456789012:instance-profile/app-{n % 3}",
+                                          'Id': f"AIPA{n % 3:016d}"}
+    return instance
+
+
+def full_ssm_instance(n):
+    """Item completo de describe_instance_information."""
+    return {
+        'InstanceId': f"i-{n:017x}", 'PingStatus': 'Online', 'LastPingDateTime': '2026-10-18T00:00:00+00:00',
+        'AgentVersion': '3.3.40.0', 'IsLatestVersion': False, 'PlatformType': 'Linux',
+        'PlatformName': 'Amazon Linux', 'PlatformVersion': '2023', 'ResourceType': 'EC2Instance',
+        'IPAddress': f"10.0.{n // 256 % 256}.{n % 256}", 'ComputerName': f"ip-10-0-{n // 256 % 256}-{n % 256}",
+        'AssociationStatus': 'Success', 'LastAssociationExecutionDate': '2026-10-18T00:00:00+00:00',
+        'LastSuccessfulAssociationExecutionDate': '2026-10-18T00:00:00+00:00',
+        'AssociationOverview': {'DetailedStatus': 'Success',
+                                'InstanceAssociationStatusAggregatedCount': {'Success': 2}},
+        'SourceId': f"i-{n:017x}", 'SourceType': 'AWS::EC2::Instance',
+    }
+
+
+def bench_payload(args):
+    """
+    Bytes, parse e memória do describe_instances / describe_instance_information por filtro.
+
+    A API é simulada por páginas JSON já filtradas no "servidor" (o que
+    os Filters evitam que seja transferido); o parse é json.loads, um
+    substituto do parse do botocore. Para cada cenário, tempo e pico de
+    memória guardando a resposta da API (dicts, como antes) e os registros
+    mínimos de collectors.py.
+    """
+    documents = [full_instance(n) for n in range(args.instances)]
+
+    def matches(instance, filters):
+        for f in filters or []:
+            if f['Name'] == 'instance-state-name' and instance['State']['Name'] not in f['Values']:
+                return False
+            if f['Name'].startswith('tag:'):
+                tags = {tag['Key']: tag['Value'] for tag in instance['Tags']}
+                if tags.get(f['Name'][4:]) not in f['Values']:
+                    return False
+        return True
+
+    def serve(items, key, page_size):
+        pages = []
+        for start in range(0, max(len(items), 1), page_size):
+            body = {key: items[start:start + page_size]}
+            if key == 'Reservations':
+                body = {key: [{'Instances': items[start:start + page_size]}]}
+            pages.append(json.dumps(body).encode())
+        return pages
+
+    def consume(pages, parse_page, records):
+        kept = []
+        for body in pages:
+            page = json.loads(body)
+            kept.extend(parse_page(page) if records else raw_items(page))
+            del page
+        return len(kept)
+
+    def measure(pages, parse_page, records):
+        start = time.perf_counter()
+        count = consume(pages, parse_page, records)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        consume(pages, parse_page, records)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return count, elapsed, peak
+
+    def raw_items(page):
+        if 'Reservations' in page:
+            return [instance for reservation in page['Reservations'] for instance in reservation['Instances']]
+        return page['InstanceInformationList']
+
+    prod = {'Environment': ['prod']}
+    live = ['pending', 'running', 'stopping', 'stopped', 'shutting-down']
+    scenarios = [
+        ('EC2 sem filtro', None),
+        ('EC2 sem terminated', collectors.instance_filters(live)),
+        ('EC2 running', collectors.instance_filters(['running'])),
+        ('EC2 running + tag', collectors.instance_filters(['running'], prod)),
+    ]
+    print(f"=== Payload: {args.instances} instâncias (60% running, 20% stopped, 20% terminated; "
+          f"metade Environment=prod) ===\n")
+    print(f"{'cenário':<22}{'instâncias':>11}{'KiB':>8}{'dicts (s)':>10}{'registros (s)':>14}"
+          f"{'pico dicts KiB':>16}{'pico registros KiB':>20}")
+
+    def report(label, pages, parse_page):
+        count, raw_time, raw_peak = measure(pages, parse_page, records=False)
+        _, record_time, record_peak = measure(pages, parse_page, records=True)
+        size = sum(len(body) for body in pages)
+        print(f"{label:<22}{count:>11}{size / 1024:>8.0f}{raw_time:>10.3f}{record_time:>14.3f}"
+              f"{raw_peak / 1024:>16.0f}{record_peak / 1024:>20.0f}")
+
+    running_prod = []
+    for label, filters in scenarios:
+        selected = [instance for instance in documents if matches(instance, filters)]
+        report(label, serve(selected, 'Reservations', collectors.EC2_PAGE_SIZE), collectors.ec2_page_instances)
+        running_prod = [instance['InstanceId'] for instance in selected]
+
+    # SSM: todas as registradas (2/3 da frota, inclusive paradas) vs filtro InstanceIds das running + tag
+    registered = [full_ssm_instance(n) for n in range(args.instances) if n % 3]
+    wanted = set(running_prod)
+    report('SSM sem filtro', serve(registered, 'InstanceInformationList', collectors.SSM_PAGE_SIZE),
+           collectors.ssm_page_instances)
+    report('SSM InstanceIds', serve([info for info in registered if info['InstanceId'] in wanted],
+                                    'InstanceInformationList', collectors.SSM_PAGE_SIZE),
+           collectors.ssm_page_instances)
+
+
+def bench_iam(args):
+    """
+    Chamadas de API por instância no inventário, em três modos:
+
+    - direto: get_instance_profile + get_role / list_attached_role_policies /
+      list_role_policies por instância
+    - cache: mesmas consultas, memorizadas por conta (IamCache)
+    - lote: get_account_authorization_details uma vez por conta (AccountIndexes)
+    """
+    fleet = SyntheticFleet(args.instances)
+    profiles = [f"account{n}" for n in range(args.accounts)]
+    regions = [f"region-{n}" for n in range(args.regions)]
+    total_instances = args.instances * len(profiles) * len(regions)
+
+    def run(cache=None, indexes=None):
+        ec2_calls = iam_calls = 0
+        for profile in profiles:
+            for region in regions:
+                ec2 = StubClient(fleet, 0)
+                iam = StubClient(fleet, 0)
+                index = indexes.get(profile, iam) if indexes else None
+                scan.collect_region(ec2, None, iam, profile, region, ('inventory',), cache, index)
+                ec2_calls += ec2.calls
+                iam_calls += iam.calls
+        return ec2_calls, iam_calls
+
+    print(f"=== Chamadas IAM: {len(profiles)} contas × {len(regions)} regiões × "
+          f"{args.instances} instâncias ===\n")
+    print(f"{'modo':>8} {'EC2':>8} {'IAM':>8} {'IAM/instância':>14}")
+    for mode, kwargs in [('direto', {}), ('cache', {'cache': IamCache()}), ('lote', {'indexes': AccountIndexes()})]:
+        ec2_calls, iam_calls = run(**kwargs)
+        print(f"{mode:>8} {ec2_calls:>8} {iam_calls:>8} {iam_calls / total_instances:>14.4f}")
+
+
+# Policies da conta e inline da frota de bench_policies
+BENCH_POLICIES = {
+    'ssm-wildcard': {'Statement': [{'Effect': 'Allow', 'Action': ['ssm:*', 'ssmmessages:*'], 'Resource': '*'}]},
+    'boundary-no-ssm': {'Statement': [{'Effect': 'Allow', 'Action': ['s3:*', 'ec2:Describe*'], 'Resource': '*'}]},
+    'deny-ssm': {'Statement': [{'Effect': 'Deny', 'Action': 'ssm:*', 'Resource': '*'}]},
+}
+BENCH_INLINE = {
+    'agent': {'Statement': [{'Effect': 'Allow', 'Action': ['ssm:UpdateInstanceInformation', 'SSMMessages:*'],
+                             'Resource': '*'}]},
+    'broad': {'Statement': {'Effect': 'Allow', 'NotAction': ['iam:*', 'organizations:*'], 'Resource': '*'}},
+}
+
+
+def bench_policies(args):
+    """
+    Classificação de `roles` roles por conta pelos documentos das policies (iam_policy.py).
+
+    A frota mistura os casos que o nome não resolve: policy da conta com
+    curingas, inline (com Action e com NotAction), permission boundary que
+    corta o SSM e Deny explícito.
+
+    - nome: o critério antigo (alguma policy anexada em SSM_POLICIES)
+    - documentos: IamIndex em lote + PolicyEvaluator, contando as chamadas IAM
+    """
+    aws = StandInAWS(FleetSpec(args.accounts, 1, 0))
+    kinds = [
+        ([SSM_POLICY], None, None),
+        (['ssm-wildcard'], None, None),
+        (['CloudWatchAgentServerPolicy'], 'agent', None),
+        ([SSM_POLICY], None, 'boundary-no-ssm'),
+        ([SSM_POLICY, 'deny-ssm'], None, None),
+        (['AmazonS3ReadOnlyAccess'], None, None),
+        (['AmazonSSMFullAccess'], None, None),
+        (['CloudWatchAgentServerPolicy'], 'broad', None),
+    ]
+    for iam in aws.iam.values():
+        iam['roles'].clear()
+        iam['policies'].update(BENCH_POLICIES)
+        for n in range(args.roles):
+            attached, inline, boundary = kinds[n % len(kinds)]
+            role_name = f"role-{n}"
+            iam['roles'][role_name] = list(attached)
+            if inline:
+                iam['inline'][role_name] = {inline: BENCH_INLINE[inline]}
+            if boundary:
+                iam['boundaries'][role_name] = f"arn:aws:iam::{iam['account_id']}:policy/{boundary}"
+
+    names = set(scan.SSM_POLICIES)
+    evaluator = PolicyEvaluator(fallback_names=names)
+    total = args.accounts * args.roles
+    print(f"=== Policies: {args.accounts} contas × {args.roles} roles ({total} roles) ===\n")
+
+    clients = {profile: aws.session(profile).client('iam') for profile in aws.spec.profiles}
+    start = time.perf_counter()
+    indexes = {profile: prefetch_iam_index(client) for profile, client in clients.items()}
+    load = time.perf_counter() - start
+
+    by_name = by_document = differ = 0
+    start = time.perf_counter()
+    for profile, index in indexes.items():
+        for role_name, detail in index.role_details.items():
+            allowed = evaluator.role_allows(detail, clients[profile], index.local_policies)
+            named = any(name in names for name in index.attached_policies(role_name))
+            by_document += allowed
+            by_name += named
+            differ += allowed != named
+    evaluation = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for profile, index in indexes.items():
+        for detail in index.role_details.values():
+            evaluator.role_allows(detail, clients[profile], index.local_policies)
+    cached = time.perf_counter() - start
+
+    calls = {operation: count for operation, count in sorted(aws.calls.items())}
+    print(f"Carga em lote:  {load * 1000:7.1f} ms ({calls.pop('iam:GetAccountAuthorizationDetails', 0)} "
+          f"chamadas GetAccountAuthorizationDetails)")
+    print(f"Avaliação:      {evaluation * 1000:7.1f} ms ({evaluation / total * 1e6:.1f} µs/role), "
+          f"chamadas extras: {', '.join(f'{op} {count}' for op, count in calls.items()) or 'nenhuma'}")
+    print(f"Reavaliação:    {cached * 1000:7.1f} ms (resultado memorizado por role)")
+    print(f"\nSSM pelo nome: {by_name} roles | pelos documentos: {by_document} roles | {differ} divergências")
+    print(evaluator.summary())
+
+
+def bench_pool(args):
+    """
+    Custo de criar sessão + clientes a cada profile/região vs reaproveitar do pool.
+
+    Usa boto3 de verdade com credenciais estáticas falsas: nenhuma chamada de
+    rede é feita, só a construção de sessões e clientes é medida.
+    """
+    import boto3
+    from aws_clients import ClientPool
+
+    def fake_session(profile):
+        return boto3.Session(aws_access_key_id='bench', aws_secret_access_key='bench')
+
+    profiles = [f"account{n}" for n in range(args.accounts)]
+    regions = [f"us-east-{n % 2 + 1}" for n in range(args.regions)]
+    services = ['ec2', 'ssm', 'iam']
+
+    print(f"=== Sessões e clientes: {len(profiles)} contas × {len(regions)} regiões × "
+          f"{len(services)} serviços ===\n")
+
+    start = time.perf_counter()
+    for profile in profiles:
+        for region in regions:
+            session = fake_session(profile)
+            for service in services:
+                session.client(service, region_name=region)
+    fresh = time.perf_counter() - start
+
+    pool = ClientPool(session_factory=fake_session)
+    start = time.perf_counter()
+    for profile in profiles:
+        for region in regions:
+            for service in services:
+                pool.client(profile, region, service)
+    pooled = time.perf_counter() - start
+
+    iterations = len(profiles) * len(regions)
+    print(f"Sessão nova por iteração: {fresh:.2f}s ({fresh / iterations * 1000:.0f} ms/iteração)")
+    print(f"Pool de clientes:         {pooled:.2f}s ({pooled / iterations * 1000:.0f} ms/iteração)")
+    print(pool.summary())
+
+
+class StubRemediationClient:
+    """
+    IAM/EC2 simulados para o enable_ssm.py.
+
+    O EC2 só enxerga um instance profile novo depois de `propagation`
+    associações recusadas (InvalidParameterValue), como na propagação do IAM.
+    """
+
+    def __init__(self, latency, propagation=2):
+        self.latency = latency
+        self.propagation = propagation
+        self.calls = 0
+        self.roles = {}
+        self.profiles = {}
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _error(code, operation):
+        return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+    def create_role(self, RoleName, **kwargs):
+        self._call()
+        if RoleName in self.roles:
+            raise self._error('EntityAlreadyExists', 'CreateRole')
+        self.roles[RoleName] = []
+
+    def attach_role_policy(self, RoleName, PolicyArn):
+        self._call()
+        self.roles.setdefault(RoleName, []).append(PolicyArn.split('/')[-1])
+
+    def list_attached_role_policies(self, RoleName):
+        self._call()
+        return {'AttachedPolicies': [{'PolicyName': name, 'PolicyArn': f"arn:aws:iam::aws:policy/{name}"}
+                                     for name in self.roles.get(RoleName, [])]}
+
+    def get_role(self, RoleName):
+        self._call()
+        return {'Role': {'RoleName': RoleName}}
+
+    def list_role_policies(self, RoleName):
+        self._call()
+        return {'PolicyNames': []}
+
+    def get_policy(self, PolicyArn):
+        self._call()
+        return {'Policy': {'Arn': PolicyArn, 'DefaultVersionId': 'v1'}}
+
+    def get_policy_version(self, PolicyArn, VersionId):
+        self._call()
+        return {'PolicyVersion': {'VersionId': VersionId, 'Document': AWS_MANAGED_POLICIES[PolicyArn.split('/')[-1]]}}
+
+    def create_instance_profile(self, InstanceProfileName):
+        self._call()
+        if InstanceProfileName in self.profiles:
+            raise self._error('EntityAlreadyExists', 'CreateInstanceProfile')
+        self.profiles[InstanceProfileName] = {'roles': [], 'pending': self.propagation}
+
+    def get_instance_profile(self, InstanceProfileName):
+        self._call()
+        roles = self.profiles[InstanceProfileName]['roles']
+        return {'InstanceProfile': {'Roles': [{'RoleName': name} for name in roles]}}
+
+    def add_role_to_instance_profile(self, InstanceProfileName, RoleName):
+        self._call()
+        self.profiles[InstanceProfileName]['roles'].append(RoleName)
+
+    def get_waiter(self, name):
+        return types.SimpleNamespace(wait=lambda **kwargs: self._call())
+
+    def associate_iam_instance_profile(self, IamInstanceProfile, InstanceId):
+        self._call()
+        profile = self.profiles[IamInstanceProfile['Name']]
+        with self._lock:
+            if profile['pending']:
+                profile['pending'] -= 1
+                raise self._error('InvalidParameterValue', 'AssociateIamInstanceProfile')
+
+
+def bench_remediation(args):
+    """
+    Correção de uma frota sem SSM: metade sem role, metade com roles sem policy.
+
+    O fluxo antigo (uma role + instance profile por instância, sleep de 10s) é
+    estimado a partir das chamadas que fazia; o novo é executado com os stubs,
+    contando as esperas de propagação sem dormir.
+    """
+    rows = []
+    for account in range(args.accounts):
+        for n in range(args.instances):
+            rows.append(InventoryRecord(f"account{account}", f"region-{n % 3}", f"i-{account:04x}{n:013x}",
+                                        f"bench-{n}", 'running',
+                                        'NO_ROLE' if n % 2 == 0 else f"app-role-{n % 10}", 'NO_SSM'))
+
+    no_role = sum(1 for row in rows if row.iam_role == 'NO_ROLE')
+    legacy_calls = no_role * 5 + (len(rows) - no_role)
+    legacy_time = legacy_calls * args.latency + no_role * 10
+
+    clients = {}
+    waited = []
+
+    def client_fn(profile, region, service):
+        return clients.setdefault(profile, StubRemediationClient(args.latency))
+
+    plans, _ = build_plan(rows)
+    remediator = Remediator(client_fn, workers=args.workers, sleep=waited.append)
+    start = time.perf_counter()
+    actions = list(remediator.run(plans))
+    elapsed = time.perf_counter() - start + sum(waited)
+    calls = sum(client.calls for client in clients.values())
+
+    print(f"=== Correção: {args.accounts} contas × {args.instances} instâncias NO_SSM, "
+          f"{args.latency * 1000:.0f} ms/chamada, {args.workers} workers ===\n")
+    print(f"{'modo':>10} {'chamadas':>9} {'roles criadas':>14} {'tempo (s)':>10}")
+    print(f"{'antigo':>10} {legacy_calls:>9} {no_role:>14} {legacy_time:>10.1f}")
+    print(f"{'plano':>10} {calls:>9} {args.accounts:>14} {elapsed:>10.1f}")
+    print(f"\nEspera de propagação: {sum(waited):.0f}s em {len(waited)} tentativas, {len(actions)} ações")
+
+
+class StubRunCommandClient:
+    """
+    SSM simulado para o Run Command.
+
+    Cada comando termina depois de `rounds` consultas a list_commands; as
+    instâncias cujo número termina em 7 falham.
+    """
+
+    def __init__(self, rounds=3):
+        self.rounds = rounds
+        self.calls = Counter()
+        self.commands = {}
+        self._lock = threading.Lock()
+
+    def send_command(self, InstanceIds=None, Targets=None, **kwargs):
+        with self._lock:
+            self.calls['send_command'] += 1
+            command_id = f"cmd-{len(self.commands)}"
+            self.commands[command_id] = {'instances': InstanceIds or [], 'polls': 0}
+        return {'Command': {'CommandId': command_id}}
+
+    def get_paginator(self, operation):
+        return types.SimpleNamespace(paginate=lambda **kwargs: getattr(self, f"_{operation}")(**kwargs))
+
+    def _status(self, command):
+        return 'Success' if command['polls'] >= self.rounds else 'InProgress'
+
+    def _list_commands(self, PaginationConfig, Filters=None):
+        with self._lock:
+            self.calls['list_commands'] += 1
+            for command in self.commands.values():
+                command['polls'] += 1
+            items = [{'CommandId': command_id, 'Status': self._status(command)}
+                     for command_id, command in self.commands.items()]
+        size = PaginationConfig['PageSize']
+        for start in range(0, max(len(items), 1), size):
+            if start:
+                self.calls['list_commands'] += 1
+            yield {'Commands': items[start:start + size]}
+
+    def _list_command_invocations(self, CommandId, PaginationConfig):
+        self.calls['list_command_invocations'] += 1
+        command = self.commands[CommandId]
+        status = self._status(command)
+        yield {'CommandInvocations': [
+            {'InstanceId': instance_id, 'Status': 'Failed' if instance_id.endswith('7') and status == 'Success'
+             else status}
+            for instance_id in command['instances']
+        ]}
+
+
+def bench_runcommand(args):
+    """
+    Chamadas de API para atualizar o agente de uma frota.
+
+    O fluxo por instância (um send_command e um get_command_invocation por
+    instância a cada rodada) é estimado; o despacho em lote é executado com o
+    SSM simulado.
+    """
+    targets = [Target(f"account{account}", f"region-{n % args.regions}", 'Windows' if n % 4 == 0 else 'Linux',
+                      f"i-{account:04x}{n:013x}")
+               for account in range(args.accounts) for n in range(args.instances)]
+    clients = {}
+
+    def client_fn(profile, region, service):
+        return clients.setdefault((profile, region), StubRunCommandClient(args.rounds))
+
+    dispatcher = Dispatcher(client_fn, sleep=lambda seconds: None)
+    document = {'DocumentName': 'AWS-RunShellScript'}
+    start = time.perf_counter()
+    dispatches, results = dispatcher.send(group_targets(targets), lambda platform: document)
+    results.extend(dispatcher.track(dispatches))
+    elapsed = time.perf_counter() - start
+
+    calls = Counter()
+    for client in clients.values():
+        calls.update(client.calls)
+    legacy = len(targets) * (1 + args.rounds)
+    statuses = Counter(result.status for result in results)
+
+    print(f"=== Run Command: {len(targets)} instâncias em {args.accounts} contas × {args.regions} regiões, "
+          f"{args.rounds} rodadas até concluir ===\n")
+    print(f"Por instância (estimado): {legacy} chamadas")
+    print(f"Em lote:                  {sum(calls.values())} chamadas ({elapsed:.2f}s sem latência)")
+    for operation, count in sorted(calls.items()):
+        print(f"  {operation}: {count}")
+    print("\nResultados: " + ", ".join(f"{status} {count}" for status, count in statuses.most_common()))
+
+
+def bench_snapshot(args):
+    """
+    Leitura das instâncias NO_SSM de um profile/região em um inventário grande.
+
+    - csv: csv.DictReader com a lista inteira em memória (como o enable_ssm.py fazia)
+    - snapshot: query filtrada no sqlite, um registro com __slots__ por vez
+    """
+    header = list(InventoryRecord.header)
+    rows = [[f"account{n % 20}", f"region-{n % 6}", f"i-{n:017x}", f"bench-{n}", 'running',
+             'NO_ROLE' if n % 3 == 0 else f"role-{n % 50}", 'NO_SSM' if n % 3 == 0 else 'OK']
+            for n in range(args.rows)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'ec2-inventory.csv')
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        with SnapshotStore(os.path.join(tmp, 'snapshot.sqlite')) as store:
+            snapshot_writer = store.writer(['inventory'])
+            snapshot_writer.add('inventory', rows)
+            snapshot_writer.commit()
+        del rows
+
+        def from_csv():
+            with open(csv_path) as f:
+                instances = list(csv.DictReader(f))
+            return [i for i in instances if i['Profile'] == 'account3' and i['Region'] == 'region-3'
+                    and i['SSM_Status'] == 'NO_SSM']
+
+        def from_snapshot():
+            with SnapshotStore(os.path.join(tmp, 'snapshot.sqlite')) as store:
+                return list(store.query('inventory', profile='account3', region='region-3', status='NO_SSM'))
+
+        print(f"=== Inventário de {args.rows} linhas: NO_SSM de account3/region-3 ===\n")
+        print(f"{'origem':>9} {'tempo (s)':>10} {'pico (KiB)':>11} {'linhas':>7}")
+        for label, fn in [('csv', from_csv), ('snapshot', from_snapshot)]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            selected = fn()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{label:>9} {elapsed:>10.3f} {peak / 1024:>11.0f} {len(selected):>7}")
+
+
+def bench_versions(args):
+    """
+    Drift e plano de atualização de `instances` agentes, como o scan.py faz a cada varredura.
+
+    - split: o critério antigo do install_ssm_via_runcommand.py (major < 3), por linha
+    - índice: VersionIndex + drift() + plan() + waves()
+    """
+    versions = [f"3.{minor}.{patch}.0" for minor in range(4) for patch in range(0, 2000, 100)] + ['2.3.1319.0']
+    # Da mais nova para a mais antiga: 85% nas três mais novas, o resto espalhado pelas antigas
+    newest_first = sorted(versions, key=agent_versions.parse_version, reverse=True)
+    weights = [50, 25, 10] + [15 / (len(versions) - 3)] * (len(versions) - 3)
+    rng = random.Random(args.seed)
+    chosen = rng.choices(newest_first, weights, k=args.instances)
+    rows = [[f"account{n % args.accounts}", f"region-{n % args.regions}", f"i-{n:017x}",
+             'Online' if n % 10 else 'ConnectionLost', chosen[n], 'Windows' if n % 9 == 0 else 'Linux']
+            for n in range(args.instances)]
+
+    def with_split():
+        outdated = []
+        for row in rows:
+            try:
+                if row[3] == 'Online' and int(row[4].split('.')[0]) < 3:
+                    outdated.append(row)
+            except ValueError:
+                pass
+        return len(outdated)
+
+    def with_index():
+        index = agent_versions.VersionIndex()
+        index.add_rows(rows)
+        drift = index.drift(args.min_version)
+        plan = index.plan(args.min_version)
+        planned = list(agent_versions.waves(plan, args.wave_size))
+        return drift, plan, planned
+
+    print(f"=== {args.instances} agentes, {len(versions)} versões, "
+          f"{args.accounts} contas × {args.regions} regiões ===\n")
+    for label, fn in [('split', with_split), ('índice', with_index)]:
+        agent_versions.parse_version.cache_clear()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if label == 'split':
+            print(f"{label:>7}: {elapsed * 1000:7.1f} ms, {result} desatualizados (major < 3)")
+            continue
+        drift, plan, planned = result
+        instances = sum(len(ids) for groups in planned for ids in groups.values())
+        print(f"{label:>7}: {elapsed * 1000:7.1f} ms, {instances} desatualizados em {len(plan)} grupos, "
+              f"{len(planned)} ondas")
+        for entry in drift:
+            print(f"         {entry.platform}: alvo {agent_versions.format_version(entry.target)}, "
+                  f"{entry.outdated}/{entry.total} desatualizados, {entry.mean_behind:.1f} versões atrás")
+        first = plan[0]
+        print(f"         primeiro grupo: {first.platform} {first.profile}/{first.region} "
+              f"{agent_versions.format_version(first.version)} ({len(first.instance_ids)} instâncias)")
+
+
+def bench_report(args):
+    """
+    report.py sobre um snapshot sintético de `rows` instâncias.
+
+    - laços: contagens por conta/região, versão e PingStatus e a lista de
+      pendentes com Counter, percorrendo os registros de snapshot.query()
+    - pandas: report.load_frames() + report.render() (Markdown completo)
+    """
+    import report
+    if not report.available():
+        print("❌ benchmark relatorio requer pandas: pip install pandas")
+        return 1
+
+    versions = [f"3.{minor}.{patch}.0" for minor in range(4) for patch in range(0, 2000, 250)] + ['2.3.1319.0', 'N/A']
+    pings = ['Online'] * 8 + ['ConnectionLost', 'Inactive']
+    inventory, agent, missing = [], [], []
+    for n in range(args.rows):
+        profile, region, instance_id = f"account{n % 20}", f"region-{n % 6}", f"i-{n:017x}"
+        state = 'running' if n % 5 else 'stopped'
+        role = 'NO_ROLE' if n % 7 == 0 else ('ERROR_ROLE' if n % 101 == 0 else f"role-{n % 50}")
+        status = 'OK' if role.startswith('role-') and n % 4 else 'NO_SSM'
+        inventory.append([profile, region, instance_id, f"bench-{n}", state, role, status])
+        if status == 'OK' and state == 'running' and n % 13:
+            agent.append([profile, region, instance_id, pings[n % len(pings)], versions[n % len(versions)],
+                          'Windows' if n % 9 == 0 else 'Linux'])
+        elif state == 'running':
+            missing.append([profile, region, instance_id, f"bench-{n}", 'No' if role == 'NO_ROLE' else 'Yes'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'snapshot.sqlite')
+        with SnapshotStore(path) as store:
+            snapshot_writer = store.writer(['inventory', 'agent', 'missing'])
+            snapshot_writer.add('inventory', inventory)
+            snapshot_writer.add('agent', agent)
+            snapshot_writer.add('missing', missing)
+            snapshot_writer.commit()
+        del inventory, agent, missing
+
+        def with_loops():
+            locations, by_version, by_ping, pending = Counter(), Counter(), Counter(), []
+            with SnapshotStore(path) as store:
+                for record in store.query('inventory'):
+                    locations[(record.profile, record.region, record.ssm_status)] += 1
+                    if record.ssm_status != 'OK':
+                        pending.append(record)
+                for record in store.query('agent'):
+                    by_version[(record.agent_version, record.platform_type)] += 1
+                    by_ping[(record.profile, record.ping_status)] += 1
+                pending_ids = {record.instance_id for record in pending}
+                pending.extend(record for record in store.query('missing') if record.instance_id not in pending_ids)
+            pending.sort(key=lambda record: (record.profile, record.region, record.instance_id))
+            return len(pending)
+
+        def with_pandas():
+            frames, written_at = report.load_frames(path, tmp)
+            loaded = time.perf_counter()
+            text = report.render(frames, written_at)
+            return loaded, text
+
+        print(f"=== Relatório de {args.rows} instâncias ===\n")
+        start = time.perf_counter()
+        pending = with_loops()
+        loops = time.perf_counter() - start
+        print(f"laços (só contagens): {loops:.3f}s, {pending} pendentes")
+
+        start = time.perf_counter()
+        loaded, text = with_pandas()
+        end = time.perf_counter()
+        print(f"pandas: carga {loaded - start:.3f}s + agregações/Markdown {end - loaded:.3f}s = "
+              f"{end - start:.3f}s ({len(text.splitlines())} linhas de Markdown)")
+
+
+def bench_history(args):
+    """
+    Consultas no histórico com `scans` varreduras de `rows` instâncias.
+
+    A cada varredura uma fração das instâncias NO_SSM é corrigida.
+    """
+    regions = ['sa-east-1', 'us-east-1', 'us-east-2']
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'snapshot.sqlite')
+        history = HistoryStore(os.path.join(tmp, 'history.sqlite'))
+        start = time.perf_counter()
+        for scan_number in range(args.scans):
+            inventory, agent = [], []
+            for n in range(args.rows):
+                fixed = n % 3 == 0 and n % args.scans < scan_number
+                ssm_status = 'OK' if n % 3 or fixed else 'NO_SSM'
+                row = [f"account{n % 20}", regions[n % 3], f"i-{n:017x}"]
+                inventory.append(row + [f"bench-{n}", 'running', 'role', ssm_status])
+                if ssm_status == 'OK':
+                    agent.append(row + ['Online', '3.2.582.0', 'Linux'])
+            with SnapshotStore(snapshot_path) as store:
+                writer = store.writer(['inventory', 'agent'])
+                writer.add('inventory', inventory)
+                writer.add('agent', agent)
+                writer.commit()
+            history.append_snapshot(snapshot_path, ['inventory', 'agent'], taken_at=scan_number * 86400.0)
+        loaded = time.perf_counter() - start
+
+        print(f"=== Histórico: {args.scans} varreduras × {args.rows} instâncias ({loaded:.1f}s para gravar) ===\n")
+        middle = args.scans // 2
+        queries = [
+            ("NO_SSM em sa-east-1 no meio do período",
+             lambda: list(history.query('inventory', middle + 1, region='sa-east-1', status='NO_SSM'))),
+            ("... e ainda fora do SSM na última varredura",
+             lambda: list(history.query('inventory', middle + 1, region='sa-east-1', status='NO_SSM',
+                                        still_not_online_in=args.scans))),
+            ("diff inventory primeira → última", lambda: history.diff('inventory', 1, args.scans)),
+            ("histórico de uma instância", lambda: history.timeline(f"i-{3:017x}")),
+        ]
+        for label, fn in queries:
+            start = time.perf_counter()
+            result = fn()
+            print(f"{label:<45} {(time.perf_counter() - start) * 1000:>8.1f} ms {len(result):>7} linhas")
+        history.close()
+
+
+def bench_watch(args):
+    """
+    watch.py contra a AWS local: carga inicial, vazão de eventos e reconciliação.
+
+    Uma fração `lost` das mudanças é feita sem evento; só a reconciliação as vê.
+    """
+    spec = FleetSpec(args.accounts, args.regions, args.instances)
+    aws = StandInAWS(spec)
+    queue_url = aws.enable_events()
+    pool = ClientPool(session_factory=aws.session, retry=configured_retry())
+    watcher = Watcher(pool.client, spec.profiles, spec.regions, queue_url=queue_url, consumers=args.consumers,
+                      reconcile_interval=0, log=lambda line: None)
+    watcher.resolve_accounts()
+
+    def divergences():
+        model = watcher.model.missing_ids()
+        return sum(len(model[key] ^ expected) for key, expected in aws.missing().items())
+
+    total = len(aws.instance_ids())
+    print(f"=== watch: {args.accounts} contas × {args.regions} regiões × {args.instances} instâncias "
+          f"({total} EC2), {args.consumers} consumidores ===\n")
+
+    calls = aws.total_calls()
+    start = time.perf_counter()
+    watcher.load()
+    print(f"Carga inicial:      {time.perf_counter() - start:>7.2f}s {aws.total_calls() - calls:>7} chamadas  "
+          f"{watcher.model.totals()['missing']} faltando, {divergences()} divergências")
+
+    rng = random.Random(args.seed)
+    instance_ids = aws.instance_ids()
+    lost = 0
+    watcher.start()
+    calls = aws.total_calls()
+    start = time.perf_counter()
+    for _ in range(args.events):
+        instance_id = rng.choice(instance_ids)
+        notify = rng.random() >= args.lost
+        lost += not notify
+        if aws.instance(instance_id)['State']['Name'] != 'running':
+            aws.set_state(instance_id, 'running', notify)
+        elif rng.random() < 0.3:
+            aws.set_state(instance_id, 'stopped', notify)
+        elif aws.in_ssm(instance_id):
+            aws.deregister_ssm(instance_id, notify)
+        else:
+            aws.register_ssm(instance_id, notify)
+    published = time.perf_counter() - start
+    while watcher.stats['events'] < aws.published:
+        time.sleep(0.01)
+    watcher.refresh_pending()
+    elapsed = time.perf_counter() - start
+    print(f"Eventos:            {elapsed:>7.2f}s {aws.total_calls() - calls:>7} chamadas  "
+          f"{aws.published} eventos ({aws.published / elapsed:,.0f}/s; publicados em {published:.2f}s), "
+          f"{watcher.stats['refresh']} instâncias buscadas em lote")
+    print(f"Mudanças sem evento: {lost}, divergências antes da reconciliação: {divergences()}")
+
+    calls = aws.total_calls()
+    start = time.perf_counter()
+    for profile, region in watcher.model.units:
+        watcher.reconcile(profile, region)
+    print(f"Reconciliação:      {time.perf_counter() - start:>7.2f}s {aws.total_calls() - calls:>7} chamadas  "
+          f"{watcher.stats['drift']} corrigidas, {divergences()} divergências")
+    watcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks da varredura com clientes AWS simulados")
+    sub = parser.add_subparsers(dest='bench')
+
+    scaling = sub.add_parser('escala', help="tempo total vs número de workers (padrão)")
+    scaling.add_argument('--accounts', type=int, default=10)
+    scaling.add_argument('--regions', type=int, default=4)
+    scaling.add_argument('--instances', type=int, default=10, help="instâncias por profile/região")
+    scaling.add_argument('--latency', type=float, default=0.02, help="segundos por chamada de API")
+    scaling.add_argument('--workers', default='1,2,4,8,16')
+    scaling.add_argument('--per-account', type=int, default=4)
+
+    pagination = sub.add_parser('paginacao', help="pico de memória dos coletores")
+    pagination.add_argument('--instances', type=int, default=10000)
+
+    payload = sub.add_parser('payload', help="bytes, parse e memória por filtro: dicts da API vs registros")
+    payload.add_argument('--instances', type=int, default=20000)
+
+    iam = sub.add_parser('iam', help="chamadas IAM por instância: direto vs cache vs lote")
+    iam.add_argument('--accounts', type=int, default=10)
+    iam.add_argument('--regions', type=int, default=4)
+    iam.add_argument('--instances', type=int, default=200, help="instâncias por profile/região")
+
+    policies = sub.add_parser('politicas', help="roles classificadas pelos documentos das policies vs pelo nome")
+    policies.add_argument('--accounts', type=int, default=40)
+    policies.add_argument('--roles', type=int, default=250, help="roles por conta")
+
+    pool = sub.add_parser('pool', help="custo de sessões/clientes boto3 com e sem pool")
+    pool.add_argument('--accounts', type=int, default=5)
+    pool.add_argument('--regions', type=int, default=2)
+
+    remediation = sub.add_parser('remediacao', help="enable_ssm.py: uma role por instância vs plano por conta")
+    remediation.add_argument('--accounts', type=int, default=5)
+    remediation.add_argument('--instances', type=int, default=200, help="instâncias NO_SSM por conta")
+    remediation.add_argument('--latency', type=float, default=0.02, help="segundos por chamada de API")
+    remediation.add_argument('--workers', type=int, default=8)
+
+    runcommand = sub.add_parser('runcommand', help="Run Command: por instância vs despacho em lote")
+    runcommand.add_argument('--accounts', type=int, default=5)
+    runcommand.add_argument('--regions', type=int, default=4)
+    runcommand.add_argument('--instances', type=int, default=2000, help="instâncias por conta")
+    runcommand.add_argument('--rounds', type=int, default=3, help="consultas até cada comando terminar")
+
+    snapshot_bench = sub.add_parser('snapshot', help="filtrar o inventário: CSV inteiro vs snapshot sqlite")
+    snapshot_bench.add_argument('--rows', type=int, default=200000)
+
+    history_bench = sub.add_parser('historico', help="consultas do history.py sobre várias varreduras")
+    history_bench.add_argument('--scans', type=int, default=28)
+    history_bench.add_argument('--rows', type=int, default=20000)
+
+    versions_bench = sub.add_parser('versoes', help="drift das versões do agente e plano de atualização")
+    versions_bench.add_argument('--instances', type=int, default=50000)
+    versions_bench.add_argument('--accounts', type=int, default=40)
+    versions_bench.add_argument('--regions', type=int, default=6)
+    versions_bench.add_argument('--min-version', default=None)
+    versions_bench.add_argument('--wave-size', type=int, default=500)
+    versions_bench.add_argument('--seed', type=int, default=0)
+
+    report_bench = sub.add_parser('relatorio', help="report.py: snapshot -> DataFrames -> Markdown")
+    report_bench.add_argument('--rows', type=int, default=100000)
+
+    watch_bench = sub.add_parser('watch', help="watch.py: eventos via SQS e reconciliação (AWS local)")
+    watch_bench.add_argument('--accounts', type=int, default=3)
+    watch_bench.add_argument('--regions', type=int, default=2)
+    watch_bench.add_argument('--instances', type=int, default=2000, help="instâncias por conta/região")
+    watch_bench.add_argument('--events', type=int, default=20000, help="mudanças na frota")
+    watch_bench.add_argument('--lost', type=float, default=0.01, help="fração das mudanças sem evento")
+    watch_bench.add_argument('--consumers', type=int, default=4)
+    watch_bench.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.bench == 'watch':
+        return bench_watch(args)
+    if args.bench == 'versoes':
+        return bench_versions(args)
+    if args.bench == 'relatorio':
+        return bench_report(args)
+    if args.bench == 'historico':
+        return bench_history(args)
+    if args.bench == 'snapshot':
+        return bench_snapshot(args)
+    if args.bench == 'runcommand':
+        return bench_runcommand(args)
+    if args.bench == 'remediacao':
+        return bench_remediation(args)
+    if args.bench == 'pool':
+        return bench_pool(args)
+    if args.bench == 'paginacao':
+        return bench_pagination(args)
+    if args.bench == 'payload':
+        return bench_payload(args)
+    if args.bench == 'iam':
+        return bench_iam(args)
+    if args.bench == 'politicas':
+        return bench_policies(args)
+    if args.bench is None:
+        args = parser.parse_args(['escala'])
+    return bench_scaling(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ponta a ponta: roda o main() de cada script contra a AWS local
+de aws_standin.py.
+
+A frota sintética tem N contas × M regiões × K instâncias, com instâncias
+com role SSM, sem role, com role sem SSM e paradas, agentes atuais e
+desatualizados. A latência de cada chamada e uma taxa de throttling são
+injetadas, então o rate limiter e o retry trabalham como em produção.
+
+Cada script roda em um processo filho (fork), na ordem do fluxo normal, com
+DATA_DIR em um diretório temporário; o filho que modifica a frota
+(enable_ssm.py) não afeta os seguintes. Por script são medidos:
+
+- tempo total
+- chamadas por serviço (e throttlings injetados)
+- pico de memória (RSS) do processo
+- sha256 de cada CSV gerado
+
+Com --source aggregator, check_ssm_status.py e compare_ec2_ssm.py leem o
+inventário do agregador do AWS Config simulado; comparados com um baseline
+da varredura direta, os CSVs devem continuar idênticos.
+
+Com --discovery, as contas vêm do Organizations simulado e cada script usa
+as credenciais de AssumeRole do cache em disco: só o primeiro faz chamadas
+ao STS.
+
+Com --baseline, os números são comparados com uma execução anterior gravada
+por --save-baseline: diferença de tempo, de chamadas e se os CSVs continuam
+idênticos. O código de saída é 1 se algum script falhar ou algum CSV mudar.
+
+Uso:
+    python3 benchmark_suite.py --accounts 5 --regions 3 --instances 200
+    python3 benchmark_suite.py --latency 0.02 --throttle 0.05 --save-baseline ../data/bench-baseline.json
+    python3 benchmark_suite.py --baseline ../data/bench-baseline.json
+    python3 benchmark_suite.py --source aggregator --baseline ../data/bench-baseline.json
+    python3 benchmark_suite.py --discovery --baseline ../data/bench-baseline.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+from contextlib import redirect_stdout
+
+from aws_standin import FleetSpec, StandInAWS
+
+# (nome, módulo, argumentos de main, sys.argv)
+STEPS = [
+    ('scan', 'scan', ([],), None),
+    ('check_ssm_status', 'check_ssm_status', ([],), None),
+    ('check_ssm_agent', 'check_ssm_agent', ([],), None),
+    ('compare_ec2_ssm', 'compare_ec2_ssm', ([],), None),
+    ('enable_ssm', 'enable_ssm', (), ['enable_ssm.py']),
+    ('install_ssm_via_runcommand', 'install_ssm_via_runcommand', (), ['install_ssm_via_runcommand.py']),
+]
+
+# Scripts que aceitam --source aggregator (os CSVs devem ser idênticos aos da varredura direta)
+AGGREGATOR_STEPS = ('check_ssm_status', 'compare_ec2_ssm')
+
+
+def aggregator_steps():
+    """STEPS com --source aggregator nos scripts de AGGREGATOR_STEPS."""
+    return [(name, module_name, (['--source', 'aggregator'],) if name in AGGREGATOR_STEPS else args, argv)
+            for name, module_name, args, argv in STEPS]
+
+
+def install_config(aws, data_dir, discovery=False):
+    """
+    Coloca um config.py sintético em sys.modules antes de importar os scripts.
+
+    O cache IAM em disco fica desligado para que cada script faça as mesmas
+    chamadas em toda execução. Com `discovery`, as contas vêm do Organizations
+    simulado e as credenciais do AssumeRole ficam no cache em disco,
+    compartilhado pelos scripts.
+    """
+    config = types.ModuleType('config')
+    config.PROFILES = list(aws.spec.profiles)
+    config.REGIONS = list(aws.spec.regions)
+    config.SSM_POLICIES = ['AmazonSSMManagedInstanceCore', 'AmazonEC2RoleforSSM']
+    config.DATA_DIR = data_dir
+    config.IAM_CACHE_FILE = None
+    config.RUN_COMMAND_POLL_INTERVAL = 0.05
+    config.AGGREGATOR_NAME = 'standin-aggregator'
+    config.AGGREGATOR_ACCOUNTS = {iam['account_id']: profile for profile, iam in aws.iam.items()}
+    if discovery:
+        config.ORG_ROLE_NAME = 'SSMScanRole'
+        config.ORG_PROFILE = aws.spec.profiles[0]
+        config.ORG_CREDENTIAL_CACHE = 'sts-cache.sqlite'
+    sys.modules['config'] = config
+    return config
+
+
+def csv_digests(data_dir):
+    digests = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith('.csv'):
+            with open(os.path.join(data_dir, name), 'rb') as f:
+                digests[name] = (os.stat(f.fileno()).st_mtime_ns, hashlib.sha256(f.read()).hexdigest())
+    return digests
+
+
+def run_step(aws, data_dir, module_name, args, argv, conn):
+    """Executado no processo filho: roda o main() e envia as medições pelo pipe."""
+    import importlib
+
+    import org_accounts
+    org_accounts.source_session = aws.session
+    org_accounts.refreshable_session = aws.assumed_session
+
+    import aws_clients
+
+    # Com --discovery, o discover_accounts() do main() troca pelas sessões do AssumeRole
+    aws_clients.POOL.session_factory = aws.session
+    before = csv_digests(data_dir)
+    error = None
+    output = io.StringIO()
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+        if argv is not None:
+            sys.argv = argv
+        with redirect_stdout(output):
+            module.main(*args)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"SystemExit({e.code})"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+
+    after = csv_digests(data_dir)
+    conn.send({
+        'wall': wall,
+        'calls': dict(aws.calls),
+        'throttled': sum(aws.throttled.values()),
+        'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'csv': {name: digest for name, (mtime, digest) in after.items() if before.get(name, (None,))[0] != mtime},
+        'error': error,
+        'output': output.getvalue()[-2000:] if error else '',
+    })
+    conn.close()
+
+
+def run_suite(aws, data_dir, steps=STEPS):
+    """Roda os scripts em ordem, cada um em um processo filho."""
+    context = multiprocessing.get_context('fork')
+    results = {}
+    for name, module_name, args, argv in steps:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_step, args=(aws, data_dir, module_name, args, argv, sender))
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = {'wall': 0.0, 'calls': {}, 'throttled': 0, 'rss_kb': 0, 'csv': {},
+                      'error': f"processo encerrado (exit code {process.exitcode})", 'output': ''}
+        process.join()
+        services = Counter()
+        for operation, count in result.pop('calls').items():
+            services[operation.split(':')[0]] += count
+        result['services'] = dict(services)
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, params):
+    """
+    Imprime a tabela de resultados, comparando com o baseline se houver.
+
+    Returns:
+        bool: True se nenhum script falhou e nenhum CSV mudou
+    """
+    ok = True
+    steps = baseline.get('steps', {}) if baseline else {}
+    same_params = baseline is not None and baseline.get('params') == params
+    if baseline is not None and not same_params:
+        print("⚠️  Baseline gerado com outra frota/parâmetros: CSVs não comparados")
+        print(f"   baseline: {baseline.get('params')}")
+        print()
+
+    print(f"{'script':<28}{'tempo':>9}{'Δ tempo':>10}{'chamadas':>10}{'Δ':>7}{'RSS MiB':>9}  CSV")
+    for name, result in results.items():
+        reference = steps.get(name)
+        calls = sum(result['services'].values())
+        wall_delta = calls_delta = ''
+        if reference:
+            if reference['wall']:
+                wall_delta = f"{(result['wall'] - reference['wall']) / reference['wall'] * 100:+.0f}%"
+            calls_delta = f"{calls - sum(reference['services'].values()):+d}"
+
+        if result['error']:
+            ok = False
+            csv_status = f"❌ {result['error']}"
+        elif reference and same_params:
+            changed = sorted(csv for csv, digest in result['csv'].items() if reference['csv'].get(csv) != digest)
+            missing = sorted(set(reference['csv']) - set(result['csv']))
+            if changed or missing:
+                ok = False
+                csv_status = f"❌ diferente: {', '.join(changed + missing)}"
+            elif result['csv']:
+                csv_status = f"✅ {len(result['csv'])} idênticos"
+            else:
+                csv_status = "sem CSV"
+        else:
+            csv_status = f"{len(result['csv'])} gerados"
+
+        print(f"{name:<28}{result['wall']:>8.2f}s{wall_delta:>10}{calls:>10}{calls_delta:>7}"
+              f"{result['rss_kb'] / 1024:>9.1f}  {csv_status}")
+
+    print()
+    for name, result in results.items():
+        services = ', '.join(f"{service} {count}" for service, count in sorted(result['services'].items()))
+        print(f"  {name}: {services or 'nenhuma chamada'} ({result['throttled']} throttlings injetados)")
+        if result['output']:
+            print(result['output'])
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos scripts contra uma AWS local simulada")
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--regions', type=int, default=2)
+    parser.add_argument('--instances', type=int, default=100, help="instâncias por conta/região")
+    parser.add_argument('--latency', type=float, default=0.0, help="segundos por chamada")
+    parser.add_argument('--throttle', type=float, default=0.0, help="fração das chamadas com throttling")
+    parser.add_argument('--propagation', type=int, default=0,
+                        help="associações recusadas antes de um instance profile novo propagar")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', choices=('direct', 'aggregator'), default='direct',
+                        help=f"inventário de {', '.join(AGGREGATOR_STEPS)} (compare com um baseline direct)")
+    parser.add_argument('--discovery', action='store_true',
+                        help="contas pelo Organizations e credenciais de AssumeRole em cache (ORG_ROLE_NAME)")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--save-baseline', metavar='ARQUIVO', help="grava o resultado desta execução")
+    args = parser.parse_args()
+
+    params = {'accounts': args.accounts, 'regions': args.regions, 'instances': args.instances,
+              'propagation': args.propagation}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    spec = FleetSpec(args.accounts, args.regions, args.instances)
+    aws = StandInAWS(spec, latency=args.latency, throttle_rate=args.throttle,
+                     propagation=args.propagation, seed=args.seed)
+    total = args.accounts * args.regions * args.instances
+    print(f"=== Benchmark: {args.accounts} contas × {args.regions} regiões × {args.instances} instâncias "
+          f"({total} EC2), latência {args.latency * 1000:.0f}ms, throttling {args.throttle:.0%} ===\n")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        install_config(aws, data_dir, discovery=args.discovery)
+        results = run_suite(aws, data_dir, aggregator_steps() if args.source == 'aggregator' else STEPS)
+    ok = compare(results, baseline, params)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'params': params, 'steps': results}, f, indent=2, sort_keys=True)
+        print(f"\nBaseline salvo em: {args.save_baseline}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Journal de checkpoint para retomar varreduras e correções interrompidas.
+
+Se as credenciais SSO expiravam ou o processo morria no meio de uma
+varredura de dezenas de contas, tudo recomeçava do zero; o enable_ssm.py não
+tinha registro das instâncias já corrigidas além do log capturado à mão.
+
+O journal é um arquivo JSON lines em data/, acrescentado (append-only) a cada
+trabalho concluído, no momento em que termina:
+
+- scan.py:       data/scan-checkpoint.jsonl, um registro por par (profile,
+                 região) sem erro, com o RegionScan completo
+- enable_ssm.py: data/enable-ssm-checkpoint.jsonl, um registro por instância
+                 associada ou role corrigida
+
+A primeira linha identifica a execução (assinatura: saídas pedidas, modo,
+snapshot de origem). Com --resume, um journal da mesma assinatura é relido:
+o trabalho registrado é pulado (a varredura repete as linhas guardadas, para
+que CSVs e snapshot saiam completos) e só o restante roda. Trabalho com erro
+nunca é registrado, então é repetido. Sem --resume, ou com outra assinatura,
+o journal recomeça vazio. Uma linha cortada pela queda do processo é
+descartada na leitura.
+
+Quando tudo termina sem erro o journal é apagado.
+"""
+
+import json
+import os
+import threading
+import time
+
+SCAN_FILE = 'scan-checkpoint.jsonl'
+REMEDIATION_FILE = 'enable-ssm-checkpoint.jsonl'
+
+
+def _read(path):
+    """(cabeçalho, lista de (chave, valor)) das linhas válidas do journal."""
+    header, entries = None, []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # Última linha incompleta (processo interrompido durante a escrita)
+                    break
+                if header is None:
+                    header = item
+                else:
+                    entries.append((tuple(item['key']), item.get('value')))
+    except FileNotFoundError:
+        pass
+    return header, entries
+
+
+class Journal:
+    """
+    Journal append-only de trabalho concluído.
+
+    Args:
+        path: Arquivo .jsonl
+        signature: Identifica a execução (valor serializável em JSON); um
+            journal com outra assinatura não é retomado
+        resume: Reaproveita o journal existente (--resume)
+
+    Attributes:
+        done: Dict chave (tupla) -> valor registrado
+        resumed: Quantos registros vieram da execução anterior
+    """
+
+    def __init__(self, path, signature, resume=False):
+        self.path = path
+        self.signature = signature
+        self.done = {}
+        self.stale = False
+        self._lock = threading.Lock()
+
+        header, entries = _read(path) if resume else (None, [])
+        if header is not None and header.get('signature') != signature:
+            # Journal de outra execução (outras saídas ou outro snapshot)
+            self.stale = True
+            header, entries = None, []
+        if header is None:
+            header = {'signature': signature, 'started_at': time.time()}
+        self.done.update(entries)
+        self.resumed = len(self.done)
+
+        # Reescreve só as linhas válidas antes de voltar a acrescentar
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(header, separators=(',', ':')) + '\n')
+            for key, value in self.done.items():
+                f.write(self._line(key, value))
+        os.replace(tmp_path, path)
+        self._file = open(path, 'a')
+
+    @staticmethod
+    def _line(key, value):
+        return json.dumps({'key': list(key), 'value': value}, separators=(',', ':')) + '\n'
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def get(self, key, default=None):
+        return self.done.get(key, default)
+
+    def record(self, key, value=None):
+        """Registra um trabalho concluído; a linha vai para o disco na hora (thread-safe)."""
+        line = self._line(key, value)
+        with self._lock:
+            self.done[key] = value
+            if self._file:
+                self._file.write(line)
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Fecha e apaga o journal (execução concluída sem erros)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
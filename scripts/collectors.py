@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Coletores paginados de instâncias EC2 e SSM.
+
+describe_instances e describe_instance_information devolvem no máximo uma
+página por chamada; sem paginator, contas com muitas instâncias eram
+truncadas silenciosamente. Os coletores abaixo usam os paginators do boto3 e
+produzem uma instância por vez, então só uma página fica em memória.
+
+Nenhuma das duas APIs tem projeção de campos: cada instância vem com block
+devices, interfaces de rede, security groups etc. Por isso:
+- os filtros (estado, tags, instance id) vão para a API em Filters, e o que
+  não interessa nem chega a ser transferido
+- cada página é convertida na hora em registros mínimos (Ec2Instance,
+  SsmInstance, com __slots__) com os campos que os scripts leem; os dicts
+  da resposta são liberados junto com a página
+
+O tamanho da página (MaxResults) é ajustável:
+    - EC2 describe_instances: 5 a 1000
+    - SSM describe_instance_information: 5 a 50
+    - SSM list_commands / list_command_invocations: 1 a 50
+    - Config select_aggregate_resource_config (Limit): 1 a 100
+"""
+
+import json
+
+EC2_PAGE_SIZE = 1000
+SSM_PAGE_SIZE = 50
+COMMAND_PAGE_SIZE = 50
+CONFIG_PAGE_SIZE = 100
+
+# Valores por filtro InstanceIds do describe_instance_information
+SSM_FILTER_BATCH = 50
+
+
+def instance_name(tags):
+    """Valor da tag Name em uma lista de (chave, valor), ou N/A."""
+    for key, value in tags:
+        if key == 'Name':
+            return value
+    return "N/A"
+
+
+class Ec2Instance:
+    """Campos de describe_instances usados pelos scripts."""
+
+    __slots__ = ('instance_id', 'state', 'name', 'instance_profile_arn', 'launch_time', 'tags')
+
+    def __init__(self, instance_id, state, tags=(), instance_profile_arn=None, launch_time=None):
+        self.instance_id = instance_id
+        self.state = state
+        self.tags = tuple(tags)
+        self.name = instance_name(self.tags)
+        self.instance_profile_arn = instance_profile_arn
+        self.launch_time = launch_time
+
+    @classmethod
+    def from_api(cls, instance):
+        return cls(
+            instance['InstanceId'],
+            instance['State']['Name'],
+            [(tag['Key'], tag['Value']) for tag in instance.get('Tags') or ()],
+            (instance.get('IamInstanceProfile') or {}).get('Arn'),
+            instance.get('LaunchTime'),
+        )
+
+
+class SsmInstance:
+    """Campos de describe_instance_information usados pelos scripts."""
+
+    __slots__ = ('instance_id', 'ping_status', 'agent_version', 'platform_type')
+
+    def __init__(self, instance_id, ping_status=None, agent_version='N/A', platform_type='N/A'):
+        self.instance_id = instance_id
+        self.ping_status = ping_status
+        self.agent_version = agent_version
+        self.platform_type = platform_type
+
+    @classmethod
+    def from_api(cls, info):
+        return cls(info['InstanceId'], info.get('PingStatus'), info.get('AgentVersion', 'N/A'),
+                   info.get('PlatformType', 'N/A'))
+
+
+def instance_filters(states=None, tags=None, instance_ids=None):
+    """
+    Filters do describe_instances.
+
+    Args:
+        states: Estados aceitos (instance-state-name), ex: ['running']
+        tags: dict tag -> lista de valores aceitos
+        instance_ids: Só estas instâncias (filtro instance-id)
+
+    Returns:
+        list ou None se não houver filtro
+    """
+    filters = []
+    if instance_ids:
+        filters.append({'Name': 'instance-id', 'Values': list(instance_ids)})
+    if states:
+        filters.append({'Name': 'instance-state-name', 'Values': list(states)})
+    for key, values in sorted((tags or {}).items()):
+        filters.append({'Name': f"tag:{key}", 'Values': list(values)})
+    return filters or None
+
+
+def ec2_page_instances(page):
+    """Registros de uma página de describe_instances."""
+    return [Ec2Instance.from_api(instance)
+            for reservation in page['Reservations'] for instance in reservation['Instances']]
+
+
+def ssm_page_instances(page):
+    """Registros de uma página de describe_instance_information."""
+    return [SsmInstance.from_api(info) for info in page['InstanceInformationList']]
+
+
+def iter_ec2_instances(ec2_client, filters=None, page_size=EC2_PAGE_SIZE):
+    """
+    Percorre todas as instâncias de describe_instances.
+
+    Args:
+        ec2_client: Cliente boto3 do EC2
+        filters: Lista de Filters da API (opcional, ver instance_filters)
+        page_size: MaxResults de cada página
+
+    Yields:
+        Ec2Instance
+    """
+    paginator = ec2_client.get_paginator('describe_instances')
+    kwargs = {'PaginationConfig': {'PageSize': page_size}}
+    if filters:
+        kwargs['Filters'] = filters
+
+    for page in paginator.paginate(**kwargs):
+        instances = ec2_page_instances(page)
+        # Libera a página inteira antes de entregar os registros
+        del page
+        yield from instances
+
+
+def iter_ssm_instances(ssm_client, filters=None, page_size=SSM_PAGE_SIZE, instance_ids=None):
+    """
+    Percorre todas as instâncias de describe_instance_information.
+
+    Args:
+        ssm_client: Cliente boto3 do SSM
+        filters: Lista de Filters da API (opcional)
+        page_size: MaxResults de cada página
+        instance_ids: Só estas instâncias (filtro InstanceIds, em lotes de SSM_FILTER_BATCH)
+
+    Yields:
+        SsmInstance
+    """
+    if instance_ids is not None:
+        ids = list(instance_ids)
+        for start in range(0, len(ids), SSM_FILTER_BATCH):
+            batch = [{'Key': 'InstanceIds', 'Values': ids[start:start + SSM_FILTER_BATCH]}]
+            yield from iter_ssm_instances(ssm_client, (filters or []) + batch, page_size)
+        return
+
+    paginator = ssm_client.get_paginator('describe_instance_information')
+    kwargs = {'PaginationConfig': {'PageSize': page_size}}
+    if filters:
+        kwargs['Filters'] = filters
+
+    for page in paginator.paginate(**kwargs):
+        instances = ssm_page_instances(page)
+        del page
+        yield from instances
+
+
+def iter_commands(ssm_client, filters=None, page_size=COMMAND_PAGE_SIZE):
+    """
+    Percorre os comandos do Run Command da região (list_commands).
+
+    Args:
+        ssm_client: Cliente boto3 do SSM
+        filters: Lista de Filters da API (ex: InvokedAfter)
+        page_size: MaxResults de cada página
+
+    Yields:
+        dict: Item de Commands
+    """
+    paginator = ssm_client.get_paginator('list_commands')
+    kwargs = {'PaginationConfig': {'PageSize': page_size}}
+    if filters:
+        kwargs['Filters'] = filters
+
+    for page in paginator.paginate(**kwargs):
+        for command in page['Commands']:
+            yield command
+
+
+def iter_command_invocations(ssm_client, command_id, page_size=COMMAND_PAGE_SIZE):
+    """
+    Percorre as invocações (uma por instância) de um comando.
+
+    Yields:
+        dict: Item de CommandInvocations
+    """
+    paginator = ssm_client.get_paginator('list_command_invocations')
+    for page in paginator.paginate(CommandId=command_id, PaginationConfig={'PageSize': page_size}):
+        for invocation in page['CommandInvocations']:
+            yield invocation
+
+
+def iter_aggregate_resources(config_client, aggregator_name, expression, page_size=CONFIG_PAGE_SIZE):
+    """
+    Percorre o resultado de uma consulta SQL no agregador do AWS Config.
+
+    Args:
+        config_client: Cliente boto3 do Config (conta/região do agregador)
+        aggregator_name: ConfigurationAggregatorName
+        expression: Consulta (SELECT ... WHERE resourceType = ...)
+        page_size: Limit de cada página
+
+    Yields:
+        dict: Um item de Results, já decodificado do JSON
+    """
+    paginator = config_client.get_paginator('select_aggregate_resource_config')
+    pages = paginator.paginate(Expression=expression, ConfigurationAggregatorName=aggregator_name,
+                               PaginationConfig={'PageSize': page_size})
+    for page in pages:
+        for result in page['Results']:
+            yield json.loads(result)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Estado da última varredura para o modo incremental (scan.py --incremental).
+
+Para cada instância do inventário é guardada uma impressão digital dos campos
+que afetam a classificação (LaunchTime, estado, instance profile associado e
+tags), a impressão das policies da role e a classificação obtida. Na próxima
+varredura, instâncias com as mesmas impressões reaproveitam a classificação
+anterior sem consultar o IAM; só as que mudaram (ou cuja role teve policies
+alteradas) são reavaliadas.
+
+Toda entrada é reavaliada depois de INCREMENTAL_MAX_AGE segundos, o que limita
+o tempo que uma mudança não detectável pelo EC2 (ex: policy anexada à role sem
+IAM em lote) pode passar despercebida.
+
+O estado fica em data/scan-state.json.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_MAX_AGE = 86400
+
+# Tipos de mudança registrados no change log
+NEW = 'NEW'
+FIXED = 'FIXED'
+REGRESSED = 'REGRESSED'
+REMOVED = 'REMOVED'
+
+CHANGES_HEADER = ['Change', 'Profile', 'Region', 'InstanceId', 'Name', 'Previous_SSM_Status', 'SSM_Status']
+
+
+def _digest(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def instance_fingerprint(instance):
+    """Impressão dos campos da instância (collectors.Ec2Instance) que afetam a classificação SSM."""
+    return _digest([str(instance.launch_time), instance.state, instance.instance_profile_arn,
+                    sorted(instance.tags)])
+
+
+def role_fingerprint(instance, index):
+    """
+    Impressão das policies da role da instância, a partir do IamIndex da conta.
+
+    Cobre as policies gerenciadas anexadas (e a versão padrão das da conta), as
+    inline e a permission boundary.
+
+    Sem índice (IAM em lote indisponível) retorna None: a mudança de policies
+    só é percebida quando a entrada expira.
+    """
+    if index is None or not instance.instance_profile_arn:
+        return None
+    role_name = index.role_for_instance_profile(instance.instance_profile_arn)
+    detail = index.role_detail(role_name)
+    versions = [index.local_policies.get(arn, (None,))[0] for arn, _ in detail.attached]
+    return _digest([role_name, sorted(index.attached_policies(role_name)), versions, sorted(detail.inline),
+                    detail.boundary])
+
+
+class DeltaState:
+    """
+    Estado por (profile, região) -> InstanceId -> entrada.
+
+    Cada entrada guarda: fp, role_fp, name, iam_role, ssm_status, checked_at.
+    """
+
+    def __init__(self, units=None):
+        self.units = units or {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls({tuple(key.split('|', 1)): entries for key, entries in data['units'].items()})
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'units': {'|'.join(key): entries for key, entries in self.units.items()}}, f)
+        os.replace(tmp_path, path)
+
+    def unit(self, profile, region):
+        return self.units.get((profile, region), {})
+
+
+def reusable(entry, instance, index, max_age, now=None):
+    """Retorna (IAM_Role, SSM_Status) da varredura anterior, se nada mudou."""
+    if not entry:
+        return None
+    now = now or time.time()
+    if now - entry['checked_at'] > max_age:
+        return None
+    if entry['fp'] != instance_fingerprint(instance) or entry['role_fp'] != role_fingerprint(instance, index):
+        return None
+    return entry['iam_role'], entry['ssm_status']
+
+
+def changes(profile, region, previous, current):
+    """
+    Compara as entradas anteriores e atuais de um par (profile, região).
+
+    Returns:
+        list: Linhas do change log (CHANGES_HEADER)
+    """
+    rows = []
+    for instance_id, entry in current.items():
+        before = previous.get(instance_id)
+        if before is None:
+            change = NEW
+        elif before['ssm_status'] != 'OK' and entry['ssm_status'] == 'OK':
+            change = FIXED
+        elif before['ssm_status'] == 'OK' and entry['ssm_status'] != 'OK':
+            change = REGRESSED
+        else:
+            continue
+        rows.append([change, profile, region, instance_id, entry['name'],
+                     before['ssm_status'] if before else '', entry['ssm_status']])
+
+    for instance_id in sorted(set(previous) - set(current)):
+        entry = previous[instance_id]
+        rows.append([REMOVED, profile, region, instance_id, entry['name'], entry['ssm_status'], ''])
+    return rows
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Histórico das varreduras (data/history.sqlite) e consultas sobre ele.
+
+A cada execução, o scan.py copia o snapshot recém-gravado (snapshot.py) para
+o histórico, com o horário da varredura. As tabelas inventory / agent /
+missing guardam o scan_id de cada linha e são indexadas por InstanceId,
+profile/região e status, então as consultas abaixo respondem em
+milissegundos sem acessar a AWS:
+
+    python3 history.py scans
+    python3 history.py query inventory --region sa-east-1 --status NO_SSM --at 2026-10-13
+    python3 history.py query inventory --region sa-east-1 --status NO_SSM --at 2026-10-13 --still-not-online
+    python3 history.py diff inventory --from 2026-10-06 --to 2026-10-13
+    python3 history.py instance i-0123456789abcdef0
+
+--at / --from / --to aceitam AAAA-MM-DD (fim do dia), AAAA-MM-DDTHH:MM ou
+Nd (N dias atrás) e usam a última varredura até aquele momento.
+HISTORY_RETENTION_DAYS (config.py) descarta varreduras antigas.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import snapshot
+from snapshot import RECORD_TYPES
+
+DEFAULT_FILE = 'history.sqlite'
+
+SCHEMA_VERSION = 1
+
+
+def configured_path():
+    """Caminho do histórico conforme HISTORY_FILE do config.py; None desativa."""
+    try:
+        import config
+    except ImportError:
+        config = None
+    history_file = getattr(config, 'HISTORY_FILE', DEFAULT_FILE)
+    return os.path.join(snapshot.data_dir(), history_file) if history_file else None
+
+
+def configured_retention():
+    try:
+        import config
+    except ImportError:
+        return None
+    return getattr(config, 'HISTORY_RETENTION_DAYS', None)
+
+
+def parse_when(value, now=None):
+    """
+    Converte AAAA-MM-DD, AAAA-MM-DDTHH:MM ou Nd em timestamp.
+
+    Uma data sem horário vale até o fim do dia.
+    """
+    now = now or datetime.now()
+    if value.endswith('d') and value[:-1].isdigit():
+        return (now - timedelta(days=int(value[:-1]))).timestamp()
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M').timestamp()
+    except ValueError:
+        pass
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value} (use AAAA-MM-DD, AAAA-MM-DDTHH:MM ou Nd)")
+    return (day + timedelta(days=1)).timestamp() - 0.001
+
+
+class HistoryStore:
+    """
+    Varreduras anteriores, uma cópia do snapshot por scan_id.
+
+    Args:
+        path: Arquivo sqlite (criado se não existir)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        tables = self._db.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        if tables and version != SCHEMA_VERSION:
+            self._db.close()
+            raise snapshot.SnapshotVersionError(f"{path}: versão {version}, esperada {SCHEMA_VERSION}")
+        self._create()
+
+    def _create(self):
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scans ("
+                " scan_id INTEGER PRIMARY KEY, taken_at REAL, kinds TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS scans_taken_at ON scans (taken_at)")
+            for kind, record_type in RECORD_TYPES.items():
+                columns = ', '.join(f"{field} TEXT" for field in record_type.fields)
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {kind} (scan_id INTEGER, {columns})")
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {kind}_instance ON {kind} (instance_id, scan_id)")
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS {kind}_location ON {kind} (scan_id, profile, region)")
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS {kind}_status ON {kind} (scan_id, {record_type.status_field})")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append_snapshot(self, snapshot_path, kinds, taken_at=None):
+        """
+        Copia as tabelas `kinds` do snapshot como uma nova varredura.
+
+        Returns:
+            int: scan_id da varredura
+        """
+        if taken_at is None:
+            taken_at = time.time()
+        self._db.execute("ATTACH DATABASE ? AS snap", (snapshot_path,))
+        try:
+            with self._db:
+                cursor = self._db.execute("INSERT INTO scans (taken_at, kinds) VALUES (?, ?)",
+                                          (taken_at, ','.join(kinds)))
+                scan_id = cursor.lastrowid
+                for kind in kinds:
+                    fields = ', '.join(RECORD_TYPES[kind].fields)
+                    self._db.execute(
+                        f"INSERT INTO {kind} (scan_id, {fields}) SELECT ?, {fields} FROM snap.{kind} ORDER BY rowid",
+                        (scan_id,))
+        finally:
+            self._db.execute("DETACH DATABASE snap")
+        return scan_id
+
+    def prune(self, days):
+        """Remove as varreduras com mais de `days` dias."""
+        cutoff = time.time() - days * 86400
+        with self._db:
+            old = [row[0] for row in self._db.execute("SELECT scan_id FROM scans WHERE taken_at < ?", (cutoff,))]
+            for kind in RECORD_TYPES:
+                self._db.executemany(f"DELETE FROM {kind} WHERE scan_id = ?", [(scan_id,) for scan_id in old])
+            self._db.execute("DELETE FROM scans WHERE taken_at < ?", (cutoff,))
+        return len(old)
+
+    def scans(self):
+        """Lista de (scan_id, taken_at, kinds), da mais antiga para a mais recente."""
+        return self._db.execute("SELECT scan_id, taken_at, kinds FROM scans ORDER BY taken_at").fetchall()
+
+    def scan_at(self, kind, when=None):
+        """Última varredura com `kind` até `when` (None: a mais recente); None se não houver."""
+        sql = "SELECT scan_id, taken_at FROM scans WHERE (',' || kinds || ',') LIKE ?"
+        params = [f"%,{kind},%"]
+        if when is not None:
+            sql += " AND taken_at <= ?"
+            params.append(when)
+        return self._db.execute(sql + " ORDER BY taken_at DESC LIMIT 1", params).fetchone()
+
+    def query(self, kind, scan_id, profile=None, region=None, status=None, instance_id=None,
+              still_not_online_in=None):
+        """
+        Registros de uma varredura, filtrados nos índices.
+
+        Args:
+            still_not_online_in: scan_id de uma varredura agent; mantém só as
+                instâncias que não estavam Online nela
+
+        Yields:
+            Record
+        """
+        record_type = RECORD_TYPES[kind]
+        clauses, params = ["t.scan_id = ?"], [scan_id]
+        for column, value in (('profile', profile), ('region', region), ('instance_id', instance_id),
+                              (record_type.status_field, status)):
+            if value is not None:
+                clauses.append(f"t.{column} = ?")
+                params.append(value)
+        if still_not_online_in is not None:
+            # INDEXED BY: sem ANALYZE o sqlite prefere o índice de status, que percorre a varredura inteira
+            clauses.append("NOT EXISTS (SELECT 1 FROM agent a INDEXED BY agent_instance"
+                           " WHERE a.instance_id = t.instance_id AND a.scan_id = ? AND a.ping_status = 'Online')")
+            params.append(still_not_online_in)
+
+        columns = ', '.join(f"t.{field}" for field in record_type.fields)
+        sql = f"SELECT {columns} FROM {kind} t WHERE {' AND '.join(clauses)} ORDER BY t.rowid"
+        for row in self._db.execute(sql, params):
+            yield record_type(*row)
+
+    def diff(self, kind, before_id, after_id, profile=None, region=None):
+        """
+        Instâncias que mudaram de status entre duas varreduras.
+
+        Returns:
+            list: (InstanceId, Profile, Region, status antes, status depois);
+                '' quando a instância não existia em uma das varreduras
+        """
+        status = RECORD_TYPES[kind].status_field
+        filters, params = "", []
+        for column, value in (('profile', profile), ('region', region)):
+            if value is not None:
+                filters += f" AND {column} = ?"
+                params.append(value)
+        sql = (
+            f"SELECT instance_id, profile, region, {status} FROM {kind} WHERE scan_id = ?{filters}"
+        )
+        before = {row[0]: row for row in self._db.execute(sql, [before_id] + params)}
+        after = {row[0]: row for row in self._db.execute(sql, [after_id] + params)}
+
+        changes = []
+        for instance_id in sorted(set(before) | set(after)):
+            old, new = before.get(instance_id), after.get(instance_id)
+            if old and new and old[3] == new[3]:
+                continue
+            location = (new or old)[1:3]
+            changes.append((instance_id,) + location + (old[3] if old else '', new[3] if new else ''))
+        return changes
+
+    def timeline(self, instance_id):
+        """(taken_at, kind, status) de uma instância em todas as varreduras."""
+        rows = []
+        for kind, record_type in RECORD_TYPES.items():
+            rows.extend(self._db.execute(
+                f"SELECT s.taken_at, ?, t.{record_type.status_field} FROM {kind} t"
+                f" JOIN scans s ON s.scan_id = t.scan_id WHERE t.instance_id = ?",
+                (kind, instance_id)))
+        return sorted(rows)
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+
+def record_scan(snapshot_path, kinds):
+    """Chamado pelo scan.py depois de gravar o snapshot; retorna o scan_id ou None se desativado."""
+    path = configured_path()
+    if not path:
+        return None
+    with HistoryStore(path) as store:
+        scan_id = store.append_snapshot(snapshot_path, kinds)
+        retention = configured_retention()
+        if retention:
+            store.prune(retention)
+    return scan_id
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultas no histórico de varreduras")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('scans', help="lista as varreduras gravadas")
+
+    query = sub.add_parser('query', help="registros de uma varredura, com filtros")
+    query.add_argument('kind', choices=list(RECORD_TYPES))
+    query.add_argument('--at', type=parse_when, help="última varredura até esta data (padrão: a mais recente)")
+    query.add_argument('--profile')
+    query.add_argument('--region')
+    query.add_argument('--status', help="SSM_Status (inventory), PingStatus (agent) ou HasRole (missing)")
+    query.add_argument('--instance')
+    query.add_argument('--still-not-online', action='store_true',
+                       help="só instâncias que não estão Online na varredura agent mais recente")
+
+    diff = sub.add_parser('diff', help="instâncias que mudaram de status entre duas datas")
+    diff.add_argument('kind', choices=list(RECORD_TYPES))
+    diff.add_argument('--from', dest='start', type=parse_when, required=True)
+    diff.add_argument('--to', dest='end', type=parse_when)
+    diff.add_argument('--profile')
+    diff.add_argument('--region')
+
+    instance = sub.add_parser('instance', help="histórico de uma instância")
+    instance.add_argument('instance_id')
+
+    args = parser.parse_args(argv)
+
+    path = configured_path()
+    if not path or not os.path.exists(path):
+        print("❌ Histórico não encontrado. Execute scan.py primeiro.")
+        return 1
+
+    start = time.perf_counter()
+    with HistoryStore(path) as store:
+        if args.command == 'scans':
+            for scan_id, taken_at, kinds in store.scans():
+                print(f"{scan_id:>5}  {format_time(taken_at)}  {kinds}")
+
+        elif args.command == 'query':
+            scan = store.scan_at(args.kind, args.at)
+            if not scan:
+                print(f"❌ Nenhuma varredura {args.kind} até a data pedida")
+                return 1
+            agent_scan = None
+            if args.still_not_online:
+                agent_scan = store.scan_at('agent')
+                if not agent_scan:
+                    print("❌ Nenhuma varredura agent no histórico")
+                    return 1
+            records = list(store.query(args.kind, scan[0], args.profile, args.region, args.status,
+                                       args.instance, agent_scan[0] if agent_scan else None))
+            print(f"=== {args.kind} em {format_time(scan[1])} (scan {scan[0]}) ===")
+            if agent_scan:
+                print(f"=== ainda fora do SSM em {format_time(agent_scan[1])} (scan {agent_scan[0]}) ===")
+            print('\t'.join(RECORD_TYPES[args.kind].header))
+            for record in records:
+                print('\t'.join(record.as_row()))
+            print(f"\n{len(records)} registros")
+
+        elif args.command == 'diff':
+            before = store.scan_at(args.kind, args.start)
+            after = store.scan_at(args.kind, args.end)
+            if not before or not after:
+                print(f"❌ Varreduras {args.kind} insuficientes para o período pedido")
+                return 1
+            changes = store.diff(args.kind, before[0], after[0], args.profile, args.region)
+            print(f"=== {args.kind}: {format_time(before[1])} → {format_time(after[1])} ===")
+            print("InstanceId\tProfile\tRegion\tAntes\tDepois")
+            for change in changes:
+                print('\t'.join(change))
+            print(f"\n{len(changes)} mudanças")
+
+        else:
+            timeline = store.timeline(args.instance_id)
+            for taken_at, kind, status in timeline:
+                print(f"{format_time(taken_at)}  {kind:<9}  {status}")
+            if not timeline:
+                print(f"ℹ️  {args.instance_id} não aparece no histórico")
+
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Cache das consultas IAM usadas para classificar instâncias.
+
+Centenas de instâncias compartilham poucos instance profiles, então
+get_instance_profile e list_attached_role_policies eram repetidos para cada
+instância, esbarrando no rate limit global do IAM. O cache guarda, por conta:
+
+- instance-profile: ARN do instance profile -> role
+- role-detail: role -> policies anexadas, inline e permission boundary
+- policy-version: ARN da policy gerenciada -> versão padrão
+- policy-document: ARN:versão -> documento da policy
+
+Cada entrada expira após `ttl` segundos. A versão padrão de uma policy também
+fica guardada pelo TTL: uma nova versão padrão só é vista quando a entrada
+expira (documentos são por versão e nunca ficam desatualizados). Opcionalmente as entradas são
+persistidas em um arquivo sqlite em data/, para que varreduras seguidas não
+consultem de novo roles que não mudaram.
+
+Erros nunca são cacheados: se o loader levantar exceção, ela é repassada e a
+próxima consulta tenta de novo.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 3600
+
+
+class IamCache:
+    """
+    Cache em memória (e opcionalmente em disco) por (conta, tipo, chave).
+
+    Args:
+        ttl: Segundos até uma entrada expirar
+        db_path: Caminho do sqlite para persistência; None mantém só em memória
+
+    Seguro para uso pelas threads do scan_engine.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, db_path=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS iam_cache ("
+                " account TEXT, kind TEXT, key TEXT, value TEXT, expires_at REAL,"
+                " PRIMARY KEY (account, kind, key))"
+            )
+            self._db.execute("DELETE FROM iam_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, account, kind, key, loader):
+        """
+        Retorna o valor cacheado ou chama loader() e guarda o resultado.
+
+        Args:
+            account: Conta (profile) dona do recurso IAM
+            kind: Tipo da consulta: 'instance-profile', 'role-detail', 'policy-version' ou 'policy-document'
+            key: Identificador do recurso (ARN ou nome)
+            loader: Função sem argumentos que consulta o IAM
+        """
+        found, value = self.lookup(account, kind, key)
+        if found:
+            return value
+        value = loader()
+        self.store(account, kind, key, value)
+        return value
+
+    def lookup(self, account, kind, key):
+        """
+        Entrada válida de (conta, tipo, chave), para quem não pode passar um loader síncrono (async_scan.py).
+
+        Returns:
+            tuple: (True, valor) ou (False, None), contado como hit ou miss
+        """
+        cache_key = (account, kind, key)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return True, entry[0]
+
+            if self._db:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM iam_cache WHERE account = ? AND kind = ? AND key = ?",
+                    cache_key,
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._entries[cache_key] = (value, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return True, value
+
+            self.misses += 1
+            return False, None
+
+    def store(self, account, kind, key, value):
+        """Guarda `value` (serializável em JSON) por `ttl` segundos."""
+        cache_key = (account, kind, key)
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._entries[cache_key] = (value, expires_at)
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO iam_cache VALUES (?, ?, ?, ?, ?)",
+                    cache_key + (json.dumps(value), expires_at),
+                )
+                self._db.commit()
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        return (f"Cache IAM: {self.hits} hits ({self.disk_hits} do disco), "
+                f"{self.misses} misses - {rate:.0f}% de acerto")
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Índice em memória do IAM de uma conta, carregado em lote.
+
+Em vez de resolver role e policies instância por instância, a conta inteira é
+lida com um get_account_authorization_details paginado (Filter=Role) e
+indexada em dicionários:
+
+- ARN / nome do instance profile -> role
+- role -> policies gerenciadas anexadas, policies inline e permission
+  boundary (iam_policy.RoleDetail)
+- policies gerenciadas da conta -> versão padrão e documento
+
+Com o índice, classificar uma instância como OK / NO_SSM / NO_ROLE é uma
+consulta a dicionário. Como o IAM é global, o índice é carregado uma vez por
+conta e compartilhado por todas as regiões (AccountIndexes).
+
+Requer a permissão iam:GetAccountAuthorizationDetails.
+"""
+
+import threading
+
+from iam_policy import EMPTY_ROLE, RoleDetail, canonical
+
+# Roles e policies da conta (as policies da AWS são lidas à parte, uma vez por processo)
+AUTHORIZATION_FILTER = ['Role', 'LocalManagedPolicy']
+
+
+class IamIndex:
+    """Instance profiles, roles e policies da conta, indexados por ARN/nome."""
+
+    def __init__(self):
+        self.profile_roles_by_arn = {}
+        self.profile_roles_by_name = {}
+        self.role_policies = {}
+        self.role_details = {}
+        self.local_policies = {}
+
+    @classmethod
+    def from_pages(cls, pages):
+        """
+        Monta o índice a partir das páginas de get_account_authorization_details.
+
+        Args:
+            pages: Iterável de respostas com RoleDetailList (e Policies)
+        """
+        index = cls()
+        for page in pages:
+            for role in page.get('RoleDetailList', []):
+                index.add_role(role)
+            for policy in page.get('Policies', []):
+                index.add_policy(policy)
+        return index
+
+    def add_role(self, role):
+        role_name = role['RoleName']
+        attached = role.get('AttachedManagedPolicies', [])
+        self.role_policies[role_name] = [p['PolicyName'] for p in attached]
+        self.role_details[role_name] = RoleDetail(
+            tuple((p.get('PolicyArn'), p['PolicyName']) for p in attached),
+            tuple(canonical(p['PolicyDocument']) for p in role.get('RolePolicyList', [])),
+            (role.get('PermissionsBoundary') or {}).get('PermissionsBoundaryArn'),
+        )
+        for profile in role.get('InstanceProfileList', []):
+            # Um instance profile tem no máximo uma role
+            self.profile_roles_by_arn[profile['Arn']] = role_name
+            self.profile_roles_by_name[profile['InstanceProfileName']] = role_name
+
+    def role_for_instance_profile(self, instance_profile_arn):
+        """Retorna a role do instance profile ou None se não houver role associada."""
+        role_name = self.profile_roles_by_arn.get(instance_profile_arn)
+        if role_name is None:
+            role_name = self.profile_roles_by_name.get(instance_profile_arn.split('/')[-1])
+        return role_name
+
+    def add_policy(self, policy):
+        """Policy gerenciada da conta, com o documento da versão padrão."""
+        for version in policy.get('PolicyVersionList', []):
+            if version.get('IsDefaultVersion'):
+                self.local_policies[policy['Arn']] = (version['VersionId'], version.get('Document'))
+
+    def attached_policies(self, role_name):
+        return self.role_policies.get(role_name, [])
+
+    def role_detail(self, role_name):
+        return self.role_details.get(role_name, EMPTY_ROLE)
+
+
+def prefetch_iam_index(iam_client):
+    """Carrega o índice IAM da conta com um get_account_authorization_details paginado."""
+    paginator = iam_client.get_paginator('get_account_authorization_details')
+    return IamIndex.from_pages(paginator.paginate(Filter=AUTHORIZATION_FILTER))
+
+
+class AccountIndexes:
+    """
+    Carrega o IamIndex uma única vez por conta, mesmo com várias regiões em paralelo.
+
+    Se o carregamento falhar (ex: sem iam:GetAccountAuthorizationDetails), a
+    falha também é lembrada e get() retorna None, para que o chamador use a
+    consulta por instância como fallback sem tentar o lote de novo.
+    """
+
+    def __init__(self, loader=prefetch_iam_index):
+        self.loader = loader
+        self.errors = {}
+        self._indexes = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, account, iam_client):
+        with self._lock:
+            lock = self._locks.setdefault(account, threading.Lock())
+
+        with lock:
+            if account not in self._indexes:
+                try:
+                    self._indexes[account] = self.loader(iam_client)
+                except Exception as e:
+                    self.errors[account] = e
+                    self._indexes[account] = None
+            return self._indexes[account]
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Avaliação das permissões SSM de uma role a partir dos documentos das policies.
+
+A classificação só conferia se o nome de alguma policy gerenciada anexada
+estava em SSM_POLICIES: policies inline, policies da conta que concedem
+ssm:UpdateInstanceInformation / ssmmessages:* e permission boundaries eram
+ignoradas, e instâncias conformes saíam como NO_SSM (e eram "corrigidas"
+pelo enable_ssm.py). Aqui a role é avaliada pelas ações que o SSM Agent usa
+(SSM_REQUIRED_ACTIONS):
+
+- cada ação precisa de um Allow em alguma policy da role (gerenciada ou
+  inline) e de nenhum Deny; com permission boundary, a boundary também
+  precisa permitir
+- Action / NotAction aceitam curingas (* e ?) sem diferenciar maiúsculas; os
+  padrões de cada statement viram uma expressão regular, compilada uma vez
+  por processo
+- cada documento é avaliado uma vez contra todas as ações exigidas e vira um
+  par de conjuntos (permitidas, negadas); avaliar uma role é só união e
+  diferença desses conjuntos, e o resultado fica memorizado por role
+- Condition e Resource não são avaliados: um Allow vale como concedido, e um
+  Deny só conta com Resource "*" e sem Condition (os demais podem não se
+  aplicar à instância)
+
+Os documentos das policies gerenciadas ficam em cache por (ARN, versão). Os
+das policies da conta chegam junto do get_account_authorization_details
+(IamIndex), sem chamadas extras. Os das policies da AWS
+(arn:aws:iam::aws:policy/...) são iguais em todas as contas: get_policy +
+get_policy_version rodam uma vez por policy no processo inteiro (e ficam no
+IamCache em disco, se configurado). Uma policy cujo documento não pode ser
+lido (ex: sem iam:GetPolicyVersion) vale pelo nome, como antes (SSM_POLICIES).
+"""
+
+import functools
+import json
+import re
+import threading
+from collections import namedtuple
+from urllib.parse import unquote
+
+from botocore.exceptions import ClientError
+
+# Ações usadas pelo SSM Agent para se registrar e abrir os canais do Session Manager
+DEFAULT_REQUIRED_ACTIONS = [
+    'ssm:UpdateInstanceInformation',
+    'ssmmessages:CreateControlChannel',
+    'ssmmessages:CreateDataChannel',
+    'ssmmessages:OpenControlChannel',
+    'ssmmessages:OpenDataChannel',
+]
+
+# Erros de leitura de policy que levam à avaliação pelo nome
+UNREADABLE_ERRORS = ('AccessDenied', 'AccessDeniedException', 'UnauthorizedOperation')
+
+# Policies de uma role: attached = tupla de (ARN ou None, nome); inline = documentos
+# em JSON canônico; boundary = ARN da permission boundary ou None
+RoleDetail = namedtuple('RoleDetail', ['attached', 'inline', 'boundary'])
+
+EMPTY_ROLE = RoleDetail((), (), None)
+
+# Ações exigidas que um documento permite / nega
+Decision = namedtuple('Decision', ['allowed', 'denied'])
+
+NO_DECISION = Decision(frozenset(), frozenset())
+
+
+def role_detail_from(value):
+    """RoleDetail a partir da forma serializada em listas (IamCache)."""
+    attached, inline, boundary = value
+    return RoleDetail(tuple(tuple(policy) for policy in attached), tuple(inline), boundary)
+
+
+def load_role_detail(iam, role_name):
+    """
+    Policies da role consultadas uma a uma (sem o índice em lote).
+
+    get_role (boundary), list_attached_role_policies, list_role_policies e um
+    get_role_policy por policy inline.
+    """
+    role = iam.get_role(RoleName=role_name)['Role']
+    attached = iam.list_attached_role_policies(RoleName=role_name)['AttachedPolicies']
+    inline = [iam.get_role_policy(RoleName=role_name, PolicyName=name)['PolicyDocument']
+              for name in iam.list_role_policies(RoleName=role_name)['PolicyNames']]
+    return build_role_detail(role, attached, inline)
+
+
+def build_role_detail(role, attached, inline):
+    """
+    RoleDetail a partir das respostas do IAM.
+
+    Args:
+        role: Role do get_role (PermissionsBoundary)
+        attached: AttachedPolicies do list_attached_role_policies
+        inline: Documentos das policies inline
+    """
+    return RoleDetail(tuple((policy.get('PolicyArn'), policy['PolicyName']) for policy in attached),
+                      tuple(canonical(document) for document in inline),
+                      (role.get('PermissionsBoundary') or {}).get('PermissionsBoundaryArn'))
+
+
+def configured_actions():
+    """SSM_REQUIRED_ACTIONS do config.py, se estiver definido."""
+    try:
+        import config
+    except ImportError:
+        return DEFAULT_REQUIRED_ACTIONS
+    return getattr(config, 'SSM_REQUIRED_ACTIONS', DEFAULT_REQUIRED_ACTIONS)
+
+
+def parse_document(document):
+    """Documento como dict: o boto3 já decodifica; o AWS Config traz texto URL-encoded."""
+    if isinstance(document, str):
+        text = document.strip()
+        return json.loads(text if text.startswith('{') else unquote(text))
+    return document or {}
+
+
+def canonical(document):
+    """JSON canônico do documento: inline iguais em roles diferentes são avaliadas uma vez."""
+    return json.dumps(parse_document(document), sort_keys=True, separators=(',', ':'))
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+@functools.lru_cache(maxsize=None)
+def action_matcher(patterns):
+    """Função action -> bool para uma tupla de padrões com curingas (uma regex só)."""
+    if not patterns:
+        return lambda action: False
+    alternatives = '|'.join(re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.') for pattern in patterns)
+    return re.compile(f"(?:{alternatives})", re.IGNORECASE).fullmatch
+
+
+def evaluate_document(document, actions):
+    """
+    Ações de `actions` que o documento permite e nega.
+
+    Returns:
+        Decision
+    """
+    statements = parse_document(document).get('Statement', [])
+    if isinstance(statements, dict):
+        statements = [statements]
+    allowed, denied = set(), set()
+    for statement in statements:
+        if 'NotAction' in statement:
+            match = action_matcher(tuple(_as_list(statement['NotAction'])))
+            matched = {action for action in actions if not match(action)}
+        else:
+            match = action_matcher(tuple(_as_list(statement.get('Action'))))
+            matched = {action for action in actions if match(action)}
+        effect = statement.get('Effect')
+        if effect == 'Allow':
+            allowed |= matched
+        elif (effect == 'Deny' and not statement.get('Condition') and 'NotResource' not in statement
+              and '*' in _as_list(statement.get('Resource', '*'))):
+            denied |= matched
+    return Decision(frozenset(allowed), frozenset(denied))
+
+
+def _error_code(error):
+    return error.response.get('Error', {}).get('Code') if isinstance(error, ClientError) else None
+
+
+class PolicyEvaluator:
+    """
+    Decide se uma role concede as ações do SSM Agent.
+
+    Args:
+        actions: Ações exigidas (padrão: SSM_REQUIRED_ACTIONS)
+        fallback_names: Policies aceitas pelo nome quando o documento não pode
+            ser lido (SSM_POLICIES)
+        cache: IamCache opcional para versões e documentos lidos do IAM
+
+    Seguro para uso pelas threads do scan_engine.
+    """
+
+    def __init__(self, actions=None, fallback_names=(), cache=None):
+        self.actions = frozenset(actions or configured_actions())
+        self.fallback_names = frozenset(fallback_names)
+        self.cache = cache
+        self.fetched = 0
+        self._versions = {}
+        self._documents = {}
+        self._inline = {}
+        self._verdicts = {}
+        self._unreadable = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def known(self, arn):
+        return arn in self._versions or arn in self._unreadable
+
+    def pending(self, detail, local=None):
+        """ARNs de policies gerenciadas da role cujo documento ainda não foi carregado nem está em `local`."""
+        arns = [arn for arn, _ in detail.attached if arn]
+        if detail.boundary:
+            arns.append(detail.boundary)
+        return [arn for arn in dict.fromkeys(arns) if not self.known(arn) and not (local and arn in local)]
+
+    def store(self, arn, version_id, document):
+        """Guarda a versão padrão de uma policy e a decisão do seu documento."""
+        key = (arn, version_id)
+        if key not in self._documents:
+            self._documents[key] = evaluate_document(document, self.actions) if document is not None else NO_DECISION
+        self._versions[arn] = version_id
+
+    def mark_unreadable(self, arn):
+        self._unreadable.add(arn)
+
+    def fetch(self, iam, arn):
+        """
+        Lê a versão padrão e o documento da policy (get_policy + get_policy_version), uma vez por ARN.
+
+        Policy inexistente não concede nada; sem permissão de leitura, a policy vale
+        pelo nome. Outros erros são repassados.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(arn, threading.Lock())
+        with lock:
+            if self.known(arn):
+                return
+            account = arn.split(':')[4] or 'aws'
+
+            def load_version():
+                return iam.get_policy(PolicyArn=arn)['Policy']['DefaultVersionId']
+
+            try:
+                if self.cache:
+                    version_id = self.cache.get(account, 'policy-version', arn, load_version)
+                else:
+                    version_id = load_version()
+
+                def load_document():
+                    with self._lock:
+                        self.fetched += 1
+                    response = iam.get_policy_version(PolicyArn=arn, VersionId=version_id)
+                    return parse_document(response['PolicyVersion']['Document'])
+
+                if (arn, version_id) not in self._documents:
+                    if self.cache:
+                        document = self.cache.get(account, 'policy-document', f"{arn}:{version_id}", load_document)
+                    else:
+                        document = load_document()
+                else:
+                    document = None
+            except ClientError as e:
+                if _error_code(e) == 'NoSuchEntity':
+                    self.store(arn, None, None)
+                    return
+                if _error_code(e) in UNREADABLE_ERRORS:
+                    self.mark_unreadable(arn)
+                    return
+                raise
+            self.store(arn, version_id, document)
+
+    def _managed(self, arn, name):
+        if arn and arn in self._versions:
+            return self._documents[(arn, self._versions[arn])]
+        # Documento ilegível (ou policy sem ARN): vale o nome, como em SSM_POLICIES
+        return Decision(self.actions, frozenset()) if name in self.fallback_names else NO_DECISION
+
+    def _inline_decision(self, document):
+        decision = self._inline.get(document)
+        if decision is None:
+            decision = self._inline[document] = evaluate_document(document, self.actions)
+        return decision
+
+    def _granted(self, detail):
+        allowed, denied = set(), set()
+        for arn, name in detail.attached:
+            decision = self._managed(arn, name)
+            allowed |= decision.allowed
+            denied |= decision.denied
+        for document in detail.inline:
+            decision = self._inline_decision(document)
+            allowed |= decision.allowed
+            denied |= decision.denied
+        granted = allowed - denied
+        if detail.boundary and detail.boundary not in self._unreadable:
+            boundary = self._managed(detail.boundary, None)
+            granted &= boundary.allowed - boundary.denied
+        return granted
+
+    def allows(self, detail):
+        """
+        True se a role concede todas as ações exigidas.
+
+        Os documentos das policies gerenciadas já devem ter sido carregados
+        (role_allows, ou fetch/store para cada ARN de pending()).
+        """
+        verdict = self._verdicts.get(detail)
+        if verdict is None:
+            verdict = self._verdicts[detail] = self._granted(detail) >= self.actions
+        return verdict
+
+    def missing(self, detail, iam=None, local=None):
+        """Ações exigidas que a role não concede, em ordem (carrega o que falta como role_allows)."""
+        self._load(detail, iam, local)
+        return sorted(self.actions - self._granted(detail))
+
+    def _load(self, detail, iam=None, local=None):
+        for arn in self.pending(detail):
+            if local and arn in local:
+                self.store(arn, *local[arn])
+            elif iam is not None:
+                self.fetch(iam, arn)
+
+    def role_allows(self, detail, iam=None, local=None):
+        """
+        Carrega o que falta e avalia a role.
+
+        Args:
+            detail: RoleDetail
+            iam: Cliente IAM para as policies que não estão em `local`
+            local: ARN -> (versão padrão, documento) das policies da conta (IamIndex.local_policies)
+        """
+        verdict = self._verdicts.get(detail)
+        if verdict is not None:
+            return verdict
+        self._load(detail, iam, local)
+        return self.allows(detail)
+
+    def summary(self):
+        return (f"Policies: {len(self._documents)} documentos avaliados ({self.fetched} lidos do IAM), "
+                f"{len(self._verdicts)} roles distintas")
@@ -1,98 +1,156 @@
 #!/usr/bin/env python3
 """
 Script para instalar SSM Agent usando Run Command nas instâncias que já têm SSM.
+
+Atualiza o agente das instâncias Online abaixo da versão alvo (lidas do
+snapshot da última varredura): AGENT_MIN_VERSION, por padrão '3' (agentes
+< 3.x); com 'latest', a versão mais nova da frota em cada plataforma
+(agent_versions.py). O plano começa pelos
+agentes mais antigos e pelos maiores grupos profile/região/plataforma e pode
+ser dividido em ondas (--wave-size / AGENT_UPGRADE_WAVE_SIZE): cada onda é
+enviada em lotes de até 50 instâncias por comando (run_command.py) e
+acompanhada até o fim antes da próxima. O status de cada instância vai para
+data/runcommand-results.csv.
+
+Uso:
+    python3 install_ssm_via_runcommand.py
+    python3 install_ssm_via_runcommand.py --limit 20          # rollout parcial
+    python3 install_ssm_via_runcommand.py --min-version 3.2 --wave-size 500
+    python3 install_ssm_via_runcommand.py --tag SSMUpgrade=true
 """
 
-import boto3
-import csv
+import argparse
 import os
-import time
+from collections import Counter
+
+import snapshot
+from agent_versions import VersionIndex, configured_min_version, format_version, waves
+from aws_clients import POOL, discover_accounts, get_client, phase
+from run_command import Dispatcher, configured_dispatch, write_results
+
+LINUX_COMMANDS = [
+    '#!/bin/bash',
+    'if command -v yum &> /dev/null; then',
+    '  sudo yum install -y amazon-ssm-agent',
+    '  sudo systemctl enable amazon-ssm-agent',
+    '  sudo systemctl start amazon-ssm-agent',
+    'elif command -v snap &> /dev/null; then',
+    '  sudo snap install amazon-ssm-agent --classic',
+    '  sudo snap start amazon-ssm-agent',
+    'fi'
+]
+
+WINDOWS_COMMANDS = [
+    '$url = "https://s3.amazonaws.com/ec2-downloads-windows/SSMAgent/latest/windows_amd64/AmazonSSMAgentSetup.exe"',
+    '$output = "$env:TEMP\\SSMAgent_latest.exe"',
+    'Invoke-WebRequest -Uri $url -OutFile $output',
+    'Start-Process -FilePath $output -ArgumentList "/S" -Wait'
+]
 
-def install_ssm_agent(ssm_client, instance_id, platform):
-    """Instala SSM Agent baseado na plataforma"""
-    
+def install_document(platform):
+    """Documento e comandos de instalação do SSM Agent para a plataforma"""
     if platform == 'Linux':
-        commands = [
-            '#!/bin/bash',
-            'if command -v yum &> /dev/null; then',
-            '  sudo yum install -y amazon-ssm-agent',
-            '  sudo systemctl enable amazon-ssm-agent',
-            '  sudo systemctl start amazon-ssm-agent',
-            'elif command -v snap &> /dev/null; then',
-            '  sudo snap install amazon-ssm-agent --classic',
-            '  sudo snap start amazon-ssm-agent',
-            'fi'
-        ]
-    elif platform == 'Windows':
-        commands = [
-            '$url = "https://s3.amazonaws.com/ec2-downloads-windows/SSMAgent/latest/windows_amd64/AmazonSSMAgentSetup.exe"',
-            '$output = "$env:TEMP\\SSMAgent_latest.exe"',
-            'Invoke-WebRequest -Uri $url -OutFile $output',
-            'Start-Process -FilePath $output -ArgumentList "/S" -Wait'
-        ]
-    else:
-        return None
-    
+        return {'DocumentName': 'AWS-RunShellScript', 'Parameters': {'commands': LINUX_COMMANDS},
+                'TimeoutSeconds': 300}
+    if platform == 'Windows':
+        return {'DocumentName': 'AWS-RunPowerShellScript', 'Parameters': {'commands': WINDOWS_COMMANDS},
+                'TimeoutSeconds': 300}
+    return None
+
+def configured_wave_size():
     try:
-        response = ssm_client.send_command(
-            InstanceIds=[instance_id],
-            DocumentName='AWS-RunShellScript' if platform == 'Linux' else 'AWS-RunPowerShellScript',
-            Parameters={'commands': commands},
-            TimeoutSeconds=300
-        )
-        return response['Command']['CommandId']
-    except Exception as e:
-        print(f"    ❌ Erro: {str(e)}")
+        import config
+    except ImportError:
         return None
+    return getattr(config, 'AGENT_UPGRADE_WAVE_SIZE', None)
 
 def main():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    ssm_status_file = os.path.join(script_dir, "../data/ssm-agent-status.csv")
-    
-    # Ler instâncias que já estão no SSM
+    parser = argparse.ArgumentParser(description="Atualiza o SSM Agent via Run Command")
+    parser.add_argument('--limit', type=int, help="máximo de instâncias nesta execução")
+    parser.add_argument('--min-version', help="versão mínima, ou 'latest' para a mais nova da frota (padrão: AGENT_MIN_VERSION, '3')")
+    parser.add_argument('--wave-size', type=int, help="instâncias por onda (padrão: AGENT_UPGRADE_WAVE_SIZE)")
+    parser.add_argument('--tag', metavar='CHAVE=VALOR',
+                        help="alvo por tag (AWS-UpdateSSMAgent), nas regiões com instâncias no SSM")
+    args = parser.parse_args()
+    # Com ORG_ROLE_NAME, os profiles do snapshot são contas da organização
+    discover_accounts()
+
+    results_file = os.path.join(snapshot.data_dir(), "runcommand-results.csv")
+
+    # Ler do snapshot (ou do ssm-agent-status.csv) apenas as instâncias Online
     try:
-        with open(ssm_status_file, 'r') as f:
-            reader = csv.DictReader(f)
-            ssm_instances = list(reader)
+        with phase('load'):
+            online_instances = list(snapshot.load('agent', status='Online'))
     except FileNotFoundError:
         print("❌ Execute check_ssm_agent.py primeiro!")
         return
-    
-    # Filtrar apenas instâncias Online
-    online_instances = [i for i in ssm_instances if i['PingStatus'] == 'Online']
-    
+    except snapshot.SnapshotVersionError as e:
+        print(f"❌ {str(e)}")
+        return
+
     if not online_instances:
         print("❌ Nenhuma instância online no SSM para usar como base")
         return
-    
+
+    options = configured_dispatch()
+    dispatcher = Dispatcher(get_client, **options)
+    comment = "install_ssm_via_runcommand.py"
+
     print(f"=== Instalando SSM Agent via Run Command ===")
-    print(f"Instâncias online disponíveis: {len(online_instances)}\n")
-    
-    # Verificar versão do agente (se muito antiga, atualizar)
-    for inst in online_instances[:5]:  # Testar nas primeiras 5
-        print(f"Testando: {inst['InstanceId']} ({inst['Profile']} - {inst['Region']})")
-        print(f"  Platform: {inst['PlatformType']}")
-        print(f"  Agent Version: {inst['AgentVersion']}")
-        
-        session = boto3.Session(profile_name=inst['Profile'], region_name=inst['Region'])
-        ssm = session.client('ssm')
-        
-        # Verificar se agente está atualizado
-        version = inst['AgentVersion']
-        major_version = int(version.split('.')[0])
-        
-        if major_version < 3:
-            print(f"  ⚠️  Agente desatualizado, atualizando...")
-            command_id = install_ssm_agent(ssm, inst['InstanceId'], inst['PlatformType'])
-            if command_id:
-                print(f"  ✅ Comando enviado: {command_id}")
-        else:
-            print(f"  ✅ Agente já está atualizado")
-        
-        print()
-    
+    print(f"Instâncias online disponíveis: {len(online_instances)}")
+    print(f"MaxConcurrency: {options['max_concurrency']}, MaxErrors: {options['max_errors']}\n")
+
+    def progress(done, total):
+        print(f"  {done}/{total} comandos concluídos")
+
+    def track(dispatches, results):
+        print(f"✅ {len(dispatches)} comandos enviados, {len(results)} instâncias com erro no envio")
+        print(f"⏳ Acompanhando a execução (até {options['timeout']}s)...")
+        with phase('track'):
+            results.extend(dispatcher.track(dispatches, progress))
+        return results
+
+    results = []
+    if args.tag:
+        tag_key, _, tag_value = args.tag.partition('=')
+        pairs = list(dict.fromkeys((i.profile, i.region) for i in online_instances))
+        document = {'DocumentName': 'AWS-UpdateSSMAgent', 'TimeoutSeconds': 600}
+        print(f"Alvo: tag {tag_key}={tag_value} em {len(pairs)} profiles/regiões")
+        with phase('send'):
+            dispatches, failures = dispatcher.send_by_tag(pairs, document, tag_key, tag_value, comment)
+        results.extend(track(dispatches, failures))
+    else:
+        # Plano pelo índice de versões: os agentes mais antigos e os maiores grupos primeiro
+        with phase('plan'):
+            index = VersionIndex.from_records(online_instances)
+            min_version = args.min_version or configured_min_version()
+            plan = index.plan(min_version)
+            planned = list(waves(plan, args.wave_size or configured_wave_size(), args.limit))
+        for line in index.summary(min_version, plan):
+            print(line)
+        if not planned:
+            print("✅ Todos os agentes já estão atualizados")
+            return
+        total = sum(len(ids) for groups in planned for ids in groups.values())
+        print(f"⚠️  {total} agentes desatualizados, a partir da versão {format_version(plan[0].version)}, "
+              f"em {len(planned)} ondas\n")
+        for number, groups in enumerate(planned, 1):
+            print(f"Onda {number}/{len(planned)}: {sum(len(ids) for ids in groups.values())} instâncias "
+                  f"em {len(groups)} grupos (profile/região/plataforma)")
+            with phase('send'):
+                dispatches, failures = dispatcher.send(groups, install_document, comment)
+            results.extend(track(dispatches, failures))
+
+    with phase('write'):
+        write_results(results_file, results)
+
+    print()
+    for status, count in Counter(result.status for result in results).most_common():
+        print(f"  {status}: {count}")
+    print(f"\nResultado por instância: {results_file}")
+    print(POOL.summary())
     print("=== Processo concluído! ===")
-    print("Aguarde 5-10 minutos e execute check_ssm_agent.py novamente")
+    print("Execute check_ssm_agent.py novamente para conferir as versões")
 
 if __name__ == "__main__":
     main()
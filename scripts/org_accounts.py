@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Descoberta de contas pelo AWS Organizations, com credenciais de assume-role em cache.
+
+PROFILES no config.py é uma lista mantida à mão: contas novas ficam de fora
+e cada script resolve as credenciais SSO de cada profile de novo. Com
+ORG_ROLE_NAME definido:
+
+- as contas ACTIVE da organização (organizations:ListAccounts, a partir do
+  profile ORG_PROFILE) substituem PROFILES na varredura; cada conta aparece
+  nos CSVs pelo nome (nome-id se houver nomes repetidos)
+- em cada conta é assumida a role ORG_ROLE_NAME (ex: OrganizationAccountAccessRole)
+- as credenciais do STS ficam em memória e em um sqlite fora do repositório
+  (ORG_CREDENTIAL_CACHE, ex: ~/.cache/ssm-implementation/), compartilhado por
+  todos os scripts e threads, até REFRESH_MARGIN segundos antes de expirarem
+
+Assim, cada conta custa uma chamada ao STS por hora (ORG_SESSION_DURATION),
+não uma por script. As credenciais que faltam são obtidas em paralelo
+(ORG_CREDENTIAL_WORKERS) logo após a descoberta. Sessões longas (watch.py)
+renovam as credenciais sozinhas, pelo mesmo cache.
+
+A lista de contas também fica no cache, por ORG_ACCOUNTS_TTL segundos.
+
+Requer: organizations:ListAccounts e sts:AssumeRole no profile ORG_PROFILE;
+a role de cada conta precisa confiar nesse profile.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import boto3
+import botocore.session
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Credenciais a menos disso do vencimento são renovadas; acima dos 15 minutos em que
+# o botocore já pede a renovação, para que o cache nunca devolva credenciais que ele recusaria
+REFRESH_MARGIN = 1200
+
+DEFAULT_SESSION_DURATION = 3600
+DEFAULT_ACCOUNTS_TTL = 3600
+DEFAULT_WORKERS = 8
+SESSION_NAME = 'ssm-implementation'
+
+ACCOUNTS_KEY = 'organizations:accounts'
+
+
+def source_session(profile):
+    """Sessão do profile de origem (SSO); substituível pelo benchmark."""
+    return boto3.Session(profile_name=profile)
+
+
+class AssumedRoleProvider(CredentialProvider):
+    """Provider do botocore com as credenciais renováveis de `refresh`."""
+
+    METHOD = 'assume-role'
+
+    def __init__(self, refresh):
+        super().__init__()
+        self.refresh = refresh
+
+    def load(self):
+        return RefreshableCredentials.create_from_metadata(
+            metadata=self.refresh(), refresh_using=self.refresh, method=self.METHOD)
+
+
+def refreshable_session(refresh):
+    """
+    boto3.Session com credenciais renováveis.
+
+    Args:
+        refresh: Função sem argumentos -> metadata do botocore
+                 (access_key, secret_key, token, expiry_time)
+    """
+    session = botocore.session.Session()
+    session.register_component('credential_provider', CredentialResolver(providers=[AssumedRoleProvider(refresh)]))
+    return boto3.Session(botocore_session=session)
+
+
+class CredentialCache:
+    """
+    Credenciais (e a lista de contas) por chave, em memória e opcionalmente em sqlite.
+
+    Args:
+        db_path: Caminho do sqlite (criado com permissão 0600); None mantém só em memória
+        margin: Segundos antes do vencimento em que uma entrada deixa de valer
+
+    Seguro para threads; processos diferentes compartilham o arquivo.
+    """
+
+    def __init__(self, db_path=None, margin=REFRESH_MARGIN):
+        self.margin = margin
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            fd = os.open(db_path, os.O_RDWR | os.O_CREAT, 0o600)
+            os.close(fd)
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS credentials (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._db.execute("DELETE FROM credentials WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key):
+        """Valor ainda válido por mais de `margin` segundos, ou None."""
+        limit = time.time() + self.margin
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > limit:
+                self.hits += 1
+                return entry[0]
+            if self._db:
+                row = self._db.execute("SELECT value, expires_at FROM credentials WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > limit:
+                    value = json.loads(row[0])
+                    self._entries[key] = (value, row[1])
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            if self._db:
+                self._db.execute("INSERT OR REPLACE INTO credentials (key, value, expires_at) VALUES (?, ?, ?)",
+                                 (key, json.dumps(value), expires_at))
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
+
+
+def _expiry(value):
+    """Expiration do STS (datetime ou ISO 8601) em segundos desde a época."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def account_labels(accounts):
+    """
+    Nome de cada conta como profile; nomes repetidos viram nome-id.
+
+    Args:
+        accounts: Lista de (account id, nome)
+
+    Returns:
+        dict: profile -> account id, na ordem dos nomes
+    """
+    names = [name for _, name in accounts]
+    labels = {}
+    for account_id, name in sorted(accounts, key=lambda account: (account[1], account[0])):
+        labels[name if names.count(name) == 1 else f"{name}-{account_id}"] = account_id
+    return labels
+
+
+class AssumeRoleSessions:
+    """
+    session_factory do ClientPool para as contas da organização.
+
+    Args:
+        org_profile: Profile (SSO) com acesso ao Organizations e ao STS
+        role_name: Role assumida em cada conta
+        cache: CredentialCache
+        duration: DurationSeconds do AssumeRole
+        external_id: ExternalId exigido pela role (opcional)
+        workers: Threads para obter credenciais em paralelo
+
+    Profiles que não vieram da descoberta (ex: ORG_PROFILE, AGGREGATOR_PROFILE)
+    usam a sessão SSO normal.
+    """
+
+    def __init__(self, org_profile, role_name, cache, duration=DEFAULT_SESSION_DURATION, external_id=None,
+                 workers=DEFAULT_WORKERS):
+        self.org_profile = org_profile
+        self.role_name = role_name
+        self.cache = cache
+        self.duration = duration
+        self.external_id = external_id
+        self.workers = workers
+        self.accounts = {}
+        self.assumed = 0
+        self.failed = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._account_locks = {}
+
+    def _client(self, service):
+        """Cliente do ORG_PROFILE, criado uma vez e compartilhado entre as threads."""
+        with self._lock:
+            if service not in self._clients:
+                self._clients[service] = source_session(self.org_profile).client(service)
+            return self._clients[service]
+
+    def discover(self, exclude=(), ttl=DEFAULT_ACCOUNTS_TTL):
+        """
+        Contas ACTIVE da organização, do cache ou do organizations:ListAccounts.
+
+        Returns:
+            dict: profile -> account id (também guardado em self.accounts)
+        """
+        accounts = self.cache.get(ACCOUNTS_KEY)
+        if accounts is None:
+            client = self._client('organizations')
+            accounts = []
+            for page in client.get_paginator('list_accounts').paginate():
+                accounts.extend([account['Id'], account['Name']]
+                                for account in page['Accounts'] if account['Status'] == 'ACTIVE')
+            # A margem do cache vale para todas as chaves: o TTL conta a partir dela
+            self.cache.put(ACCOUNTS_KEY, accounts, time.time() + self.cache.margin + ttl)
+        excluded = set(exclude)
+        self.accounts = account_labels([(account_id, name) for account_id, name in accounts
+                                        if account_id not in excluded])
+        return self.accounts
+
+    def _account_lock(self, account_id):
+        with self._lock:
+            return self._account_locks.setdefault(account_id, threading.Lock())
+
+    def credentials(self, account_id):
+        """Metadata de credenciais da conta: do cache, ou um AssumeRole (um por conta por vez)."""
+        with self._account_lock(account_id):
+            cached = self.cache.get(account_id)
+            if cached is not None:
+                return cached
+            params = {
+                'RoleArn': f"arn:aws:iam::{account_id}:role/{self.role_name}",
+                'RoleSessionName': SESSION_NAME,
+                'DurationSeconds': self.duration,
+            }
+            if self.external_id:
+                params['ExternalId'] = self.external_id
+            try:
+                response = self._client('sts').assume_role(**params)
+            except (ClientError, BotoCoreError):
+                with self._lock:
+                    self.failed += 1
+                raise
+            with self._lock:
+                self.assumed += 1
+            credentials = response['Credentials']
+            expires_at = _expiry(credentials['Expiration'])
+            metadata = {
+                'access_key': credentials['AccessKeyId'],
+                'secret_key': credentials['SecretAccessKey'],
+                'token': credentials['SessionToken'],
+                'expiry_time': datetime.fromtimestamp(expires_at, timezone.utc).isoformat(),
+            }
+            self.cache.put(account_id, metadata, expires_at)
+            return metadata
+
+    def prefetch(self, profiles=None):
+        """
+        Obtém em paralelo as credenciais que não estão no cache.
+
+        Returns:
+            dict: profile -> exceção, para as contas em que o AssumeRole falhou
+        """
+        profiles = [profile for profile in (profiles or self.accounts) if profile in self.accounts]
+        errors = {}
+
+        def fetch(profile):
+            try:
+                self.credentials(self.accounts[profile])
+            except (ClientError, BotoCoreError) as e:
+                errors[profile] = e
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            list(executor.map(fetch, profiles))
+        return errors
+
+    def __call__(self, profile):
+        account_id = self.accounts.get(profile)
+        if account_id is None:
+            return source_session(profile)
+        return refreshable_session(lambda: self.credentials(account_id))
+
+    def summary(self):
+        return (f"Organizations: {len(self.accounts)} contas, {self.assumed} AssumeRole "
+                f"({self.failed} falhas), cache de credenciais: {self.cache.hits} hits, "
+                f"{self.cache.disk_hits} do disco, {self.cache.misses} misses")
+
+
+def credential_cache_path(cache_file):
+    """
+    Caminho do ORG_CREDENTIAL_CACHE: ~ é expandido e um nome relativo fica em data/.
+
+    Returns:
+        str ou None (cache só em memória)
+    """
+    if not cache_file:
+        return None
+    path = os.path.expanduser(cache_file)
+    if not os.path.isabs(path):
+        import snapshot
+        path = os.path.join(snapshot.data_dir(), path)
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    return path
+
+
+def configured_discovery():
+    """
+    Descoberta conforme ORG_ROLE_NAME / ORG_PROFILE / ORG_* do config.py.
+
+    Descobre as contas da organização (sessions.accounts) e obtém as
+    credenciais que faltam. Chamada por aws_clients.discover_accounts() no
+    início do main() de cada script, não na importação.
+
+    Returns:
+        AssumeRoleSessions ou None se a descoberta estiver desligada (padrão) ou falhar
+    """
+    try:
+        import config
+    except ImportError:
+        return None
+    role_name = getattr(config, 'ORG_ROLE_NAME', None)
+    if not role_name:
+        return None
+
+    cache = CredentialCache(credential_cache_path(getattr(config, 'ORG_CREDENTIAL_CACHE', None)))
+    org_profile = getattr(config, 'ORG_PROFILE', None) or config.PROFILES[0]
+    sessions = AssumeRoleSessions(
+        org_profile, role_name, cache,
+        duration=getattr(config, 'ORG_SESSION_DURATION', DEFAULT_SESSION_DURATION),
+        external_id=getattr(config, 'ORG_EXTERNAL_ID', None),
+        workers=getattr(config, 'ORG_CREDENTIAL_WORKERS', DEFAULT_WORKERS),
+    )
+    try:
+        profiles = sessions.discover(exclude=getattr(config, 'ORG_EXCLUDE_ACCOUNTS', ()),
+                                     ttl=getattr(config, 'ORG_ACCOUNTS_TTL', DEFAULT_ACCOUNTS_TTL))
+    except (ClientError, BotoCoreError) as e:
+        print(f"⚠️  Descoberta pelo Organizations falhou ({org_profile}): {str(e)}")
+        print("   Usando PROFILES do config.py")
+        cache.close()
+        return None
+
+    for profile, error in sessions.prefetch().items():
+        print(f"⚠️  AssumeRole {role_name} em {profile} ({profiles[profile]}) falhou: {str(error)}")
+    return sessions
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Planejamento e execução paralela das correções do enable_ssm.py.
+
+O enable_ssm.py processava uma instância por vez, criava uma role
+SSM-Role-<instância> para cada instância sem role e dormia 10 segundos
+depois de cada uma. Aqui as correções são agrupadas por conta (profile):
+
+- instâncias sem role recebem um instance profile compartilhado da conta
+  (SSM_ROLE_NAME / SSM_INSTANCE_PROFILE_NAME), criado uma vez ou
+  reaproveitado se já existir com uma das SSM_POLICIES
+- a propagação do IAM é aguardada uma vez por conta, e só quando algo foi
+  criado: o script espera o instance profile existir no IAM e usa a primeira
+  associação da conta como sonda, repetindo enquanto o EC2 ainda não o enxerga
+- roles existentes sem policy SSM recebem attach_role_policy uma única vez,
+  mesmo que várias instâncias usem a mesma role
+
+As roles são avaliadas pelos documentos das policies, como na varredura
+(iam_policy.py): uma role que já concede as ações do SSM não recebe a
+policy, e uma role que continuaria sem elas mesmo com a policy anexada
+(permission boundary ou Deny explícito) é pulada e reportada, em vez de
+receber o attach a cada execução sem nunca chegar a OK.
+
+As associações e os attaches rodam em paralelo, limitados por
+REMEDIATION_WORKERS. Cada ação gera um Action com o resultado; action_key()
+identifica a ação no checkpoint do enable_ssm.py, e skip_done() tira dos
+planos o que uma execução anterior já concluiu.
+"""
+
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.exceptions import ClientError
+
+from iam_policy import PolicyEvaluator, RoleDetail, load_role_detail
+
+SSM_POLICY_NAME = 'AmazonSSMManagedInstanceCore'
+SSM_POLICY_ARN = f"arn:aws:iam::aws:policy/{SSM_POLICY_NAME}"
+
+DEFAULT_SSM_POLICIES = ['AmazonSSMManagedInstanceCore', 'AmazonEC2RoleforSSM', 'AmazonSSMFullAccess']
+DEFAULT_ROLE_NAME = 'SSM-EC2-Role'
+DEFAULT_PROFILE_NAME = 'SSM-EC2-Profile'
+DEFAULT_WORKERS = 8
+
+# Tempo máximo esperando o EC2 enxergar um instance profile recém-criado
+PROPAGATION_TIMEOUT = 120
+PROPAGATION_DELAY = 2
+
+TRUST_POLICY = (
+    '{"Version": "2012-10-17", "Statement": [{"Effect": "Allow", '
+    '"Principal": {"Service": "ec2.amazonaws.com"}, "Action": "sts:AssumeRole"}]}'
+)
+
+# Resultado de uma ação; ok=False traz o erro em detail. kind: 'associate', 'attach'
+# ou 'skip' (role que o attach não corrige; detail diz por quê)
+Action = namedtuple('Action', ['kind', 'profile', 'region', 'instance_id', 'target', 'ok', 'detail'])
+
+
+class NotFixable(Exception):
+    """A role continuaria sem as ações do SSM mesmo com SSM_POLICY_ARN anexada."""
+
+
+def configured_remediation():
+    """
+    Lê as opções de correção do config.py, se estiverem definidas.
+
+    Returns:
+        dict: role_name, profile_name, workers, ssm_policies
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    return {
+        'role_name': getattr(config, 'SSM_ROLE_NAME', DEFAULT_ROLE_NAME),
+        'profile_name': getattr(config, 'SSM_INSTANCE_PROFILE_NAME', DEFAULT_PROFILE_NAME),
+        'workers': getattr(config, 'REMEDIATION_WORKERS', DEFAULT_WORKERS),
+        'ssm_policies': getattr(config, 'SSM_POLICIES', DEFAULT_SSM_POLICIES),
+    }
+
+
+def _error_code(error):
+    return error.response.get('Error', {}).get('Code') if isinstance(error, ClientError) else None
+
+
+class AccountPlan:
+    """
+    Correções de uma conta.
+
+    Attributes:
+        associate: Lista de (região, InstanceId, Name) sem role
+        attach: Dict role -> lista de (região, InstanceId) que dependem dela
+            (cada role aparece uma vez)
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.associate = []
+        self.attach = OrderedDict()
+
+    def instance_count(self):
+        return len(self.associate) + sum(len(instances) for instances in self.attach.values())
+
+
+def build_plan(records):
+    """
+    Agrupa as instâncias NO_SSM do inventário por conta.
+
+    Args:
+        records: InventoryRecord da última varredura (snapshot.load('inventory'))
+
+    Returns:
+        tuple: (OrderedDict profile -> AccountPlan, lista de (registro, motivo) ignorados)
+    """
+    plans = OrderedDict()
+    skipped = []
+    for record in records:
+        if record.ssm_status != 'NO_SSM':
+            continue
+        if record.state != 'running':
+            skipped.append((record, "instância não está running"))
+            continue
+        if record.iam_role == 'ERROR_ROLE':
+            skipped.append((record, "instance profile sem role"))
+            continue
+
+        plan = plans.get(record.profile)
+        if plan is None:
+            plan = plans[record.profile] = AccountPlan(record.profile)
+        if record.iam_role == 'NO_ROLE':
+            plan.associate.append((record.region, record.instance_id, record.name))
+        else:
+            plan.attach.setdefault(record.iam_role, []).append((record.region, record.instance_id))
+    return plans, skipped
+
+
+def action_key(action):
+    """Chave da ação no checkpoint: instância associada ou role corrigida, por conta."""
+    if action.kind == 'attach':
+        return (action.kind, action.profile, action.target)
+    return (action.kind, action.profile, action.instance_id)
+
+
+def skip_done(plans, done):
+    """
+    Remove dos planos as ações já concluídas (chaves de action_key()).
+
+    Returns:
+        tuple: (OrderedDict profile -> AccountPlan só com o que falta, instâncias puladas)
+    """
+    remaining = OrderedDict()
+    skipped = 0
+    for profile, plan in plans.items():
+        pending = AccountPlan(profile)
+        for entry in plan.associate:
+            if ('associate', profile, entry[1]) in done:
+                skipped += 1
+            else:
+                pending.associate.append(entry)
+        for role_name, instances in plan.attach.items():
+            if ('attach', profile, role_name) in done:
+                skipped += len(instances)
+            else:
+                pending.attach[role_name] = instances
+        if pending.instance_count():
+            remaining[profile] = pending
+    return remaining, skipped
+
+
+class Remediator:
+    """
+    Executa os AccountPlan em paralelo.
+
+    Args:
+        client_fn: Função (profile, região, serviço) -> cliente boto3 (ex: aws_clients.get_client)
+        workers: Ações em andamento ao mesmo tempo
+        role_name / profile_name: Role e instance profile compartilhados por conta
+        ssm_policies: Policies aceitas pelo nome quando o documento não pode ser lido
+        timeout: Segundos esperando a propagação de um instance profile novo
+        sleep: Função de espera (substituível no benchmark)
+        evaluator: PolicyEvaluator (padrão: um novo, com ssm_policies)
+    """
+
+    def __init__(self, client_fn, workers=DEFAULT_WORKERS, role_name=DEFAULT_ROLE_NAME,
+                 profile_name=DEFAULT_PROFILE_NAME, ssm_policies=DEFAULT_SSM_POLICIES,
+                 timeout=PROPAGATION_TIMEOUT, sleep=time.sleep, evaluator=None):
+        self.client_fn = client_fn
+        self.workers = max(1, workers)
+        self.role_name = role_name
+        self.profile_name = profile_name
+        self.ssm_policies = ssm_policies
+        self.timeout = timeout
+        self.sleep = sleep
+        self.evaluator = evaluator or PolicyEvaluator(fallback_names=ssm_policies)
+        # (profile, role) que já receberam a policy nesta execução
+        self.fixed_roles = set()
+
+    def _iam(self, profile, region):
+        # IAM é global: a região só define a partição do cliente
+        return self.client_fn(profile, region, 'iam')
+
+    def needs_ssm_policy(self, iam, role_name):
+        """
+        Decide pelo documento das policies se a role precisa de SSM_POLICY_ARN.
+
+        Returns:
+            bool: False se a role já concede as ações do SSM
+
+        Raises:
+            NotFixable: Nem com a policy anexada a role concederia as ações
+        """
+        detail = load_role_detail(iam, role_name)
+        if self.evaluator.role_allows(detail, iam):
+            return False
+        fixed = RoleDetail(detail.attached + ((SSM_POLICY_ARN, SSM_POLICY_NAME),), detail.inline, detail.boundary)
+        if not self.evaluator.role_allows(fixed, iam):
+            missing = ', '.join(self.evaluator.missing(fixed, iam))
+            reason = f"permission boundary {detail.boundary}" if detail.boundary else "Deny explícito"
+            raise NotFixable(f"mesmo com {SSM_POLICY_NAME}, {missing} continuariam negadas "
+                             f"(verifique {reason} e os Deny das policies)")
+        return True
+
+    def ensure_shared_profile(self, profile, region):
+        """
+        Garante a role e o instance profile compartilhados da conta.
+
+        Reaproveita o que já existe; cria ou completa só o que falta.
+
+        Returns:
+            bool: True se algo foi criado/alterado (é preciso aguardar a propagação)
+        """
+        iam = self._iam(profile, region)
+        changed = False
+
+        try:
+            iam.create_role(RoleName=self.role_name, AssumeRolePolicyDocument=TRUST_POLICY,
+                            Description="SSM role for EC2 instances")
+            changed = True
+        except ClientError as e:
+            if _error_code(e) != 'EntityAlreadyExists':
+                raise
+        if changed or self.needs_ssm_policy(iam, self.role_name):
+            iam.attach_role_policy(RoleName=self.role_name, PolicyArn=SSM_POLICY_ARN)
+            changed = True
+        self.fixed_roles.add((profile, self.role_name))
+
+        try:
+            iam.create_instance_profile(InstanceProfileName=self.profile_name)
+            roles = []
+            changed = True
+        except ClientError as e:
+            if _error_code(e) != 'EntityAlreadyExists':
+                raise
+            response = iam.get_instance_profile(InstanceProfileName=self.profile_name)
+            roles = [role['RoleName'] for role in response['InstanceProfile'].get('Roles', [])]
+        if self.role_name not in roles:
+            if roles:
+                raise RuntimeError(f"Instance profile {self.profile_name} já tem outra role: {roles[0]}")
+            iam.add_role_to_instance_profile(InstanceProfileName=self.profile_name, RoleName=self.role_name)
+            changed = True
+
+        if changed:
+            iam.get_waiter('instance_profile_exists').wait(InstanceProfileName=self.profile_name)
+        return changed
+
+    def associate(self, profile, region, instance_id, propagating=False):
+        """
+        Associa o instance profile compartilhado à instância.
+
+        Com propagating=True repete enquanto o EC2 ainda não enxerga o instance profile
+        recém-criado (InvalidParameterValue), até PROPAGATION_TIMEOUT.
+        """
+        ec2 = self.client_fn(profile, region, 'ec2')
+        deadline = time.monotonic() + self.timeout
+        delay = PROPAGATION_DELAY
+        while True:
+            try:
+                ec2.associate_iam_instance_profile(IamInstanceProfile={'Name': self.profile_name},
+                                                   InstanceId=instance_id)
+                return
+            except ClientError as e:
+                if not propagating or _error_code(e) != 'InvalidParameterValue' or time.monotonic() + delay > deadline:
+                    raise
+            self.sleep(delay)
+            delay = min(delay * 2, 16)
+
+    def attach(self, profile, region, role_name):
+        """
+        Anexa a policy SSM a uma role existente, se for preciso e se bastar.
+
+        Returns:
+            str ou None: Observação quando o attach não foi necessário
+        """
+        iam = self._iam(profile, region)
+        if not self.needs_ssm_policy(iam, role_name):
+            return "a role já concede as ações do SSM (varredura desatualizada)"
+        iam.attach_role_policy(RoleName=role_name, PolicyArn=SSM_POLICY_ARN)
+        return None
+
+    def _prepare(self, plan):
+        """Cria o instance profile da conta e faz a primeira associação como sonda de propagação."""
+        region, instance_id, name = plan.associate[0]
+        changed = self.ensure_shared_profile(plan.profile, region)
+        action = Action('associate', plan.profile, region, instance_id, self.profile_name, True, name)
+        try:
+            self.associate(plan.profile, region, instance_id, propagating=changed)
+        except Exception as e:
+            return action._replace(ok=False, detail=str(e))
+        return action
+
+    def run(self, plans):
+        """
+        Executa todos os planos.
+
+        Yields:
+            Action: Na ordem em que terminam
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}
+
+            def submit(fn, action, *args):
+                pending[executor.submit(fn, *args)] = action
+
+            for plan in plans.values():
+                if plan.associate:
+                    pending[executor.submit(self._prepare, plan)] = plan
+                for role_name, instances in plan.attach.items():
+                    if (plan.profile, role_name) in self.fixed_roles:
+                        continue
+                    self.fixed_roles.add((plan.profile, role_name))
+                    region = instances[0][0]
+                    instance_ids = ', '.join(instance_id for _, instance_id in instances)
+                    action = Action('attach', plan.profile, region, instance_ids, role_name, True, None)
+                    submit(self.attach, action, plan.profile, region, role_name)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    if isinstance(item, AccountPlan):
+                        yield from self._after_prepare(item, future, submit)
+                        continue
+                    try:
+                        detail = future.result()
+                    except NotFixable as e:
+                        yield item._replace(kind='skip', ok=False, detail=str(e))
+                    except Exception as e:
+                        yield item._replace(ok=False, detail=str(e))
+                    else:
+                        yield item._replace(detail=detail) if detail else item
+
+    def _after_prepare(self, plan, future, submit):
+        try:
+            yield future.result()
+        except Exception as e:
+            # Sem instance profile na conta: nenhuma associação é possível
+            for region, instance_id, _ in plan.associate:
+                yield Action('associate', plan.profile, region, instance_id, self.profile_name, False, str(e))
+            return
+        # Instance profile já visível no EC2: o restante da conta roda em paralelo
+        for region, instance_id, name in plan.associate[1:]:
+            action = Action('associate', plan.profile, region, instance_id, self.profile_name, True, name)
+            submit(self.associate, action, plan.profile, region, instance_id, True)
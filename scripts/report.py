@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Relatório de conformidade SSM (reports/RELATORIO_SSM.md) gerado da última varredura.
+
+O relatório era preenchido à mão, e os totais (running, no SSM, faltando)
+só existiam nos contadores impressos pelo compare_ec2_ssm.py. Aqui as três
+saídas do scan.py viram DataFrames do pandas (do snapshot sqlite, ou dos
+CSVs se não houver snapshot) e todos os números saem de group-bys
+vetorizados, sem laço Python por instância:
+
+- conformidade (% SSM_Status OK) por conta e por conta/região
+- running fora do SSM (missing-from-ssm.csv) por conta/região
+- distribuição das versões do agente (AgentVersion) por plataforma
+- PingStatus por conta
+- tabela de instâncias pendentes, com o motivo, limitada a REPORT_MAX_PENDING linhas
+
+Seções sem dados (ex: só o inventário foi gerado) são omitidas. Para uma
+frota de 100 mil instâncias o relatório sai em bem menos de um segundo
+(python3 benchmark_scan.py relatorio).
+
+Requer: pip install pandas (numpy vem junto)
+
+Uso:
+    python3 report.py
+    python3 report.py --output /tmp/relatorio.md --max-pending 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    pd = None
+
+import snapshot
+from snapshot import RECORD_TYPES, SnapshotStore
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../reports/RELATORIO_SSM.md")
+DEFAULT_MAX_PENDING = 200
+# Versões do agente listadas (das mais novas); as demais viram uma linha só
+TOP_VERSIONS = 15
+
+DEFAULT_POLICIES = ['AmazonSSMManagedInstanceCore', 'AmazonEC2RoleforSSM', 'AmazonSSMFullAccess']
+
+# Motivo de cada instância pendente, como no resumo do scan.py
+ROLE_REASONS = {'NO_ROLE': 'SEM IAM Role', 'ERROR_ROLE': 'Erro ao obter role'}
+NO_POLICY_REASON = 'Role sem SSM'
+MISSING_REASONS = {'Yes': 'Running fora do SSM (agente)', 'No': 'Running fora do SSM, sem role'}
+
+# Chaves dos group-bys: viram `category` na carga, e os agrupamentos passam a
+# ser sobre códigos inteiros. As demais colunas só são comparadas com um valor.
+CATEGORY_COLUMNS = ('Profile', 'Region', 'PingStatus', 'AgentVersion', 'PlatformType')
+
+
+def available():
+    return pd is not None
+
+
+def configured_max_pending():
+    try:
+        import config
+    except ImportError:
+        return DEFAULT_MAX_PENDING
+    return getattr(config, 'REPORT_MAX_PENDING', DEFAULT_MAX_PENDING)
+
+
+def configured_policies():
+    try:
+        import config
+    except ImportError:
+        return DEFAULT_POLICIES
+    return getattr(config, 'SSM_POLICIES', DEFAULT_POLICIES)
+
+
+def as_categories(frame):
+    for column in frame.columns.intersection(CATEGORY_COLUMNS):
+        frame[column] = frame[column].fillna('N/A').astype('category')
+    return frame
+
+
+def load_frames(path=None, directory=None):
+    """
+    Saídas da última varredura como DataFrames, com as colunas dos CSVs.
+
+    Cada tabela vem do snapshot se ele a tiver, senão do CSV (como snapshot.load()).
+
+    Returns:
+        tuple: ({kind: DataFrame ou None}, horário da varredura em segundos ou None)
+    """
+    path = path or snapshot.configured_path()
+    directory = directory or snapshot.data_dir()
+    frames = dict.fromkeys(RECORD_TYPES)
+    written = []
+    if os.path.exists(path):
+        with SnapshotStore(path) as store:
+            for kind, record_type in RECORD_TYPES.items():
+                written_at = store.written_at(kind)
+                if written_at is not None:
+                    frames[kind] = as_categories(pd.DataFrame(store.rows(kind), columns=list(record_type.header)))
+                    written.append(written_at)
+
+    for kind, record_type in RECORD_TYPES.items():
+        csv_path = os.path.join(directory, record_type.csv_file)
+        if frames[kind] is None and os.path.exists(csv_path):
+            header = list(record_type.header)
+            frames[kind] = as_categories(pd.read_csv(csv_path, dtype=str, keep_default_na=False, usecols=header)[header])
+            written.append(os.path.getmtime(csv_path))
+    return frames, (max(written) if written else None)
+
+
+def percent(part, total):
+    """part / total em %, 0 onde total é 0 (arrays ou Series)."""
+    part = np.asarray(part, dtype=float)
+    total = np.asarray(total, dtype=float)
+    return np.divide(part * 100, total, out=np.zeros_like(part), where=total > 0)
+
+
+def compliance_by_location(inventory, missing=None):
+    """
+    Conformidade por (Profile, Region).
+
+    Returns:
+        DataFrame indexado por (Profile, Region): instances, running, ok, pending, percent
+        e missing (running fora do SSM) quando houver missing
+    """
+    frame = pd.DataFrame({
+        'Profile': inventory['Profile'],
+        'Region': inventory['Region'],
+        'running': inventory['State'].eq('running'),
+        'ok': inventory['SSM_Status'].eq('OK'),
+    })
+    table = frame.groupby(['Profile', 'Region'], sort=True, observed=True).agg(
+        instances=('ok', 'size'), running=('running', 'sum'), ok=('ok', 'sum'))
+    if missing is not None:
+        missing_counts = missing.groupby(['Profile', 'Region'], observed=True).size()
+        table['missing'] = missing_counts.reindex(table.index, fill_value=0)
+    return with_totals(table)
+
+
+def with_totals(table):
+    table['pending'] = table['instances'] - table['ok']
+    table['percent'] = percent(table['ok'], table['instances'])
+    return table
+
+
+def compliance_by_account(by_location):
+    """Soma as colunas de compliance_by_location por conta."""
+    columns = [column for column in ('instances', 'running', 'ok', 'missing') if column in by_location]
+    return with_totals(by_location[columns].groupby(level='Profile', sort=True, observed=True).sum())
+
+
+def count_table(frame, index, columns, total=False):
+    """Linhas de `frame` por `index` (linhas) × `columns` (colunas); total=True acrescenta a linha Total."""
+    table = frame.groupby([index, columns], observed=True).size().unstack(fill_value=0)
+    if total:
+        table.loc['Total'] = table.sum()
+    return table
+
+
+def version_order(versions):
+    """Posições de `versions` da mais nova para a mais antiga; o que não é x.y.z fica no fim."""
+    parts = versions.str.extract(r'^(\d+)\.(\d+)\.(\d+)(?:\.(\d+))?').astype(float).fillna(-1)
+    return np.lexsort([parts[column].to_numpy() for column in reversed(parts.columns)])[::-1]
+
+
+def agent_versions(agent, top=TOP_VERSIONS):
+    """
+    Instâncias por versão do agente e plataforma, das versões mais novas para as mais antigas.
+
+    Returns:
+        DataFrame indexado por AgentVersion: uma coluna por PlatformType e total;
+        além de `top` versões, as mais antigas são somadas em uma linha
+    """
+    table = count_table(agent, 'AgentVersion', 'PlatformType')
+    table = table.iloc[version_order(table.index.to_series())]
+    if len(table) > top:
+        older = table.iloc[top:].sum().to_frame(f"{len(table) - top} versões mais antigas").T
+        table = pd.concat([table.iloc[:top], older])
+    table['total'] = table.sum(axis=1)
+    return table
+
+
+def ping_status(agent):
+    """Instâncias por conta e PingStatus (colunas), com o total por PingStatus na última linha."""
+    return count_table(agent, 'Profile', 'PingStatus', total=True)
+
+
+def pending_instances(inventory=None, missing=None):
+    """
+    Instâncias que ainda precisam de correção, com o motivo.
+
+    Do inventário, as que não estão OK; do missing, as running fora do SSM que
+    não estão já no inventário como pendentes.
+
+    Returns:
+        DataFrame: InstanceId, Name, Profile, Region, State, Motivo (ordenado por conta/região)
+    """
+    columns = ['InstanceId', 'Name', 'Profile', 'Region', 'State', 'Motivo']
+    parts = []
+    if inventory is not None:
+        pending = inventory.loc[inventory['SSM_Status'].ne('OK')]
+        role = pending['IAM_Role']
+        reason = np.select([role.eq(key) for key in ROLE_REASONS], list(ROLE_REASONS.values()), NO_POLICY_REASON)
+        parts.append(pending.assign(Motivo=reason)[columns])
+    if missing is not None:
+        extra = missing
+        if parts:
+            extra = missing.loc[~missing['InstanceId'].isin(parts[0]['InstanceId'])]
+        reason = np.where(extra['HasRole'].eq('No'), MISSING_REASONS['No'], MISSING_REASONS['Yes'])
+        parts.append(extra.assign(State='running', Motivo=reason)[columns])
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    table = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    # Ordena por códigos inteiros: mais rápido que sort_values sobre colunas de strings
+    keys = [pd.factorize(table[column], sort=True)[0] for column in ('InstanceId', 'State', 'Region', 'Profile')]
+    return table.iloc[np.lexsort(keys)].reset_index(drop=True)
+
+
+def markdown_table(header, rows):
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '|'.join('-' * (len(column) + 2) for column in header) + '|']
+    lines.extend('| ' + ' | '.join(str(value).replace('|', '\\|') for value in row) + ' |' for row in rows)
+    return lines
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+def render(frames, written_at=None, max_pending=DEFAULT_MAX_PENDING, policies=DEFAULT_POLICIES):
+    """
+    Markdown do relatório.
+
+    Args:
+        frames: {kind: DataFrame ou None} (load_frames)
+        written_at: Horário da varredura
+        max_pending: Linhas da tabela de pendentes (o resumo por motivo conta todas)
+        policies: SSM_POLICIES
+    """
+    inventory, agent, missing = frames.get('inventory'), frames.get('agent'), frames.get('missing')
+    lines = ["# Relatório de Implementação SSM - Multi-Account", ""]
+    origin = f" a partir da varredura de {format_time(written_at)}" if written_at else ""
+    lines += [f"Gerado por `report.py` em {format_time(time.time())}{origin}.", ""]
+
+    lines += ["## 📊 Resumo Geral", ""]
+    by_location = None
+    if inventory is not None:
+        by_location = compliance_by_location(inventory, missing)
+        total = int(by_location['instances'].sum())
+        ok = int(by_location['ok'].sum())
+        running = int(by_location['running'].sum())
+        lines += [
+            f"- **Total de instâncias:** {total} ({running} running)",
+            f"- **✅ Com SSM configurado:** {ok} ({percent(ok, total):.1f}%)",
+            f"- **⚠️ Pendentes:** {total - ok} ({percent(total - ok, total):.1f}%)",
+        ]
+        if missing is not None:
+            in_ssm = running - len(missing)
+            lines += [f"- **Running no SSM:** {in_ssm} ({percent(in_ssm, running):.1f}% das running)"]
+    if missing is not None:
+        lines += [f"- **❌ Running faltando no SSM:** {len(missing)}"]
+    if agent is not None:
+        online = int(agent['PingStatus'].eq('Online').sum())
+        lines += [f"- **Instâncias no SSM:** {len(agent)} ({online} Online)"]
+    if inventory is None and missing is None and agent is None:
+        lines += ["Nenhum dado de varredura encontrado. Execute `scan.py` primeiro."]
+    lines.append("")
+
+    if by_location is not None:
+        with_missing = 'missing' in by_location
+        header = ['Conta', 'Instâncias', 'Running', 'SSM OK', 'Pendentes', '% SSM']
+        header += ['Faltando no SSM'] if with_missing else []
+
+        def table_rows(table):
+            # Índice por conta ou por (conta, região)
+            for key, row in zip(table.index, table.itertuples(index=False)):
+                values = list(key) if isinstance(key, tuple) else [key]
+                values += [row.instances, row.running, row.ok, row.pending, f"{row.percent:.1f}%"]
+                yield values + ([row.missing] if with_missing else [])
+
+        lines += ["### Contas processadas", ""]
+        lines += markdown_table(header, table_rows(compliance_by_account(by_location)))
+        lines += ["", "### Conformidade por conta e região", ""]
+        lines += markdown_table(['Conta', 'Região'] + header[1:], table_rows(by_location))
+        lines.append("")
+
+    if agent is not None:
+        versions = agent_versions(agent)
+        platforms = [column for column in versions.columns if column != 'total']
+        lines += ["## 🤖 Agente SSM", "", "### Versões do agente", ""]
+        lines += markdown_table(['Versão'] + platforms + ['Total', '%'], (
+            [version] + [row[platform] for platform in platforms] + [row['total'], f"{share:.1f}%"]
+            for (version, row), share in zip(versions.iterrows(), percent(versions['total'], len(agent)))))
+        pings = ping_status(agent)
+        lines += ["", "### PingStatus por conta", ""]
+        lines += markdown_table(['Conta'] + list(pings.columns), (
+            [profile] + list(row) for profile, row in zip(pings.index, pings.itertuples(index=False))))
+        lines.append("")
+
+    if inventory is not None or missing is not None:
+        pending = pending_instances(inventory, missing)
+        lines += ["## ⚠️ Instâncias Pendentes", ""]
+        if pending.empty:
+            lines += ["Nenhuma instância pendente.", ""]
+        else:
+            reasons = count_table(pending, 'Motivo', 'State', total=True)
+            lines += markdown_table(['Motivo'] + list(reasons.columns), (
+                [reason] + list(row) for reason, row in zip(reasons.index, reasons.itertuples(index=False))))
+            lines.append("")
+            shown = pending.iloc[:max_pending]
+            lines += markdown_table(['Instance ID', 'Nome', 'Conta', 'Região', 'Status', 'Motivo'],
+                                    shown.itertuples(index=False))
+            if len(pending) > len(shown):
+                lines += ["", f"... e mais {len(pending) - len(shown)} instâncias (lista completa: "
+                              "`python3 history.py query inventory --status NO_SSM` ou `data/ec2-inventory.csv`)."]
+            lines += ["", "**Ação recomendada:** Execute `enable_ssm.py` para as instâncias sem role ou sem policy "
+                          "SSM (as stopped são corrigidas quando forem iniciadas) e `install_ssm_via_runcommand.py` "
+                          "para as running fora do SSM.", ""]
+
+    lines += ["## ✅ Políticas SSM Reconhecidas", ""]
+    lines += [f"- `{policy}`" for policy in policies]
+    lines += [
+        "",
+        "## 🚀 Como Usar",
+        "",
+        "```bash",
+        "cd scripts",
+        "python3 scan.py          # nova varredura",
+        "python3 enable_ssm.py    # habilitar SSM nas pendentes",
+        "python3 report.py        # gerar este relatório",
+        "```",
+        "",
+        "## ⚠️ Importante",
+        "",
+        "- **Nenhuma instância é reiniciada** durante o processo",
+        "- As instâncias podem levar 5-10 minutos para aparecer no Systems Manager após a configuração",
+        "- O agente SSM precisa estar instalado nas instâncias",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o relatório de conformidade SSM da última varredura")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="arquivo Markdown (padrão: reports/RELATORIO_SSM.md)")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="linhas da tabela de pendentes (padrão: REPORT_MAX_PENDING)")
+    args = parser.parse_args()
+
+    if not available():
+        print("❌ report.py requer pandas: pip install pandas")
+        return 1
+
+    start = time.perf_counter()
+    frames, written_at = load_frames()
+    if all(frame is None for frame in frames.values()):
+        print("❌ Nenhum snapshot ou CSV encontrado em data/. Execute scan.py primeiro.")
+        return 1
+    loaded = time.perf_counter()
+    max_pending = args.max_pending if args.max_pending is not None else configured_max_pending()
+    text = render(frames, written_at, max_pending=max_pending, policies=configured_policies())
+    with open(args.output, 'w') as f:
+        f.write(text)
+
+    instances = sum(len(frame) for frame in frames.values() if frame is not None)
+    print(f"✅ Relatório salvo em: {args.output}")
+    print(f"   {instances} linhas lidas em {loaded - start:.2f}s, relatório em {time.perf_counter() - loaded:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
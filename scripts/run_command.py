@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Despacho do Run Command em escala de frota.
+
+O install_ssm_via_runcommand.py enviava um send_command por instância (e só
+para as 5 primeiras) e nunca conferia o resultado. Aqui:
+
+- os alvos são agrupados por (profile, região, plataforma) e enviados em
+  lotes de até 50 InstanceIds por send_command (limite da API), ou por tag
+  (Targets), um comando por (profile, região)
+- MaxConcurrency / MaxErrors são repassados ao SSM, que controla o rollout e
+  interrompe o comando se os erros passarem do limite
+- o acompanhamento é feito em lote por região: list_commands (todos os
+  comandos desde o início do despacho) mostra quais terminaram, e só então
+  list_command_invocations traz o status de cada instância do comando
+- o resultado por instância vai para um CSV (RESULTS_HEADER)
+
+Os envios e as consultas de cada região rodam em paralelo.
+"""
+
+import csv
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from collectors import iter_command_invocations, iter_commands
+
+# Limite de InstanceIds por send_command
+BATCH_SIZE = 50
+
+DEFAULT_MAX_CONCURRENCY = '10%'
+DEFAULT_MAX_ERRORS = '5%'
+DEFAULT_TIMEOUT_SECONDS = 600
+DEFAULT_POLL_INTERVAL = 15
+DEFAULT_WORKERS = 8
+
+# Status finais de um comando (list_commands)
+TERMINAL_STATUS = {'Success', 'Failed', 'Cancelled', 'TimedOut'}
+
+# Instâncias sem invocação registrada (ex: comando interrompido por MaxErrors)
+NO_INVOCATION = 'NoInvocation'
+SEND_FAILED = 'SendFailed'
+
+RESULTS_HEADER = ['Profile', 'Region', 'InstanceId', 'Platform', 'CommandId', 'Status', 'Detail']
+
+# Um alvo do despacho
+Target = namedtuple('Target', ['profile', 'region', 'platform', 'instance_id'])
+
+# Um send_command enviado; instance_ids vazio quando o alvo é por tag
+Dispatch = namedtuple('Dispatch', ['profile', 'region', 'platform', 'command_id', 'instance_ids'])
+
+# Resultado de uma instância
+InvocationResult = namedtuple('InvocationResult', ['profile', 'region', 'instance_id', 'platform',
+                                                   'command_id', 'status', 'detail'])
+
+
+def configured_dispatch():
+    """
+    Lê as opções do Run Command do config.py, se estiverem definidas.
+
+    Returns:
+        dict: max_concurrency, max_errors, timeout, poll_interval, workers
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    return {
+        'max_concurrency': getattr(config, 'RUN_COMMAND_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY),
+        'max_errors': getattr(config, 'RUN_COMMAND_MAX_ERRORS', DEFAULT_MAX_ERRORS),
+        'timeout': getattr(config, 'RUN_COMMAND_TIMEOUT', DEFAULT_TIMEOUT_SECONDS),
+        'poll_interval': getattr(config, 'RUN_COMMAND_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+        'workers': getattr(config, 'MAX_WORKERS', DEFAULT_WORKERS),
+    }
+
+
+def group_targets(targets):
+    """
+    Agrupa os alvos por (profile, região, plataforma), sem repetir instâncias.
+
+    Returns:
+        OrderedDict: (profile, região, plataforma) -> lista de InstanceId
+    """
+    groups = OrderedDict()
+    seen = set()
+    for target in targets:
+        key = (target.profile, target.region, target.instance_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        groups.setdefault((target.profile, target.region, target.platform), []).append(target.instance_id)
+    return groups
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Dispatcher:
+    """
+    Envia comandos em lote e acompanha a conclusão em toda a frota.
+
+    Args:
+        client_fn: Função (profile, região, serviço) -> cliente boto3 (ex: aws_clients.get_client)
+        max_concurrency / max_errors: MaxConcurrency / MaxErrors de cada send_command
+        timeout: Segundos máximos acompanhando os comandos
+        poll_interval: Segundos entre rodadas de consulta
+        workers: Regiões enviadas/consultadas ao mesmo tempo
+        sleep: Função de espera (substituível no benchmark)
+    """
+
+    def __init__(self, client_fn, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_errors=DEFAULT_MAX_ERRORS,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL,
+                 workers=DEFAULT_WORKERS, sleep=time.sleep):
+        self.client_fn = client_fn
+        self.max_concurrency = max_concurrency
+        self.max_errors = max_errors
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.workers = max(1, workers)
+        self.sleep = sleep
+        self.started_at = None
+
+    def _send(self, profile, region, document, comment, instance_ids=None, targets=None):
+        ssm = self.client_fn(profile, region, 'ssm')
+        kwargs = {
+            'DocumentName': document['DocumentName'],
+            'MaxConcurrency': self.max_concurrency,
+            'MaxErrors': self.max_errors,
+            'TimeoutSeconds': document.get('TimeoutSeconds', 300),
+            'Comment': comment[:100],
+        }
+        if document.get('Parameters'):
+            kwargs['Parameters'] = document['Parameters']
+        if targets:
+            kwargs['Targets'] = targets
+        else:
+            kwargs['InstanceIds'] = instance_ids
+        return ssm.send_command(**kwargs)['Command']['CommandId']
+
+    def send(self, groups, document_fn, comment=''):
+        """
+        Envia um send_command por lote de até BATCH_SIZE instâncias.
+
+        Args:
+            groups: Saída de group_targets
+            document_fn: Função plataforma -> dict com DocumentName, Parameters e
+                TimeoutSeconds (None se a plataforma não é suportada)
+            comment: Comment dos comandos
+
+        Returns:
+            tuple: (lista de Dispatch, lista de InvocationResult das falhas de envio)
+        """
+        self.started_at = self.started_at or datetime.now(timezone.utc)
+        jobs = []
+        failures = []
+        for (profile, region, platform), instance_ids in groups.items():
+            document = document_fn(platform)
+            if document is None:
+                failures.extend(InvocationResult(profile, region, instance_id, platform, '', SEND_FAILED,
+                                                 "plataforma não suportada") for instance_id in instance_ids)
+                continue
+            for batch in batches(instance_ids):
+                jobs.append((profile, region, platform, document, batch))
+
+        def run(job):
+            profile, region, platform, document, batch = job
+            try:
+                command_id = self._send(profile, region, document, comment, instance_ids=batch)
+            except Exception as e:
+                return None, [InvocationResult(profile, region, instance_id, platform, '', SEND_FAILED, str(e))
+                              for instance_id in batch]
+            return Dispatch(profile, region, platform, command_id, batch), []
+
+        dispatches = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for dispatch, errors in executor.map(run, jobs):
+                if dispatch:
+                    dispatches.append(dispatch)
+                failures.extend(errors)
+        return dispatches, failures
+
+    def send_by_tag(self, pairs, document, tag_key, tag_value, comment=''):
+        """
+        Envia um send_command por (profile, região) com alvo por tag.
+
+        O SSM resolve as instâncias da tag; elas aparecem nas invocações.
+        """
+        self.started_at = self.started_at or datetime.now(timezone.utc)
+        targets = [{'Key': f"tag:{tag_key}", 'Values': [tag_value]}]
+        dispatches = []
+        failures = []
+        for profile, region in pairs:
+            try:
+                command_id = self._send(profile, region, document, comment, targets=targets)
+            except Exception as e:
+                failures.append(InvocationResult(profile, region, f"tag:{tag_key}={tag_value}", '', '',
+                                                 SEND_FAILED, str(e)))
+                continue
+            dispatches.append(Dispatch(profile, region, '', command_id, []))
+        return dispatches, failures
+
+    def _poll_region(self, ssm, commands, final):
+        """
+        Uma rodada de consulta de uma região.
+
+        Returns:
+            dict: CommandId -> lista de invocações, só para os comandos concluídos
+                (todos, se final=True)
+        """
+        # Margem para diferença de relógio entre a máquina local e a AWS
+        invoked_after = self.started_at - timedelta(minutes=5)
+        filters = [{'key': 'InvokedAfter', 'value': invoked_after.strftime('%Y-%m-%dT%H:%M:%SZ')}]
+        status = {command['CommandId']: command['Status'] for command in iter_commands(ssm, filters)}
+        finished = {}
+        for command_id in commands:
+            if final or status.get(command_id) in TERMINAL_STATUS:
+                finished[command_id] = list(iter_command_invocations(ssm, command_id))
+        return finished
+
+    def track(self, dispatches, progress=None):
+        """
+        Acompanha os comandos até todos terminarem ou o timeout.
+
+        Args:
+            dispatches: Lista de Dispatch
+            progress: Função (concluídos, total) chamada a cada rodada (opcional)
+
+        Yields:
+            InvocationResult: Uma por instância, conforme os comandos terminam
+        """
+        pending = OrderedDict()
+        for dispatch in dispatches:
+            pending.setdefault((dispatch.profile, dispatch.region), {})[dispatch.command_id] = dispatch
+        total = len(dispatches)
+        deadline = time.monotonic() + self.timeout
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while pending:
+                final = time.monotonic() >= deadline
+
+                def poll(item):
+                    (profile, region), commands = item
+                    return self._poll_region(self.client_fn(profile, region, 'ssm'), commands, final)
+
+                for ((profile, region), commands), finished in zip(list(pending.items()),
+                                                                   executor.map(poll, pending.items())):
+                    for command_id, invocations in finished.items():
+                        yield from self._results(commands.pop(command_id), invocations)
+                    if not commands:
+                        del pending[(profile, region)]
+
+                if progress:
+                    progress(total - sum(len(commands) for commands in pending.values()), total)
+                if pending:
+                    self.sleep(self.poll_interval)
+
+    @staticmethod
+    def _results(dispatch, invocations):
+        seen = set()
+        for invocation in invocations:
+            seen.add(invocation['InstanceId'])
+            yield InvocationResult(dispatch.profile, dispatch.region, invocation['InstanceId'], dispatch.platform,
+                                   dispatch.command_id, invocation['Status'],
+                                   invocation.get('StatusDetails', ''))
+        for instance_id in dispatch.instance_ids:
+            if instance_id not in seen:
+                yield InvocationResult(dispatch.profile, dispatch.region, instance_id, dispatch.platform,
+                                       dispatch.command_id, NO_INVOCATION, '')
+        if not seen and not dispatch.instance_ids:
+            # Alvo por tag sem nenhuma instância correspondente
+            yield InvocationResult(dispatch.profile, dispatch.region, '', dispatch.platform,
+                                   dispatch.command_id, NO_INVOCATION, "nenhuma instância com a tag")
+
+
+def write_results(path, results):
+    """Grava o resultado por instância, ordenado por profile/região/instância."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULTS_HEADER)
+        for result in sorted(results, key=lambda r: (r.profile, r.region, r.instance_id)):
+            writer.writerow([result.profile, result.region, result.instance_id, result.platform,
+                             result.command_id, result.status, result.detail])
@@ -0,0 +1,833 @@
+#!/usr/bin/env python3
+"""
+Varredura única de EC2, SSM e IAM que gera os três CSVs.
+
+check_ssm_status.py, check_ssm_agent.py e compare_ec2_ssm.py consultavam
+describe_instances / describe_instance_information separadamente para as
+mesmas contas e regiões. Aqui cada par (profile, região) é coletado uma única
+vez e as três saídas são derivadas do mesmo resultado em memória:
+
+- inventory: data/ec2-inventory.csv    (EC2 + IAM)
+- agent:     data/ssm-agent-status.csv (SSM)
+- missing:   data/missing-from-ssm.csv (EC2 running + SSM)
+
+Só os dados necessários para as saídas pedidas são coletados. Os três scripts
+antigos continuam disponíveis e chamam este módulo com uma única saída.
+
+Uso:
+    python3 scan.py                          # os três CSVs
+    python3 scan.py --only inventory,missing
+    python3 scan.py --async
+    python3 scan.py --incremental            # só reclassifica o que mudou
+    python3 scan.py --no-csv                 # só o snapshot (data/snapshot.sqlite)
+    python3 scan.py --resume                 # retoma uma varredura interrompida
+
+Além dos CSVs, o resultado é gravado no snapshot (snapshot.py), de onde o
+enable_ssm.py e o install_ssm_via_runcommand.py leem só as linhas que usam, e
+acrescentado ao histórico de varreduras (history.py).
+
+Cada par concluído é registrado em data/scan-checkpoint.jsonl (checkpoint.py);
+com --resume os pares já registrados não são consultados de novo.
+"""
+
+import argparse
+import csv
+import functools
+import os
+import sys
+import time
+from collections import namedtuple
+
+from botocore.exceptions import ClientError
+
+import aggregator
+import async_scan
+import aws_clients
+import checkpoint
+import delta
+import history
+import snapshot
+from agent_versions import VersionIndex, configured_min_version
+from async_scan import paginate
+from aws_clients import POOL, discover_accounts, get_client, phase
+from collectors import (EC2_PAGE_SIZE, SSM_FILTER_BATCH, SSM_PAGE_SIZE, SsmInstance, ec2_page_instances,
+                        instance_filters, iter_ec2_instances, iter_ssm_instances, ssm_page_instances)
+from iam_cache import DEFAULT_TTL, IamCache
+from iam_index import AccountIndexes
+from iam_policy import PolicyEvaluator, load_role_detail, role_detail_from
+from scan_engine import UnitResult, run_units
+
+# Importar configuração
+try:
+    import config
+    from config import PROFILES, REGIONS, SSM_POLICIES
+except ImportError:
+    print("❌ Arquivo config.py não encontrado!")
+    print("Execute: cp ../config.example.py config.py")
+    print("E edite config.py com suas contas AWS")
+    sys.exit(1)
+
+ALL_OUTPUTS = ('inventory', 'agent', 'missing')
+
+# Avaliação das policies das roles, compartilhada por todas as contas (iam_policy.py);
+# SSM_POLICIES só vale para policies cujo documento não pode ser lido
+POLICIES = PolicyEvaluator(fallback_names=SSM_POLICIES)
+
+RUNNING_FILTER = instance_filters(['running'])
+
+# Instâncias running até as quais o SSM é consultado com filtro InstanceIds (ssm_instance_ids)
+SSM_FILTER_MAX_IDS = SSM_FILTER_BATCH
+
+# Resultado de um par (profile, região); listas vazias para saídas não pedidas.
+# state/reused só são preenchidos no modo incremental.
+RegionScan = namedtuple('RegionScan', ['inventory', 'agent', 'missing', 'running', 'in_ssm', 'state', 'reused'],
+                        defaults=(None, 0))
+
+
+def is_not_found(error):
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') == 'NoSuchEntity'
+
+def get_role_from_instance_profile(iam_client, instance_profile_arn, cache=None, account=None):
+    """
+    Resolve a role do instance profile; com cache, consulta o IAM uma vez por profile.
+
+    Retorna None se o instance profile não existir ou não tiver role. Outros
+    erros (throttling esgotado, AccessDenied) são repassados: marcar a
+    instância como ERROR_ROLE/NO_SSM nesses casos geraria correções indevidas.
+    """
+    def load():
+        profile_name = instance_profile_arn.split('/')[-1]
+        response = iam_client.get_instance_profile(InstanceProfileName=profile_name)
+        roles = response['InstanceProfile'].get('Roles', [])
+        if roles:
+            return roles[0]['RoleName']
+        return None
+
+    try:
+        if cache:
+            return cache.get(account, 'instance-profile', instance_profile_arn, load)
+        return load()
+    except ClientError as e:
+        if is_not_found(e):
+            return None
+        raise
+
+def check_ssm_policy(iam_client, role_name, cache=None, account=None):
+    """
+    Verifica se as policies da role concedem o SSM (iam_policy.py); com cache, consulta o IAM uma vez por role.
+
+    Só uma role inexistente conta como "sem SSM"; outros erros são repassados.
+    """
+    def load():
+        return list(load_role_detail(iam_client, role_name))
+
+    try:
+        if cache:
+            detail = role_detail_from(cache.get(account, 'role-detail', role_name, load))
+        else:
+            detail = load_role_detail(iam_client, role_name)
+        return POLICIES.role_allows(detail, iam_client)
+    except ClientError as e:
+        if is_not_found(e):
+            return False
+        raise
+
+def classify_instance(instance, iam, profile, cache=None, index=None):
+    """
+    Classifica a instância (collectors.Ec2Instance) a partir do instance profile associado.
+
+    Com `index` (IamIndex pré-carregado da conta) role e policies vêm do
+    índice, e só os documentos das policies da AWS ainda não lidos no processo
+    são consultados; sem ele, role e policies são consultadas no IAM (com
+    cache). As policies são avaliadas pelo POLICIES (iam_policy.py).
+
+    Returns:
+        tuple: (IAM_Role, SSM_Status)
+    """
+    role_arn = instance.instance_profile_arn
+    if not role_arn:
+        return 'NO_ROLE', 'NO_SSM'
+
+    if index is not None:
+        role_name = index.role_for_instance_profile(role_arn)
+    else:
+        role_name = get_role_from_instance_profile(iam, role_arn, cache, profile)
+
+    if not role_name:
+        return 'ERROR_ROLE', 'NO_SSM'
+
+    if index is not None:
+        has_ssm = POLICIES.role_allows(index.role_detail(role_name), iam, index.local_policies)
+    else:
+        has_ssm = check_ssm_policy(iam, role_name, cache, profile)
+    return role_name, 'OK' if has_ssm else 'NO_SSM'
+
+async def classify_instance_async(instance, iam, profile, resolver, index):
+    """Mesma classificação de classify_instance, com consultas IAM assíncronas."""
+    role_arn = instance.instance_profile_arn
+    if not role_arn:
+        return 'NO_ROLE', 'NO_SSM'
+
+    if index is not None:
+        role_name = index.role_for_instance_profile(role_arn)
+    else:
+        role_name = await resolver.role_for_instance_profile(profile, iam, role_arn)
+
+    if not role_name:
+        return 'ERROR_ROLE', 'NO_SSM'
+
+    if index is not None:
+        detail = index.role_detail(role_name)
+        local = index.local_policies
+    else:
+        detail = await resolver.role_detail(profile, iam, role_name)
+        local = None
+    if detail is None:
+        return role_name, 'NO_SSM'
+    await resolver.load_policies(iam, detail, local)
+    return role_name, 'OK' if resolver.evaluator.role_allows(detail, local=local) else 'NO_SSM'
+
+def inventory_row(profile, region, instance, iam_role, ssm_status):
+    return [profile, region, instance.instance_id, instance.name, instance.state, iam_role, ssm_status]
+
+def agent_row(profile, region, instance):
+    return [profile, region, instance.instance_id, instance.ping_status, instance.agent_version,
+            instance.platform_type]
+
+
+class RegionScanBuilder:
+    """
+    Acumula as instâncias de um par (profile, região) e deriva as saídas.
+
+    Recebe uma instância por vez, tanto na varredura síncrona quanto na
+    assíncrona, para que as duas produzam exatamente as mesmas linhas.
+
+    No modo incremental, `previous` traz as entradas da última varredura deste
+    par (delta.DeltaState) e reuse() devolve a classificação anterior das
+    instâncias que não mudaram.
+    """
+
+    def __init__(self, profile, region, outputs, previous=None, max_age=delta.DEFAULT_MAX_AGE):
+        self.profile = profile
+        self.region = region
+        self.outputs = outputs
+        self.inventory = []
+        self.agent = []
+        self.running = {}
+        self.ssm_ids = set()
+        self.previous = previous
+        self.max_age = max_age
+        self.state = {} if previous is not None else None
+        self.reused = 0
+        self._now = time.time()
+
+    def reuse(self, instance, index):
+        """Classificação da varredura anterior, se instância e role não mudaram."""
+        if self.previous is None:
+            return None
+        entry = self.previous.get(instance.instance_id)
+        classification = delta.reusable(entry, instance, index, self.max_age, self._now)
+        if classification:
+            self.reused += 1
+            self.state[instance.instance_id] = dict(entry, name=instance.name)
+        return classification
+
+    def add_instance(self, instance, iam_role=None, ssm_status=None, index=None):
+        if 'inventory' in self.outputs:
+            row = inventory_row(self.profile, self.region, instance, iam_role, ssm_status)
+            self.inventory.append(row)
+            if self.state is not None and instance.instance_id not in self.state:
+                self.state[instance.instance_id] = {
+                    'fp': delta.instance_fingerprint(instance),
+                    'role_fp': delta.role_fingerprint(instance, index),
+                    'name': row[3],
+                    'iam_role': iam_role,
+                    'ssm_status': ssm_status,
+                    'checked_at': self._now,
+                }
+        if 'missing' in self.outputs and instance.state == 'running':
+            has_role = 'Yes' if instance.instance_profile_arn else 'No'
+            self.running[instance.instance_id] = (instance.name, has_role)
+
+    def add_ssm_instance(self, instance):
+        if 'agent' in self.outputs:
+            self.agent.append(agent_row(self.profile, self.region, instance))
+        self.ssm_ids.add(instance.instance_id)
+
+    def result(self):
+        missing = []
+        if 'missing' in self.outputs:
+            # Ordenado para que o CSV seja determinístico entre execuções
+            for instance_id in sorted(set(self.running) - self.ssm_ids):
+                name, has_role = self.running[instance_id]
+                missing.append([self.profile, self.region, instance_id, name, has_role])
+        # Com missing, in_ssm conta só as running registradas: o SSM pode ter sido consultado só por elas
+        in_ssm = len(self.ssm_ids.intersection(self.running)) if 'missing' in self.outputs else len(self.ssm_ids)
+        return RegionScan(self.inventory, self.agent, missing, len(self.running), in_ssm, self.state, self.reused)
+
+
+def needs_ec2(outputs):
+    return 'inventory' in outputs or 'missing' in outputs
+
+def needs_ssm(outputs):
+    return 'agent' in outputs or 'missing' in outputs
+
+def ec2_filters(outputs):
+    """
+    Filters do describe_instances, aplicados pela própria API.
+
+    Sem inventário, só as instâncias running interessam. INVENTORY_STATES e
+    INSTANCE_TAG_FILTERS do config.py restringem a varredura (o estado running
+    é sempre incluído quando o missing-from-ssm.csv é pedido).
+    """
+    states = getattr(config, 'INVENTORY_STATES', None)
+    if 'inventory' not in outputs:
+        states = ['running']
+    elif states and 'missing' in outputs and 'running' not in states:
+        states = list(states) + ['running']
+    return instance_filters(states, getattr(config, 'INSTANCE_TAG_FILTERS', None))
+
+def ssm_instance_ids(outputs, running):
+    """
+    Instâncias a pedir ao SSM (filtro InstanceIds), ou None para listar todas.
+
+    Sem ssm-agent-status.csv só as running importam. Com até
+    SSM_FILTER_MAX_IDS (um lote do filtro) a consulta filtrada é uma única
+    chamada e traz só essas instâncias; sem nenhuma running, o SSM nem é
+    consultado. Acima disso o número de chamadas do filtro passaria o da
+    listagem completa sempre que houver menos registradas que running.
+    """
+    if 'agent' in outputs or len(running) > SSM_FILTER_MAX_IDS:
+        return None
+    return sorted(running)
+
+def scan_region(profile, region, outputs=ALL_OUTPUTS, cache=None, indexes=None, state=None,
+                max_age=delta.DEFAULT_MAX_AGE):
+    """
+    Coleta EC2, SSM e IAM de um par (profile, região) uma única vez.
+
+    Executada em paralelo pelo scan_engine; os clientes vêm do pool
+    compartilhado. O índice IAM da conta é carregado pela primeira região e
+    reaproveitado pelas demais. Com `state` (DeltaState), só as instâncias
+    que mudaram desde a última varredura são reclassificadas.
+    """
+    ec2 = get_client(profile, region, 'ec2') if needs_ec2(outputs) else None
+    ssm = get_client(profile, region, 'ssm') if needs_ssm(outputs) else None
+    iam = index = None
+    if 'inventory' in outputs:
+        iam = get_client(profile, region, 'iam')
+        index = indexes.get(profile, iam) if indexes else None
+    previous = state.unit(profile, region) if state else None
+    return collect_region(ec2, ssm, iam, profile, region, outputs, cache, index, previous, max_age)
+
+def collect_region(ec2, ssm, iam, profile, region, outputs=ALL_OUTPUTS, cache=None, index=None,
+                   previous=None, max_age=delta.DEFAULT_MAX_AGE):
+    """Percorre EC2 e SSM uma vez, uma instância por vez, e deriva as saídas pedidas."""
+    builder = RegionScanBuilder(profile, region, outputs, previous, max_age)
+
+    if needs_ec2(outputs):
+        for instance in iter_ec2_instances(ec2, filters=ec2_filters(outputs)):
+            if 'inventory' in outputs:
+                classification = builder.reuse(instance, index) or classify_instance(instance, iam, profile, cache, index)
+                builder.add_instance(instance, *classification, index=index)
+            else:
+                builder.add_instance(instance)
+
+    if needs_ssm(outputs):
+        for instance in iter_ssm_instances(ssm, instance_ids=ssm_instance_ids(outputs, builder.running)):
+            builder.add_ssm_instance(instance)
+
+    return builder.result()
+
+def aggregator_units(source, outputs, profiles, unknown_profiles=(), iam=None):
+    """
+    Resultados profiles × REGIONS a partir do agregador do AWS Config (--source aggregator).
+
+    As linhas são montadas pelo mesmo RegionScanBuilder da varredura direta,
+    com as instâncias de cada par em ordem de InstanceId e os mesmos filtros
+    de estado e tags (ec2_filters). Profiles sem conta conhecida aparecem
+    como erro. `iam` (conta do agregador) lê os documentos das policies da
+    AWS, que não estão no Config.
+    """
+    indexes = source.role_indexes() if 'inventory' in outputs else {}
+    registered = source.ssm_instance_ids() if 'missing' in outputs else {}
+    instances = {}
+    for profile, region, instance in source.ec2_instances(ec2_filters(outputs)):
+        instances.setdefault((profile, region), []).append(instance)
+
+    results = []
+    for profile in profiles:
+        for region in REGIONS:
+            if profile in unknown_profiles:
+                error = ValueError("conta do profile desconhecida (defina AGGREGATOR_ACCOUNTS)")
+                results.append(UnitResult(profile, region, None, error, 0.0))
+                continue
+            builder = RegionScanBuilder(profile, region, outputs)
+            for instance in sorted(instances.get((profile, region), []), key=lambda i: i.instance_id):
+                if 'inventory' in outputs:
+                    builder.add_instance(instance, *classify_instance(instance, iam, profile, index=indexes[profile]))
+                else:
+                    builder.add_instance(instance)
+            for instance_id in registered.get((profile, region), ()):
+                builder.add_ssm_instance(SsmInstance(instance_id))
+            results.append(UnitResult(profile, region, builder.result(), None, 0.0))
+    return results
+
+def async_unit_factory(outputs, resolver, state=None, max_age=delta.DEFAULT_MAX_AGE):
+    """Unidade do modo --async: mesmo resultado de scan_region, via aiobotocore."""
+    def factory(pool):
+        async def unit(profile, region):
+            previous = state.unit(profile, region) if state else None
+            builder = RegionScanBuilder(profile, region, outputs, previous, max_age)
+
+            if needs_ec2(outputs):
+                ec2 = await pool.client(profile, region, 'ec2')
+                iam = index = None
+                if 'inventory' in outputs:
+                    iam = await pool.client(profile, region, 'iam')
+                    index = await resolver.index(profile, iam)
+
+                kwargs = {'PaginationConfig': {'PageSize': EC2_PAGE_SIZE}}
+                if ec2_filters(outputs):
+                    kwargs['Filters'] = ec2_filters(outputs)
+                async for page in paginate(ec2, 'describe_instances', **kwargs):
+                    for instance in ec2_page_instances(page):
+                        if 'inventory' in outputs:
+                            classification = builder.reuse(instance, index)
+                            if not classification:
+                                classification = await classify_instance_async(instance, iam, profile, resolver, index)
+                            builder.add_instance(instance, *classification, index=index)
+                        else:
+                            builder.add_instance(instance)
+
+            if needs_ssm(outputs):
+                ssm = await pool.client(profile, region, 'ssm')
+                instance_ids = ssm_instance_ids(outputs, builder.running)
+                if instance_ids is None:
+                    batches = [None]
+                else:
+                    batches = [[{'Key': 'InstanceIds', 'Values': instance_ids[start:start + SSM_FILTER_BATCH]}]
+                               for start in range(0, len(instance_ids), SSM_FILTER_BATCH)]
+                for filters in batches:
+                    kwargs = {'PaginationConfig': {'PageSize': SSM_PAGE_SIZE}}
+                    if filters:
+                        kwargs['Filters'] = filters
+                    async for page in paginate(ssm, 'describe_instance_information', **kwargs):
+                        for instance in ssm_page_instances(page):
+                            builder.add_ssm_instance(instance)
+
+            return builder.result()
+        return unit
+    return factory
+
+
+def checkpointed(unit, journal):
+    """Unidade que repete o RegionScan registrado no journal ou registra o novo."""
+    def run(profile, region):
+        stored = journal.get((profile, region))
+        if stored is not None:
+            return RegionScan(*stored)
+        value = unit(profile, region)
+        journal.record((profile, region), list(value))
+        return value
+    return run
+
+def checkpointed_factory(factory, journal):
+    """checkpointed() para as unidades assíncronas do modo --async."""
+    def wrapped(pool):
+        unit = factory(pool)
+
+        async def run(profile, region):
+            stored = journal.get((profile, region))
+            if stored is not None:
+                return RegionScan(*stored)
+            value = await unit(profile, region)
+            journal.record((profile, region), list(value))
+            return value
+        return run
+    return wrapped
+
+
+class InventoryOutput:
+    """data/ec2-inventory.csv"""
+
+    filename = "ec2-inventory.csv"
+    header = ['Profile', 'Region', 'InstanceId', 'Name', 'State', 'IAM_Role', 'SSM_Status']
+    title = "=== Coletando inventário de EC2s ==="
+
+    def rows(self, scan):
+        return scan.inventory
+
+    def print_unit(self, result):
+        print(f"Verificando: {result.profile} - {result.region}")
+        if result.error:
+            print(f"  ⚠️  Erro ao acessar: {str(result.error)}")
+        elif not result.value.inventory:
+            print(f"  ℹ️  Nenhuma instância encontrada")
+        else:
+            for row in result.value.inventory:
+                print_inventory_row(row)
+        print()
+
+    def finish(self, path):
+        print(f"=== Inventário salvo em: {path} ===")
+
+def print_inventory_row(row):
+    _, _, instance_id, name, _, iam_role, ssm_status = row
+    if iam_role == 'NO_ROLE':
+        print(f"  ❌ {instance_id} ({name}) - SEM IAM Role")
+    elif iam_role == 'ERROR_ROLE':
+        print(f"  ❌ {instance_id} ({name}) - Erro ao obter role")
+    elif ssm_status == 'OK':
+        print(f"  ✅ {instance_id} ({name}) - SSM OK")
+    else:
+        print(f"  ⚠️  {instance_id} ({name}) - Role sem SSM")
+
+
+class AgentOutput:
+    """data/ssm-agent-status.csv"""
+
+    filename = "ssm-agent-status.csv"
+    header = ['Profile', 'Region', 'InstanceId', 'PingStatus', 'AgentVersion', 'PlatformType']
+    title = "=== Verificando instâncias no SSM ==="
+
+    def __init__(self):
+        self.versions = VersionIndex()
+
+    def rows(self, scan):
+        return scan.agent
+
+    def count(self, result):
+        if not result.error:
+            self.versions.add_rows(result.value.agent)
+
+    def print_unit(self, result):
+        print(f"Verificando: {result.profile} - {result.region}")
+        if result.error:
+            print(f"  ⚠️  Erro: {str(result.error)}")
+        elif not result.value.agent:
+            print(f"  ℹ️  Nenhuma instância no SSM")
+        else:
+            for _, _, instance_id, ping_status, agent_version, platform in result.value.agent:
+                if ping_status == 'Online':
+                    print(f"  ✅ {instance_id} - Online - {platform} - Agent: {agent_version}")
+                else:
+                    print(f"  ⚠️  {instance_id} - {ping_status}")
+        print()
+
+    def finish(self, path):
+        if len(self.versions):
+            print("Versões do SSM Agent (python3 agent_versions.py para o plano):")
+            for line in self.versions.summary(configured_min_version()):
+                print(line)
+        print(f"=== Resultado salvo em: {path} ===")
+
+
+class MissingOutput:
+    """data/missing-from-ssm.csv"""
+
+    filename = "missing-from-ssm.csv"
+    header = ['Profile', 'Region', 'InstanceId', 'Name', 'HasRole']
+    title = "=== Instâncias RUNNING que NÃO aparecem no SSM ==="
+
+    def __init__(self):
+        self.total_running = 0
+        self.total_in_ssm = 0
+        self.total_missing = 0
+        self.failed = []
+
+    def rows(self, scan):
+        return scan.missing
+
+    def count(self, result):
+        if result.error:
+            self.failed.append(result)
+            return
+        self.total_running += result.value.running
+        self.total_in_ssm += result.value.in_ssm
+        self.total_missing += len(result.value.missing)
+
+    def print_unit(self, result):
+        if result.error or not result.value.missing:
+            return
+        print(f"{result.profile} - {result.region}:")
+        for _, _, instance_id, name, has_role in result.value.missing:
+            print(f"  ❌ {instance_id} ({name}) - Role: {has_role}")
+        print()
+
+    def finish(self, path):
+        print(f"=== Resumo ===")
+        print(f"Total running: {self.total_running}")
+        print(f"Running no SSM: {self.total_in_ssm}")
+        print(f"Faltando: {self.total_missing}")
+        if self.failed:
+            print(f"\n⚠️  {len(self.failed)} profile/região com erro (não incluídos no resultado):")
+            for result in self.failed:
+                print(f"  {result.profile} - {result.region}: {str(result.error)}")
+        print(f"\nArquivo salvo: {path}")
+
+OUTPUT_TYPES = {'inventory': InventoryOutput, 'agent': AgentOutput, 'missing': MissingOutput}
+
+
+def print_unit_summary(result, outputs):
+    """Linha por profile/região quando várias saídas são geradas juntas."""
+    print(f"Verificando: {result.profile} - {result.region}")
+    if result.error:
+        print(f"  ⚠️  Erro ao acessar: {str(result.error)}")
+        return
+    scan = result.value
+    parts = []
+    if 'inventory' in outputs:
+        no_ssm = sum(1 for row in scan.inventory if row[6] != 'OK')
+        parts.append(f"{len(scan.inventory)} EC2 ({no_ssm} sem SSM)")
+    if 'agent' in outputs:
+        parts.append(f"{len(scan.agent)} no SSM")
+    if 'missing' in outputs:
+        parts.append(f"{len(scan.missing)} running faltando no SSM")
+    print(f"  {' | '.join(parts)}")
+
+def open_iam_cache(data_dir):
+    """Cria o cache IAM conforme IAM_CACHE_TTL / IAM_CACHE_FILE do config.py."""
+    ttl = getattr(config, 'IAM_CACHE_TTL', DEFAULT_TTL)
+    cache_file = getattr(config, 'IAM_CACHE_FILE', None)
+    db_path = os.path.join(data_dir, cache_file) if cache_file else None
+    return IamCache(ttl=ttl, db_path=db_path)
+
+def open_snapshot(path):
+    """Abre o snapshot; um arquivo de outra versão do esquema é recriado (o scan.py grava tudo de novo)."""
+    try:
+        return snapshot.SnapshotStore(path)
+    except snapshot.SnapshotVersionError:
+        print(f"⚠️  Snapshot {path} de outra versão do esquema (esperada {snapshot.SCHEMA_VERSION}), recriando")
+        os.remove(path)
+        return snapshot.SnapshotStore(path)
+
+def open_journal(data_dir, outputs, args):
+    """Journal de checkpoint da varredura; com --resume, retoma o da execução interrompida."""
+    path = os.path.join(data_dir, checkpoint.SCAN_FILE)
+    journal = checkpoint.Journal(path, {'outputs': list(outputs), 'incremental': args.incremental},
+                                 resume=args.resume)
+    if journal.stale:
+        print("⚠️  Checkpoint de outra varredura (outras saídas ou modo), recomeçando do zero")
+    elif journal.resumed:
+        print(f"♻️  Retomando: {journal.resumed} profiles/regiões já concluídos ({path})\n")
+    elif args.resume:
+        print("ℹ️  Nenhum checkpoint para retomar, varredura completa\n")
+    return journal
+
+def write_changes(path, change_rows):
+    """Grava o change log do modo incremental (NEW / FIXED / REGRESSED / REMOVED)."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(delta.CHANGES_HEADER)
+        writer.writerows(change_rows)
+
+    counts = {}
+    for row in change_rows:
+        counts[row[0]] = counts.get(row[0], 0) + 1
+    for change in (delta.NEW, delta.FIXED, delta.REGRESSED, delta.REMOVED):
+        if counts.get(change):
+            print(f"  {change}: {counts[change]}")
+
+def parse_outputs(value):
+    outputs = tuple(o.strip() for o in value.split(',') if o.strip())
+    unknown = set(outputs) - set(ALL_OUTPUTS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"saída desconhecida: {', '.join(sorted(unknown))}")
+    return outputs
+
+def main(argv=None, outputs=None):
+    """
+    Executa a varredura e grava os CSVs pedidos.
+
+    Args:
+        argv: Argumentos de linha de comando
+        outputs: Saídas fixas (usado pelos scripts wrapper); se None, vem de --only
+    """
+    parser = argparse.ArgumentParser(description="Varredura única de EC2, SSM e IAM")
+    if outputs is None:
+        parser.add_argument('--only', type=parse_outputs, default=ALL_OUTPUTS,
+                            help="saídas separadas por vírgula: inventory,agent,missing")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="varredura assíncrona com aiobotocore")
+    parser.add_argument('--incremental', action='store_true',
+                        help="reclassifica só as instâncias que mudaram desde a última varredura")
+    parser.add_argument('--no-csv', dest='csv', action='store_false',
+                        help="grava só o snapshot, sem os CSVs (exportáveis com snapshot.py)")
+    parser.add_argument('--source', choices=('direct', 'aggregator'),
+                        default=getattr(config, 'INVENTORY_SOURCE', 'direct'),
+                        help="direct: EC2/SSM/IAM em cada profile × região; aggregator: agregador do AWS Config")
+    parser.add_argument('--resume', action='store_true',
+                        help="retoma a varredura interrompida: pula os profiles/regiões já concluídos")
+    args = parser.parse_args(argv)
+    outputs = tuple(o for o in ALL_OUTPUTS if o in (outputs or args.only))
+
+    settings = None
+    if args.source == 'aggregator':
+        settings = aggregator.configured_aggregator()
+        if not settings:
+            print("❌ Defina AGGREGATOR_NAME (e AGGREGATOR_PROFILE / AGGREGATOR_REGION) no config.py")
+            sys.exit(1)
+        if args.use_async or args.incremental:
+            print("❌ --source aggregator não combina com --async nem --incremental")
+            sys.exit(1)
+        if args.resume:
+            print("❌ --source aggregator não usa checkpoint (uma única consulta): rode sem --resume")
+            sys.exit(1)
+        if outputs == ('agent',):
+            print("❌ O PingStatus do ssm-agent-status.csv não está no AWS Config: use --source direct")
+            sys.exit(1)
+        if 'agent' in outputs:
+            print("⚠️  ssm-agent-status.csv não é gerado com --source aggregator "
+                  "(PingStatus não está no AWS Config)")
+            outputs = tuple(o for o in outputs if o != 'agent')
+
+    if args.use_async and not async_scan.available():
+        print("❌ Modo --async requer aiobotocore: pip install aiobotocore")
+        sys.exit(1)
+    if args.use_async and getattr(config, 'ORG_ROLE_NAME', None):
+        # As sessões do aiobotocore são criadas por profile; as contas descobertas não são profiles
+        print("❌ Modo --async não combina com a descoberta pelo Organizations (ORG_ROLE_NAME): rode sem --async")
+        sys.exit(1)
+    if args.incremental and 'inventory' not in outputs:
+        print("❌ Modo --incremental requer a saída inventory")
+        sys.exit(1)
+
+    profiles = discover_accounts(PROFILES)
+    data_dir = snapshot.data_dir()
+    prefetch = getattr(config, 'IAM_PREFETCH', True)
+    max_age = getattr(config, 'INCREMENTAL_MAX_AGE', delta.DEFAULT_MAX_AGE)
+    state_file = os.path.join(data_dir, "scan-state.json")
+    state = delta.DeltaState.load(state_file) if args.incremental else None
+    cache = None
+    source = None
+    # Checkpoint por par (profile, região); o agregador é uma consulta única e não usa
+    journal = None if settings else open_journal(data_dir, outputs, args)
+
+    if settings:
+        overrides = dict(settings['accounts'])
+        if aws_clients.DISCOVERY:
+            overrides.update((account_id, profile)
+                             for profile, account_id in aws_clients.DISCOVERY.accounts.items())
+        accounts, unknown = aggregator.account_profiles(profiles, overrides)
+        if not accounts:
+            print(f"❌ Nenhum profile com conta conhecida para o agregador: {', '.join(unknown)}")
+            print("Mapeie as contas em AGGREGATOR_ACCOUNTS (account id -> profile) no config.py "
+                  "ou use --source direct")
+            sys.exit(1)
+        source = aggregator.AggregatorSource(get_client(settings['profile'], settings['region'], 'config'),
+                                             settings['name'], accounts, REGIONS)
+        try:
+            iam = get_client(settings['profile'], settings['region'], 'iam') if 'inventory' in outputs else None
+            results = aggregator_units(source, outputs, profiles, unknown, iam)
+        except ClientError as e:
+            print(f"❌ Erro consultando o agregador {settings['name']}: {str(e)}")
+            sys.exit(1)
+        prefetch_errors = {}
+    elif args.use_async:
+        if 'inventory' in outputs:
+            cache = open_iam_cache(data_dir)
+        resolver = async_scan.AsyncIamResolver(prefetch=prefetch, evaluator=POLICIES, cache=cache)
+        factory = async_unit_factory(outputs, resolver, state, max_age)
+        results = async_scan.run_units_async(profiles, REGIONS, checkpointed_factory(factory, journal))
+        prefetch_errors = resolver.errors
+    else:
+        indexes = None
+        if 'inventory' in outputs:
+            cache = open_iam_cache(data_dir)
+            POLICIES.cache = cache
+            indexes = AccountIndexes() if prefetch else None
+        unit = functools.partial(scan_region, outputs=outputs, cache=cache, indexes=indexes,
+                                 state=state, max_age=max_age)
+        results = run_units(profiles, REGIONS, checkpointed(unit, journal))
+        prefetch_errors = indexes.errors if indexes else {}
+
+    new_state = delta.DeltaState(dict(state.units)) if state else None
+    change_rows = []
+    reused = evaluated = failed = 0
+
+    reports = [OUTPUT_TYPES[output]() for output in outputs]
+    paths = [os.path.join(data_dir, report.filename) for report in reports]
+    files = [open(path, 'w', newline='') for path in paths] if args.csv else []
+    writers = [csv.writer(f) for f in files] or [None] * len(reports)
+    verbose = len(reports) == 1
+    store = open_snapshot(snapshot.configured_path())
+    snapshot_writer = store.writer(outputs)
+
+    try:
+        for report, writer in zip(reports, writers):
+            if writer:
+                writer.writerow(report.header)
+
+        if verbose:
+            print(reports[0].title + "\n")
+        else:
+            print("=== Varredura única: EC2, SSM e IAM ===\n")
+
+        with phase('scan'):
+            for result in results:
+                failed += result.error is not None
+                for output, report, writer in zip(outputs, reports, writers):
+                    if isinstance(report, (AgentOutput, MissingOutput)):
+                        report.count(result)
+                    if not result.error:
+                        rows = report.rows(result.value)
+                        with phase('write'):
+                            snapshot_writer.add(output, rows)
+                            if writer:
+                                writer.writerows(rows)
+
+                if new_state and not result.error:
+                    # Pares com erro mantêm o estado anterior e não geram REMOVED
+                    previous = state.unit(result.profile, result.region)
+                    change_rows.extend(delta.changes(result.profile, result.region, previous, result.value.state))
+                    new_state.units[(result.profile, result.region)] = result.value.state
+                    reused += result.value.reused
+                    evaluated += len(result.value.state) - result.value.reused
+
+                if verbose:
+                    reports[0].print_unit(result)
+                else:
+                    print_unit_summary(result, outputs)
+
+        if not verbose:
+            print()
+        for profile, error in prefetch_errors.items():
+            print(f"⚠️  {profile}: IAM em lote indisponível ({str(error)}), usada consulta por instância")
+        if 'inventory' in outputs:
+            print(POLICIES.summary())
+        if new_state:
+            changes_file = os.path.join(data_dir, "ec2-inventory-changes.csv")
+            new_state.save(state_file)
+            print(f"Incremental: {reused} instâncias sem mudança, {evaluated} reavaliadas")
+            print(f"Mudanças: {len(change_rows)} (salvas em {changes_file})")
+            write_changes(changes_file, change_rows)
+        if cache:
+            print(cache.summary())
+            cache.close()
+        if source:
+            print(source.summary())
+        with phase('snapshot'):
+            snapshot_writer.commit()
+        print(f"Snapshot: {store.path}")
+        with phase('history'):
+            scan_id = history.record_scan(store.path, outputs)
+        if scan_id:
+            print(f"Histórico: varredura {scan_id} (consultas: python3 history.py)")
+        if not args.use_async:
+            print(POOL.summary())
+        for report, path in zip(reports, paths):
+            report.finish(path if args.csv else store.path)
+        if journal and failed:
+            print(f"\n⚠️  {failed} profiles/regiões com erro: rode novamente com --resume para repetir só esses")
+        elif journal:
+            journal.discard()
+    finally:
+        for f in files:
+            f.close()
+        store.close()
+        if journal:
+            journal.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Motor de varredura concorrente para os scripts de inventário.
+
+Executa uma função por par (profile, região) em um pool de threads com dois
+limites: um global (MAX_WORKERS) e um por conta (MAX_WORKERS_PER_ACCOUNT),
+para não estourar o rate limit de uma única conta enquanto as outras ficam
+ociosas.
+
+Os resultados são entregues sempre na ordem PROFILES × REGIONS, independente
+da ordem em que terminam, então os CSVs gerados são determinísticos. Uma conta
+lenta ou com erro não bloqueia as demais: o erro é devolvido no resultado da
+unidade e o restante da varredura continua.
+"""
+
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_PER_ACCOUNT = 2
+
+# Resultado de uma unidade (profile, região). Se error não for None, value é None.
+UnitResult = namedtuple('UnitResult', ['profile', 'region', 'value', 'error', 'elapsed'])
+
+
+def configured_limits():
+    """
+    Lê os limites de concorrência do config.py, se estiverem definidos.
+
+    Returns:
+        tuple: (max_workers, max_per_account)
+    """
+    try:
+        import config
+    except ImportError:
+        return DEFAULT_MAX_WORKERS, DEFAULT_MAX_PER_ACCOUNT
+    return (
+        getattr(config, 'MAX_WORKERS', DEFAULT_MAX_WORKERS),
+        getattr(config, 'MAX_WORKERS_PER_ACCOUNT', DEFAULT_MAX_PER_ACCOUNT),
+    )
+
+
+def _run_unit(unit_fn, profile, region):
+    start = time.perf_counter()
+    try:
+        value = unit_fn(profile, region)
+    except Exception as e:
+        return UnitResult(profile, region, None, e, time.perf_counter() - start)
+    return UnitResult(profile, region, value, None, time.perf_counter() - start)
+
+
+def run_units(profiles, regions, unit_fn, max_workers=None, max_per_account=None):
+    """
+    Executa unit_fn(profile, region) para cada par PROFILES × REGIONS.
+
+    Args:
+        profiles: Lista de profiles AWS
+        regions: Lista de regiões AWS
+        unit_fn: Função chamada para cada par; o retorno vai em UnitResult.value
+        max_workers: Limite global de unidades em execução
+        max_per_account: Limite de unidades simultâneas por profile
+
+    Yields:
+        UnitResult na ordem PROFILES × REGIONS, assim que o prefixo estiver pronto.
+
+    O agendamento só submete uma unidade ao pool quando a conta dela tem vaga,
+    então nenhum worker fica parado esperando o semáforo de outra conta.
+    """
+    default_workers, default_per_account = configured_limits()
+    max_workers = max(1, max_workers or default_workers)
+    max_per_account = max(1, max_per_account or default_per_account)
+
+    units = [(profile, region) for profile in profiles for region in regions]
+    pending = {profile: deque() for profile in profiles}
+    for index, (profile, region) in enumerate(units):
+        pending[profile].append((index, region))
+
+    in_flight = {profile: 0 for profile in profiles}
+    futures = {}
+    results = {}
+    next_to_yield = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while next_to_yield < len(units):
+            # Preenche o pool alternando entre as contas com vaga
+            submitted = True
+            while submitted and len(futures) < max_workers:
+                submitted = False
+                for profile in profiles:
+                    if len(futures) >= max_workers:
+                        break
+                    if pending[profile] and in_flight[profile] < max_per_account:
+                        index, region = pending[profile].popleft()
+                        future = pool.submit(_run_unit, unit_fn, profile, region)
+                        futures[future] = index
+                        in_flight[profile] += 1
+                        submitted = True
+
+            if futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    result = future.result()
+                    in_flight[result.profile] -= 1
+                    results[index] = result
+
+            while next_to_yield in results:
+                yield results.pop(next_to_yield)
+                next_to_yield += 1
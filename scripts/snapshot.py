@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Snapshot da última varredura em sqlite (data/snapshot.sqlite).
+
+Os scripts trocavam dados só pelos CSVs de data/: o enable_ssm.py e o
+install_ssm_via_runcommand.py liam o arquivo inteiro com csv.DictReader, um
+dict por linha, para depois usar uma fração das linhas. O snapshot guarda as
+três saídas do scan.py em tabelas tipadas e indexadas por profile, região e
+status:
+
+- inventory: ec2-inventory.csv    (status = SSM_Status)
+- agent:     ssm-agent-status.csv (status = PingStatus)
+- missing:   missing-from-ssm.csv (status = HasRole)
+
+A leitura é preguiçosa: query() filtra no sqlite e produz um registro por vez
+(classes com __slots__, sem dict por linha). O arquivo é versionado
+(PRAGMA user_version); um snapshot de outra versão pede uma nova varredura.
+
+Se ainda não existir snapshot, load() lê o CSV correspondente em streaming,
+com os mesmos filtros.
+
+Uso:
+    python3 snapshot.py export inventory [arquivo.csv]
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import time
+
+SCHEMA_VERSION = 1
+
+DEFAULT_FILE = 'snapshot.sqlite'
+
+# Linhas lidas do sqlite por vez
+FETCH_SIZE = 1000
+
+
+class Record:
+    """Base dos registros: uma linha de CSV com atributos e __slots__."""
+
+    __slots__ = ()
+    fields = ()
+    header = ()
+    csv_file = None
+
+    def __init__(self, *values):
+        for field, value in zip(self.fields, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_dict(cls, row):
+        """Registro a partir de uma linha de csv.DictReader."""
+        return cls(*(row[column] for column in cls.header))
+
+    def as_row(self):
+        return [getattr(self, field) for field in self.fields]
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_row() == other.as_row()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(repr(value) for value in self.as_row())})"
+
+
+class InventoryRecord(Record):
+    __slots__ = ('profile', 'region', 'instance_id', 'name', 'state', 'iam_role', 'ssm_status')
+    fields = __slots__
+    header = ('Profile', 'Region', 'InstanceId', 'Name', 'State', 'IAM_Role', 'SSM_Status')
+    status_field = 'ssm_status'
+    csv_file = 'ec2-inventory.csv'
+
+
+class AgentRecord(Record):
+    __slots__ = ('profile', 'region', 'instance_id', 'ping_status', 'agent_version', 'platform_type')
+    fields = __slots__
+    header = ('Profile', 'Region', 'InstanceId', 'PingStatus', 'AgentVersion', 'PlatformType')
+    status_field = 'ping_status'
+    csv_file = 'ssm-agent-status.csv'
+
+
+class MissingRecord(Record):
+    __slots__ = ('profile', 'region', 'instance_id', 'name', 'has_role')
+    fields = __slots__
+    header = ('Profile', 'Region', 'InstanceId', 'Name', 'HasRole')
+    status_field = 'has_role'
+    csv_file = 'missing-from-ssm.csv'
+
+
+RECORD_TYPES = {'inventory': InventoryRecord, 'agent': AgentRecord, 'missing': MissingRecord}
+
+
+class SnapshotVersionError(Exception):
+    pass
+
+
+def data_dir():
+    """Diretório dos arquivos gerados: DATA_DIR do config.py ou ../data."""
+    try:
+        import config
+    except ImportError:
+        config = None
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
+    return getattr(config, 'DATA_DIR', None) or default
+
+
+def configured_path():
+    """Caminho do snapshot conforme SNAPSHOT_FILE do config.py."""
+    try:
+        import config
+    except ImportError:
+        config = None
+    return os.path.join(data_dir(), getattr(config, 'SNAPSHOT_FILE', DEFAULT_FILE))
+
+
+class SnapshotStore:
+    """
+    Tabelas inventory / agent / missing de uma varredura.
+
+    Args:
+        path: Arquivo sqlite (criado se não existir)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        tables = self._db.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        if tables and version != SCHEMA_VERSION:
+            self._db.close()
+            raise SnapshotVersionError(f"{path}: versão {version}, esperada {SCHEMA_VERSION}. "
+                                       "Execute scan.py novamente.")
+        self._create()
+
+    def _create(self):
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot_meta ("
+                " kind TEXT PRIMARY KEY, written_at REAL, row_count INTEGER)"
+            )
+            for kind, record_type in RECORD_TYPES.items():
+                columns = ', '.join(f"{field} TEXT" for field in record_type.fields)
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {kind} ({columns})")
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {kind}_location ON {kind} (profile, region)")
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {kind}_status ON {kind} ({record_type.status_field})")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writer(self, kinds):
+        """Substitui as tabelas `kinds` dentro de uma transação (SnapshotWriter)."""
+        return SnapshotWriter(self._db, kinds)
+
+    def written_at(self, kind):
+        row = self._db.execute("SELECT written_at FROM snapshot_meta WHERE kind = ?", (kind,)).fetchone()
+        return row[0] if row else None
+
+    def query(self, kind, profile=None, region=None, status=None):
+        """
+        Registros de uma tabela, filtrados no sqlite.
+
+        Args:
+            kind: 'inventory', 'agent' ou 'missing'
+            profile / region / status: Filtros opcionais (status: valor ou lista)
+
+        Yields:
+            Record: Um registro por vez, na ordem em que foi gravado
+        """
+        record_type = RECORD_TYPES[kind]
+        clauses, params = [], []
+        if profile is not None:
+            clauses.append("profile = ?")
+            params.append(profile)
+        if region is not None:
+            clauses.append("region = ?")
+            params.append(region)
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            clauses.append(f"{record_type.status_field} IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        cursor = self._db.execute(f"SELECT {', '.join(record_type.fields)} FROM {kind}{where} ORDER BY rowid", params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield record_type(*row)
+
+    def rows(self, kind):
+        """Todas as linhas da tabela como tuplas (ordem de `fields`), para carga em lote (report.py)."""
+        fields = RECORD_TYPES[kind].fields
+        return self._db.execute(f"SELECT {', '.join(fields)} FROM {kind} ORDER BY rowid").fetchall()
+
+    def export_csv(self, kind, path):
+        """Gera o CSV da tabela, no mesmo formato do scan.py."""
+        record_type = RECORD_TYPES[kind]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(record_type.header)
+            for record in self.query(kind):
+                writer.writerow(record.as_row())
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+
+class SnapshotWriter:
+    """
+    Grava as linhas de uma varredura; commit() troca o conteúdo das tabelas.
+
+    As linhas são as mesmas listas gravadas nos CSVs, sem criar registros.
+    """
+
+    def __init__(self, db, kinds):
+        self._db = db
+        self.kinds = list(kinds)
+        self.counts = dict.fromkeys(self.kinds, 0)
+        self._db.execute("BEGIN")
+        for kind in self.kinds:
+            self._db.execute(f"DELETE FROM {kind}")
+
+    def add(self, kind, rows):
+        fields = RECORD_TYPES[kind].fields
+        cursor = self._db.executemany(f"INSERT INTO {kind} VALUES ({', '.join('?' * len(fields))})", rows)
+        self.counts[kind] += max(cursor.rowcount, 0)
+
+    def commit(self):
+        now = time.time()
+        self._db.executemany("INSERT OR REPLACE INTO snapshot_meta VALUES (?, ?, ?)",
+                             [(kind, now, count) for kind, count in self.counts.items()])
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+
+def _matches(record, profile, region, status):
+    if profile is not None and record.profile != profile:
+        return False
+    if region is not None and record.region != region:
+        return False
+    if status is not None:
+        statuses = [status] if isinstance(status, str) else status
+        if getattr(record, record.status_field) not in statuses:
+            return False
+    return True
+
+
+def load(kind, profile=None, region=None, status=None, path=None):
+    """
+    Registros da última varredura: do snapshot, ou do CSV se não houver snapshot.
+
+    Yields:
+        Record: Registros filtrados, um por vez
+
+    Raises:
+        FileNotFoundError: Nem snapshot nem CSV encontrados
+    """
+    path = path or configured_path()
+    if os.path.exists(path):
+        with SnapshotStore(path) as store:
+            if store.written_at(kind) is not None:
+                yield from store.query(kind, profile, region, status)
+                return
+
+    record_type = RECORD_TYPES[kind]
+    with open(os.path.join(data_dir(), record_type.csv_file), newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(column) for column in record_type.header]
+        for row in reader:
+            record = record_type(*(row[position] for position in positions))
+            if _matches(record, profile, region, status):
+                yield record
+
+
+def source_time(kind, path=None):
+    """Quando foram gravados os dados que load() leria: snapshot ou, sem ele, o CSV (None se nenhum)."""
+    path = path or configured_path()
+    if os.path.exists(path):
+        with SnapshotStore(path) as store:
+            written_at = store.written_at(kind)
+        if written_at is not None:
+            return written_at
+    try:
+        return os.path.getmtime(os.path.join(data_dir(), RECORD_TYPES[kind].csv_file))
+    except OSError:
+        return None
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'export' or sys.argv[2] not in RECORD_TYPES:
+        print(f"Uso: python3 snapshot.py export {{{','.join(RECORD_TYPES)}}} [arquivo.csv]")
+        return 1
+    kind = sys.argv[2]
+    output = sys.argv[3] if len(sys.argv) > 3 else os.path.join(data_dir(), RECORD_TYPES[kind].csv_file)
+    path = configured_path()
+    if not os.path.exists(path):
+        print(f"❌ Snapshot {path} não encontrado. Execute scan.py primeiro.")
+        return 1
+    with SnapshotStore(path) as store:
+        store.export_csv(kind, output)
+    print(f"✅ {kind} exportado para: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Trace das chamadas AWS e das fases de cada script.
+
+Quando uma varredura fica lenta, as linhas impressas não dizem se o tempo foi
+para o IAM, o EC2, o SSM, a resolução de credenciais ou a gravação dos CSVs.
+O Tracer é registrado pelo aws_clients.py em cada cliente do pool, pelos
+eventos do botocore:
+
+- before-call / after-call: duração de cada chamada, status HTTP e código de erro
+- after-call-error: chamadas que terminam em exceção sem resposta (conexão,
+  endpoint, timeout; o after-call não é emitido), com o nome da exceção como erro
+- request-created: tamanho da requisição
+- needs-retry: tentativas e throttlings de cada chamada
+
+As fases do main() (e a resolução de credenciais de cada profile) são medidas
+com aws_clients.phase(). Tudo vai, uma linha JSON por evento, para TRACE_FILE
+(data/trace.jsonl, acrescentado a cada execução, com o id da execução em
+cada linha). No fim, summary() resume por serviço/operação e por fase.
+
+Com TRACE_OTLP_ENDPOINT, chamadas e fases também são exportadas como spans
+OpenTelemetry (OTLP/HTTP) para um collector, ex: http://localhost:4318/v1/traces.
+Requer: pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http
+
+As chamadas do modo --async (aiobotocore) não passam por estes eventos; só as
+fases aparecem no trace.
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+
+from aws_retry import classify
+
+SERVICE_NAME = 'ssm-implementation'
+
+# Linhas mais lentas por (profile, região, operação) no resumo
+TOP_SLOWEST = 5
+
+
+class CallStats:
+    """Agregado de uma operação: contagem, erros, retries e durações."""
+
+    __slots__ = ('count', 'errors', 'retries', 'throttles', 'response_bytes', 'durations')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.response_bytes = 0
+        self.durations = array('d')
+
+    def add(self, duration, attempts, throttles, error, response_bytes):
+        self.count += 1
+        self.errors += bool(error)
+        self.retries += attempts - 1
+        self.throttles += throttles
+        self.response_bytes += response_bytes
+        self.durations.append(duration)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def otlp_provider(endpoint, script):
+    """TracerProvider do OpenTelemetry exportando para `endpoint`, ou None sem a biblioteca."""
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("⚠️  TRACE_OTLP_ENDPOINT requer opentelemetry-sdk e opentelemetry-exporter-otlp-proto-http; "
+              "exportação desativada")
+        return None
+    provider = TracerProvider(resource=Resource.create({'service.name': SERVICE_NAME, 'process.command': script}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    return provider
+
+
+class Tracer:
+    """
+    Registra chamadas e fases de uma execução.
+
+    Args:
+        path: Arquivo JSON lines (acrescentado); None não grava arquivo
+        otlp_endpoint: Endpoint OTLP/HTTP do collector (opcional)
+        script: Nome do script no trace (padrão: sys.argv[0])
+    """
+
+    def __init__(self, path=None, otlp_endpoint=None, script=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.script = script or os.path.basename(sys.argv[0] or 'python')
+        self.path = path
+        self.calls = {}
+        self.locations = {}
+        self.phases = OrderedDict()
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a') if path else None
+        self._provider = otlp_provider(otlp_endpoint, self.script) if otlp_endpoint else None
+        self._otel = None
+        self._root = None
+        if self._provider:
+            from opentelemetry import trace as otel_trace
+            self._otel = self._provider.get_tracer(__name__)
+            self._root = self._otel.start_span(self.script, start_time=time.time_ns())
+            self._root_context = otel_trace.set_span_in_context(self._root)
+        self._write({'type': 'run', 'script': self.script, 'pid': os.getpid(), 'argv': sys.argv[1:]})
+
+    def _write(self, event):
+        if not self._file:
+            return
+        event = dict(event, run=self.run_id, ts=round(event.get('ts', time.time()), 6))
+        line = json.dumps(event, separators=(',', ':'), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def _export(self, name, start, duration, attributes):
+        if self._otel:
+            start_ns = int(start * 1e9)
+            span = self._otel.start_span(name, context=self._root_context, start_time=start_ns,
+                                         attributes={k: v for k, v in attributes.items() if v is not None})
+            span.end(end_time=start_ns + int(duration * 1e9))
+
+    def register(self, client, profile):
+        """Conecta o trace nos eventos do cliente boto3."""
+        service = client.meta.service_model.service_name
+        region = client.meta.region_name
+
+        def before_call(model=None, context=None, **kwargs):
+            context['trace'] = {'start': time.time(), 'clock': time.perf_counter(), 'operation': model.name,
+                                'attempts': 1, 'throttles': 0, 'request_bytes': 0}
+
+        def request_created(request=None, **kwargs):
+            trace = getattr(request, 'context', {}).get('trace')
+            if trace is not None:
+                body = request.body or b''
+                trace['request_bytes'] = len(body) if isinstance(body, (bytes, str)) else 0
+
+        def needs_retry(response=None, attempts=1, caught_exception=None, request_dict=None, **kwargs):
+            trace = (request_dict or {}).get('context', {}).get('trace')
+            if trace is not None:
+                trace['attempts'] = attempts
+                if classify(response, caught_exception) == 'throttle':
+                    trace['throttles'] += 1
+
+        def finish(context, status, error, response_bytes=0):
+            trace = (context or {}).pop('trace', None)
+            if trace is None:
+                return
+            duration = time.perf_counter() - trace['clock']
+            self.record_call(profile, region, service, trace['operation'], trace['start'], duration,
+                             trace['attempts'], trace['throttles'], status, error, trace['request_bytes'],
+                             response_bytes)
+
+        def after_call(http_response=None, parsed=None, context=None, **kwargs):
+            finish(context, getattr(http_response, 'status_code', None),
+                   (parsed or {}).get('Error', {}).get('Code'),
+                   len(getattr(http_response, 'content', b'') or b''))
+
+        def after_call_error(exception=None, context=None, **kwargs):
+            # Sem resposta HTTP: o erro registrado é o tipo da exceção (ex: EndpointConnectionError)
+            finish(context, None, type(exception).__name__)
+
+        events = client.meta.events
+        events.register('before-call', before_call)
+        events.register('request-created', request_created)
+        events.register('needs-retry', needs_retry)
+        events.register('after-call', after_call)
+        events.register('after-call-error', after_call_error)
+
+    def record_call(self, profile, region, service, operation, start, duration, attempts=1, throttles=0,
+                    status=None, error=None, request_bytes=0, response_bytes=0):
+        with self._lock:
+            stats = self.calls.get((service, operation))
+            if stats is None:
+                stats = self.calls[(service, operation)] = CallStats()
+            stats.add(duration, attempts, throttles, error, response_bytes)
+            key = (profile, region, service, operation)
+            self.locations[key] = self.locations.get(key, 0.0) + duration
+        self._write({'type': 'call', 'ts': start, 'profile': profile, 'region': region, 'service': service,
+                     'operation': operation, 'ms': round(duration * 1000, 3), 'attempts': attempts,
+                     'throttles': throttles, 'status': status, 'error': error,
+                     'request_bytes': request_bytes, 'response_bytes': response_bytes})
+        self._export(f"{service}.{operation}", start, duration, {
+            'rpc.system': 'aws-api', 'rpc.service': service, 'rpc.method': operation, 'cloud.region': region,
+            'aws.profile': profile, 'aws.attempts': attempts, 'aws.throttles': throttles,
+            'http.response.status_code': status, 'aws.error_code': error,
+        })
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        """Mede um trecho (fase do main(), credenciais de um profile); pode se repetir e aninhar."""
+        start = time.time()
+        clock = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - clock
+            with self._lock:
+                count, total = self.phases.get(name, (0, 0.0))
+                self.phases[name] = (count + 1, total + duration)
+            self._write(dict(attributes, type='phase', ts=start, name=name, ms=round(duration * 1000, 3)))
+            self._export(name, start, duration, attributes)
+
+    def summary(self):
+        """Tabela por serviço/operação, as combinações mais lentas e as fases."""
+        lines = [f"=== Trace {self.run_id}" + (f" ({self.path})" if self.path else "") + " ==="]
+        if self.calls:
+            lines.append(f"{'operação':<44}{'chamadas':>9}{'erros':>7}{'retries':>8}{'throttles':>10}"
+                         f"{'total s':>9}{'média ms':>10}{'p95 ms':>9}{'KiB':>9}")
+            ordered = sorted(self.calls.items(), key=lambda item: -sum(item[1].durations))
+            for (service, operation), stats in ordered:
+                total = sum(stats.durations)
+                lines.append(f"{service + ':' + operation:<44}{stats.count:>9}{stats.errors:>7}{stats.retries:>8}"
+                             f"{stats.throttles:>10}{total:>9.2f}{total / stats.count * 1000:>10.1f}"
+                             f"{stats.percentile(0.95) * 1000:>9.1f}{stats.response_bytes / 1024:>9.0f}")
+            lines.append("Mais lentos (profile / região / operação):")
+            slowest = sorted(self.locations.items(), key=lambda item: -item[1])[:TOP_SLOWEST]
+            for (profile, region, service, operation), total in slowest:
+                lines.append(f"  {profile} / {region or 'global'} / {service}:{operation}: {total:.2f}s")
+        if self.phases:
+            lines.append(f"{'fase':<44}{'vezes':>9}{'total s':>9}")
+            for name, (count, total) in self.phases.items():
+                lines.append(f"{name:<44}{count:>9}{total:>9.2f}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self._file:
+            self._write({'type': 'end', 'seconds': round(time.time() - self.started, 3),
+                         'calls': sum(stats.count for stats in self.calls.values())})
+            self._file.close()
+            self._file = None
+        if self._provider:
+            self._root.end(end_time=time.time_ns())
+            self._provider.shutdown()
+            self._provider = None
+
+
+def configured_tracer():
+    """
+    Tracer conforme TRACE_FILE / TRACE_OTLP_ENDPOINT do config.py.
+
+    Returns:
+        Tracer ou None se o trace estiver desligado (padrão)
+    """
+    try:
+        import config
+    except ImportError:
+        return None
+    trace_file = getattr(config, 'TRACE_FILE', None)
+    endpoint = getattr(config, 'TRACE_OTLP_ENDPOINT', None)
+    if not trace_file and not endpoint:
+        return None
+
+    import snapshot
+    tracer = Tracer(path=os.path.join(snapshot.data_dir(), trace_file) if trace_file else None,
+                    otlp_endpoint=endpoint)
+    atexit.register(tracer.close)
+    return tracer
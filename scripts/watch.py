@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+Modo contínuo: EC2 vs SSM ao vivo, sem varrer a frota de novo.
+
+Depois do enable_ssm.py era preciso esperar de 5 a 10 minutos e rodar
+compare_ec2_ssm.py de novo, varrendo todas as contas. O watch.py mantém em
+memória, por (profile, região), as instâncias running e as registradas no
+SSM, e o conjunto das que faltam no SSM é atualizado a cada mudança:
+
+- eventos do EventBridge entregues numa fila SQS (WATCH_QUEUE_URL):
+  EC2 Instance State-change Notification, e via CloudTrail
+  UpdateInstanceInformation / DeregisterManagedInstance (SSM) e
+  Associate/DisassociateIamInstanceProfile (EC2). Eventos repetidos
+  (entrega "at least once") e fora de ordem (mais antigos que o último do
+  mesmo tipo aplicado à instância) são descartados. Uma mensagem que falha
+  não é apagada da fila e volta a ser entregue.
+- instâncias que passam a running e ainda não estão no modelo são buscadas
+  em lote (describe_instances por instance-id) a cada segundo
+- reconciliação periódica e barata: um par (profile, região) por vez,
+  listando só as running e o SSM, de forma que a frota inteira é conferida a
+  cada WATCH_RECONCILE_INTERVAL segundos. Corrige eventos perdidos e mudanças
+  sem evento (ex: PingStatus)
+
+O conjunto atual fica disponível na hora por HTTP (só localhost):
+
+    curl -s localhost:8765/missing        # CSV no formato do missing-from-ssm.csv
+    curl -s localhost:8765/missing.json
+    curl -s localhost:8765/status
+
+Ao encerrar (Ctrl+C / SIGTERM) o conjunto é gravado em data/missing-from-ssm.csv.
+
+Regra do EventBridge (em cada conta/região, com destino na fila):
+    {"source": ["aws.ec2", "aws.ssm"],
+     "detail-type": ["EC2 Instance State-change Notification", "AWS API Call via CloudTrail"]}
+
+Uso:
+    python3 watch.py
+    python3 watch.py --port 8765
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import snapshot
+from aws_clients import POOL, discover_accounts, get_client
+from collectors import instance_filters, iter_ec2_instances, iter_ssm_instances
+from scan import RUNNING_FILTER
+from scan_engine import run_units
+
+try:
+    import config
+    from config import PROFILES, REGIONS
+except ImportError:
+    print("❌ Arquivo config.py não encontrado!")
+    print("Execute: cp ../config.example.py config.py")
+    sys.exit(1)
+
+DEFAULT_RECONCILE_INTERVAL = 900
+DEFAULT_CONSUMERS = 4
+DEFAULT_PORT = 8765
+
+# Long polling do SQS (máximo da API) e mensagens por receive_message
+RECEIVE_WAIT_SECONDS = 20
+RECEIVE_BATCH = 10
+
+# Intervalo da busca em lote das instâncias novas e InstanceIds por filtro
+REFRESH_INTERVAL = 1.0
+REFRESH_BATCH = 200
+
+# Ids de eventos lembrados para descartar repetições
+DEDUP_SIZE = 50000
+
+MISSING_HEADER = list(snapshot.MissingRecord.header)
+
+# Uma mudança extraída de um evento. kind: 'state', 'ssm' ou 'role'
+Change = namedtuple('Change', ['account', 'region', 'instance_id', 'kind', 'value', 'time'])
+
+
+def event_time(value):
+    """Epoch de um campo `time` do EventBridge (ex: 2026-10-18T12:00:00Z); 0 se ausente."""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def parse_event(event):
+    """
+    Extrai a mudança de um evento do EventBridge.
+
+    Returns:
+        Change ou None se o evento não interessa
+    """
+    detail = event.get('detail') or {}
+    detail_type = event.get('detail-type')
+    when = event_time(event.get('time'))
+    account = event.get('account')
+    region = event.get('region')
+
+    if detail_type == 'EC2 Instance State-change Notification':
+        return Change(account, region, detail.get('instance-id'), 'state', detail.get('state'), when)
+    if detail_type != 'AWS API Call via CloudTrail' or detail.get('errorCode'):
+        return None
+
+    name = detail.get('eventName')
+    params = detail.get('requestParameters') or {}
+    if name == 'UpdateInstanceInformation' and params.get('instanceId', '').startswith('i-'):
+        return Change(account, region, params['instanceId'], 'ssm', 'Online', when)
+    if name == 'DeregisterManagedInstance' and params.get('instanceId', '').startswith('i-'):
+        return Change(account, region, params['instanceId'], 'ssm', None, when)
+    if name == 'AssociateIamInstanceProfile':
+        request = params.get('AssociateIamInstanceProfileRequest') or {}
+        if request.get('InstanceId'):
+            return Change(account, region, request['InstanceId'], 'role', 'Yes', when)
+    if name == 'DisassociateIamInstanceProfile':
+        response = (detail.get('responseElements') or {}).get('DisassociateIamInstanceProfileResponse') or {}
+        instance_id = (response.get('iamInstanceProfileAssociation') or {}).get('instanceId')
+        if instance_id:
+            return Change(account, region, instance_id, 'role', 'No', when)
+    return None
+
+
+def unwrap_message(body):
+    """Evento do corpo de uma mensagem SQS (direto do EventBridge ou via SNS)."""
+    message = json.loads(body)
+    if message.get('Type') == 'Notification' and 'Message' in message:
+        message = json.loads(message['Message'])
+    return message
+
+
+class UnitState:
+    """Instâncias running e registradas no SSM de um (profile, região)."""
+
+    __slots__ = ('running', 'ssm', 'missing', 'event_times', 'touched', 'reconciled_at')
+
+    def __init__(self):
+        self.running = {}       # InstanceId -> (Name, HasRole); HasRole None até a busca em lote
+        self.ssm = {}           # InstanceId -> PingStatus
+        self.missing = set()
+        self.event_times = {}   # (InstanceId, kind) -> time do último evento aplicado
+        self.touched = {}       # InstanceId -> quando um evento foi aplicado (time.time())
+        self.reconciled_at = None
+
+    def update_missing(self, instance_id):
+        if instance_id in self.running and instance_id not in self.ssm:
+            self.missing.add(instance_id)
+        else:
+            self.missing.discard(instance_id)
+
+
+class FleetModel:
+    """
+    Estado EC2 vs SSM de toda a frota, atualizado por evento ou reconciliação.
+
+    Cada atualização custa O(1); o conjunto faltando é mantido junto.
+    """
+
+    def __init__(self, profiles, regions):
+        self.units = OrderedDict(((profile, region), UnitState()) for profile in profiles for region in regions)
+        self._lock = threading.Lock()
+
+    def replace(self, profile, region, running, ssm, since):
+        """
+        Substitui um par com uma listagem completa iniciada em `since`.
+
+        Instâncias que receberam evento depois de `since` mantêm o estado do
+        modelo: a listagem pode ser anterior ao evento.
+
+        Returns:
+            int: Instâncias que entraram ou saíram do conjunto faltando (drift)
+        """
+        with self._lock:
+            unit = self.units[(profile, region)]
+            recent = [instance_id for instance_id, applied in unit.touched.items() if applied >= since]
+            for instance_id in recent:
+                listed_running = running.get(instance_id)
+                for current, listed in ((unit.running, running), (unit.ssm, ssm)):
+                    if instance_id in current:
+                        listed[instance_id] = current[instance_id]
+                    else:
+                        listed.pop(instance_id, None)
+                if listed_running and instance_id in running and running[instance_id][1] is None:
+                    # Ainda não buscada: nome e role vêm da listagem
+                    running[instance_id] = listed_running
+            previous = unit.missing
+            unit.running = running
+            unit.ssm = ssm
+            unit.missing = set(running).difference(ssm)
+            unit.touched = {instance_id: unit.touched[instance_id] for instance_id in recent}
+            unit.reconciled_at = time.time()
+            return len(previous ^ unit.missing)
+
+    def apply(self, profile, region, change):
+        """
+        Aplica uma mudança de evento.
+
+        Returns:
+            str: 'applied', 'stale' (evento mais antigo que o último do mesmo
+                tipo aplicado à instância) ou 'refresh' (instância running
+                desconhecida: buscar nome e role)
+        """
+        with self._lock:
+            unit = self.units[(profile, region)]
+            instance_id = change.instance_id
+            key = (instance_id, change.kind)
+            if change.time < unit.event_times.get(key, 0.0):
+                return 'stale'
+            unit.event_times[key] = change.time
+            result = 'applied'
+            if change.kind == 'state':
+                if change.value == 'running':
+                    if instance_id not in unit.running:
+                        # Entra já no conjunto; nome e role chegam com a busca em lote
+                        unit.running[instance_id] = ("N/A", None)
+                        result = 'refresh'
+                else:
+                    unit.running.pop(instance_id, None)
+            elif change.kind == 'ssm':
+                if change.value:
+                    unit.ssm[instance_id] = change.value
+                else:
+                    unit.ssm.pop(instance_id, None)
+            elif change.kind == 'role' and instance_id in unit.running:
+                unit.running[instance_id] = (unit.running[instance_id][0], change.value)
+            unit.touched[instance_id] = time.time()
+            unit.update_missing(instance_id)
+            return result
+
+    def refresh(self, profile, region, instance_ids, instances):
+        """Atualiza nome/role das instâncias buscadas; as que não vieram não estão mais running."""
+        with self._lock:
+            unit = self.units[(profile, region)]
+            found = set()
+            for instance in instances:
+                instance_id = instance.instance_id
+                found.add(instance_id)
+                if instance.state == 'running':
+                    unit.running[instance_id] = (instance.name, 'Yes' if instance.instance_profile_arn else 'No')
+                else:
+                    unit.running.pop(instance_id, None)
+                unit.update_missing(instance_id)
+            for instance_id in set(instance_ids) - found:
+                unit.running.pop(instance_id, None)
+                unit.update_missing(instance_id)
+
+    def missing_rows(self):
+        """
+        Linhas do missing-from-ssm.csv, na ordem PROFILES × REGIONS e por InstanceId.
+
+        Instâncias que ainda esperam a busca em lote (role desconhecida) ficam
+        de fora até serem buscadas ou reconciliadas.
+        """
+        with self._lock:
+            rows = []
+            for (profile, region), unit in self.units.items():
+                for instance_id in sorted(unit.missing):
+                    name, has_role = unit.running[instance_id]
+                    if has_role is not None:
+                        rows.append([profile, region, instance_id, name, has_role])
+            return rows
+
+    def missing_ids(self):
+        with self._lock:
+            return {key: set(unit.missing) for key, unit in self.units.items()}
+
+    def totals(self):
+        with self._lock:
+            return {
+                'running': sum(len(unit.running) for unit in self.units.values()),
+                'in_ssm': sum(len(unit.ssm) for unit in self.units.values()),
+                'missing': sum(len(unit.missing) for unit in self.units.values()),
+            }
+
+
+class Watcher:
+    """
+    Consome os eventos, busca instâncias novas e reconcilia o FleetModel.
+
+    Args:
+        client_fn: Função (profile, região, serviço) -> cliente boto3 (ex: aws_clients.get_client)
+        profiles / regions: Frota acompanhada
+        queue_url: Fila SQS com os eventos (None: só reconciliação)
+        queue_profile: Profile com acesso à fila (padrão: o primeiro)
+        consumers: Threads lendo a fila
+        reconcile_interval: Segundos para reconciliar a frota inteira
+        log: Função chamada com cada linha de progresso (padrão: print)
+    """
+
+    def __init__(self, client_fn, profiles, regions, queue_url=None, queue_profile=None,
+                 consumers=DEFAULT_CONSUMERS, reconcile_interval=DEFAULT_RECONCILE_INTERVAL, log=print):
+        self.client_fn = client_fn
+        self.profiles = list(profiles)
+        self.regions = list(regions)
+        self.queue_url = queue_url
+        self.queue_profile = queue_profile or self.profiles[0]
+        self.consumers = max(1, consumers)
+        self.reconcile_interval = reconcile_interval
+        self.log = log
+        self.model = FleetModel(self.profiles, self.regions)
+        self.stats = Counter()
+        self.accounts = {}
+        self.started_at = time.time()
+        self._seen = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def resolve_accounts(self):
+        """Account id de cada profile (os eventos trazem a conta, não o profile)."""
+        for profile in self.profiles:
+            try:
+                account = self.client_fn(profile, self.regions[0], 'sts').get_caller_identity()['Account']
+            except Exception as e:
+                self.log(f"⚠️  {profile}: conta não identificada ({str(e)}), eventos ignorados")
+                continue
+            # Profiles da mesma conta veem as mesmas instâncias: vale o primeiro
+            self.accounts.setdefault(account, profile)
+
+    def reconcile(self, profile, region):
+        """Lista as running e o SSM de um par e substitui o modelo; retorna o drift."""
+        since = time.time()
+        ec2 = self.client_fn(profile, region, 'ec2')
+        ssm = self.client_fn(profile, region, 'ssm')
+        running = {}
+        for instance in iter_ec2_instances(ec2, filters=RUNNING_FILTER):
+            running[instance.instance_id] = (instance.name, 'Yes' if instance.instance_profile_arn else 'No')
+        # Todas as registradas, não só as running: uma instância parada pode voltar a rodar
+        registered = {instance.instance_id: instance.ping_status for instance in iter_ssm_instances(ssm)}
+        drift = self.model.replace(profile, region, running, registered, since)
+        with self._lock:
+            self.stats['reconciled'] += 1
+            self.stats['drift'] += drift
+        return drift
+
+    def load(self):
+        """Carga inicial: reconcilia todos os pares em paralelo (scan_engine)."""
+        errors = []
+        for result in run_units(self.profiles, self.regions, self.reconcile):
+            if result.error:
+                errors.append(result)
+                self.log(f"  ⚠️  {result.profile} - {result.region}: {str(result.error)}")
+        with self._lock:
+            self.stats['drift'] = 0
+        return errors
+
+    def handle(self, body):
+        """
+        Aplica o evento de uma mensagem da fila.
+
+        O id do evento só é lembrado depois de aplicado: se parse_event ou o
+        modelo levantarem, a mensagem reentregue pela fila é aplicada de novo.
+        """
+        try:
+            event = unwrap_message(body)
+        except (ValueError, TypeError):
+            self._count('invalid')
+            return
+        event_id = event.get('id')
+        with self._lock:
+            self.stats['events'] += 1
+            if event_id and event_id in self._seen:
+                self.stats['duplicates'] += 1
+                return
+
+        change = parse_event(event)
+        profile = self.accounts.get(change.account) if change else None
+        if change is None or profile is None or (profile, change.region) not in self.model.units:
+            result = 'ignored'
+        else:
+            result = self.model.apply(profile, change.region, change)
+        with self._lock:
+            self.stats[result] += 1
+            if result == 'refresh':
+                self._pending.setdefault((profile, change.region), set()).add(change.instance_id)
+            if event_id:
+                self._seen[event_id] = None
+                if len(self._seen) > DEDUP_SIZE:
+                    self._seen.popitem(last=False)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def consume(self):
+        sqs = self.client_fn(self.queue_profile, queue_region(self.queue_url, self.regions[0]), 'sqs')
+        while not self._stop.is_set():
+            try:
+                response = sqs.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=RECEIVE_BATCH,
+                                               WaitTimeSeconds=RECEIVE_WAIT_SECONDS)
+                handled = []
+                for message in response.get('Messages', []):
+                    try:
+                        self.handle(message['Body'])
+                    except Exception as e:
+                        # Fica na fila: volta depois do visibility timeout
+                        self._count('failed')
+                        self.log(f"⚠️  Erro aplicando evento: {str(e)}")
+                        continue
+                    handled.append(message)
+                if handled:
+                    sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=[
+                        {'Id': str(n), 'ReceiptHandle': message['ReceiptHandle']}
+                        for n, message in enumerate(handled)])
+            except Exception as e:
+                self.log(f"⚠️  Erro lendo a fila: {str(e)}")
+                self._stop.wait(5)
+
+    def refresh_pending(self):
+        """Busca em lote nome e role das instâncias que passaram a running."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for (profile, region), instance_ids in pending.items():
+            ids = sorted(instance_ids)
+            start = 0
+            try:
+                ec2 = self.client_fn(profile, region, 'ec2')
+                for start in range(0, len(ids), REFRESH_BATCH):
+                    batch = ids[start:start + REFRESH_BATCH]
+                    instances = list(iter_ec2_instances(ec2, filters=instance_filters(instance_ids=batch)))
+                    self.model.refresh(profile, region, batch, instances)
+                    self._count('refreshed')
+            except Exception as e:
+                self.log(f"⚠️  {profile} - {region}: erro buscando instâncias novas: {str(e)}")
+                # Tenta de novo na próxima rodada; até lá ficam fora do /missing
+                with self._lock:
+                    self._pending.setdefault((profile, region), set()).update(ids[start:])
+
+    def pending_refresh(self):
+        with self._lock:
+            return sum(len(ids) for ids in self._pending.values())
+
+    def _refresh_loop(self):
+        while not self._stop.wait(REFRESH_INTERVAL):
+            self.refresh_pending()
+
+    def _reconcile_loop(self):
+        """Um par por vez, espaçados para cobrir a frota a cada reconcile_interval."""
+        units = list(self.model.units)
+        period = self.reconcile_interval / len(units)
+        position = 0
+        while not self._stop.wait(period):
+            profile, region = units[position % len(units)]
+            position += 1
+            try:
+                drift = self.reconcile(profile, region)
+            except Exception as e:
+                self.log(f"⚠️  {profile} - {region}: reconciliação falhou: {str(e)}")
+                continue
+            if drift:
+                self.log(f"🔄 {profile} - {region}: {drift} instâncias corrigidas pela reconciliação")
+
+    def start(self):
+        """Inicia consumidores, busca em lote e reconciliação em threads."""
+        targets = [self._refresh_loop]
+        if self.reconcile_interval:
+            targets.append(self._reconcile_loop)
+        if self.queue_url:
+            targets.extend([self.consume] * self.consumers)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return dict(self.model.totals(), units=len(self.model.units), accounts=len(self.accounts),
+                    queue=self.queue_url, uptime=round(time.time() - self.started_at), **stats)
+
+
+def queue_region(queue_url, default):
+    """Região de uma URL do SQS (https://sqs.<região>.amazonaws.com/...)."""
+    host = urlparse(queue_url or '').netloc.split('.')
+    return host[1] if len(host) > 2 and host[0] == 'sqs' else default
+
+
+def missing_csv(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(MISSING_HEADER)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def make_handler(watcher):
+    """Handler HTTP com /missing, /missing.json e /status."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/missing':
+                self._send(missing_csv(watcher.model.missing_rows()), 'text/csv')
+            elif path == '/missing.json':
+                rows = [dict(zip(MISSING_HEADER, row)) for row in watcher.model.missing_rows()]
+                self._send(json.dumps(rows), 'application/json')
+            elif path == '/status':
+                self._send(json.dumps(watcher.status()), 'application/json')
+            else:
+                self.send_error(404)
+
+        def _send(self, body, content_type):
+            data = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Acompanha EC2 vs SSM continuamente")
+    parser.add_argument('--port', type=int, default=getattr(config, 'WATCH_PORT', DEFAULT_PORT))
+    args = parser.parse_args(argv)
+
+    queue_url = getattr(config, 'WATCH_QUEUE_URL', None)
+    watcher = Watcher(get_client, discover_accounts(PROFILES), REGIONS, queue_url=queue_url,
+                      queue_profile=getattr(config, 'WATCH_QUEUE_PROFILE', None),
+                      consumers=getattr(config, 'WATCH_CONSUMERS', DEFAULT_CONSUMERS),
+                      reconcile_interval=getattr(config, 'WATCH_RECONCILE_INTERVAL', DEFAULT_RECONCILE_INTERVAL))
+
+    print("=== Modo contínuo: EC2 vs SSM ===")
+    if not queue_url:
+        print("⚠️  WATCH_QUEUE_URL não definido: só reconciliação periódica, sem eventos")
+    else:
+        watcher.resolve_accounts()
+        print(f"Fila: {queue_url} ({len(watcher.accounts)} contas)")
+
+    start = time.perf_counter()
+    watcher.load()
+    totals = watcher.model.totals()
+    print(f"Carga inicial em {time.perf_counter() - start:.1f}s: {totals['running']} running, "
+          f"{totals['in_ssm']} no SSM, {totals['missing']} faltando")
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(watcher))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    watcher.start()
+    print(f"Consulta: http://127.0.0.1:{args.port}/missing (Ctrl+C para encerrar)\n")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(60):
+            status = watcher.status()
+            print(f"📊 {status['missing']} faltando | {status.get('events', 0)} eventos, "
+                  f"{status.get('duplicates', 0)} repetidos, {status.get('stale', 0)} fora de ordem, "
+                  f"{status.get('drift', 0)} corrigidos pela reconciliação")
+    except KeyboardInterrupt:
+        pass
+
+    watcher.stop()
+    server.shutdown()
+    path = os.path.join(snapshot.data_dir(), "missing-from-ssm.csv")
+    with open(path, 'w', newline='') as f:
+        f.write(missing_csv(watcher.model.missing_rows()))
+    print(f"\nArquivo salvo: {path}")
+    print(POOL.summary())
+
+
+if __name__ == "__main__":
+    main()
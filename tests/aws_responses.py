@@ -0,0 +1,303 @@
+"""
+Clientes botocore com respostas roteirizadas num handler de before-send, sem rede.
+
+- Responder: uma sequência de respostas (ou exceções), para uma operação só
+- Router: respostas por operação, montadas a partir dos parâmetros da requisição
+  (paginação por NextToken/Marker, filtros); conta as chamadas por operação
+
+Os dois servem clientes do boto3 e, com aio=True, do aiobotocore. As funções
+abaixo montam os corpos XML/JSON das operações usadas pelos scripts.
+"""
+
+import json
+from collections import Counter
+from html import escape
+from urllib.parse import parse_qsl, quote
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+from aws_clients import ClientPool
+
+PROFILE = 'account000'
+REGION = 'us-east-1'
+ACCOUNT_ID = '123456789012'
+
+IAM_NS = 'https://iam.amazonaws.com/doc/2010-05-08/'
+EC2_NS = 'http://ec2.amazonaws.com/doc/2016-11-15/'
+
+ROLE = (b'<GetRoleResponse xmlns="https://iam.amazonaws.com/doc/2010-05-08/"><GetRoleResult><Role>'
+        b'<Path>/</Path><RoleName>app</RoleName><RoleId>AROAEXAMPLE</RoleId>'
+        b'<Arn>arn:aws:iam::123456789012:role/app</Arn><CreateDate>2024-01-01T00:00:00Z</CreateDate>'
+        b'</Role></GetRoleResult></GetRoleResponse>')
+
+
+def error(code):
+    return (f'<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code><Message>{code}</Message>'
+            f'</Error><RequestId>r</RequestId></ErrorResponse>').encode()
+
+
+def json_error(code):
+    return json.dumps({'__type': code, 'message': code}).encode()
+
+
+class Body:
+    def __init__(self, content):
+        self.content = content
+
+    def stream(self, **kwargs):
+        yield self.content
+
+
+class AioBody:
+    def __init__(self, content):
+        self.content = content
+
+    async def read(self):
+        return self.content
+
+
+def http_response(request, status, body, aio=False):
+    if aio:
+        from aiobotocore.awsrequest import AioAWSResponse
+        return AioAWSResponse(request.url, status, {}, AioBody(body))
+    return AWSResponse(request.url, status, {}, Body(body))
+
+
+def request_params(request):
+    """Parâmetros da requisição: o JSON do corpo (SSM) ou o formulário achatado (EC2, IAM: 'Filter.1.Name')."""
+    body = request.body or b''
+    if isinstance(body, bytes):
+        body = body.decode()
+    if body.startswith('{'):
+        return json.loads(body)
+    return dict(parse_qsl(body))
+
+
+class Responder:
+    """
+    Handler de before-send: devolve as respostas roteirizadas em vez de ir à rede.
+
+    Cada passo é (status, corpo) ou uma exceção a levantar; o último se repete.
+    """
+
+    def __init__(self, *script, aio=False):
+        self.script = list(script)
+        self.aio = aio
+        self.sent = 0
+
+    def __call__(self, request=None, **kwargs):
+        self.sent += 1
+        step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, Exception):
+            raise step
+        status, body = step
+        return http_response(request, status, body, self.aio)
+
+
+class Router:
+    """
+    Handler de before-send que responde por operação.
+
+    Args:
+        routes: dict operação (ex: 'DescribeInstances') -> função(params) que
+            retorna (status, corpo)
+        aio: Respostas para o aiobotocore
+    """
+
+    def __init__(self, routes, aio=False):
+        self.routes = routes
+        self.aio = aio
+        self.calls = Counter()
+        self.requests = []
+
+    def __call__(self, request=None, event_name='', **kwargs):
+        operation = event_name.rsplit('.', 1)[-1]
+        params = request_params(request)
+        self.calls[operation] += 1
+        self.requests.append((operation, params))
+        status, body = self.routes[operation](params)
+        return http_response(request, status, body, self.aio)
+
+
+def session(handler):
+    """boto3.Session com credenciais estáticas e `handler` respondendo todas as requisições."""
+    boto_session = boto3.Session(aws_access_key_id='testing', aws_secret_access_key='testing', region_name=REGION)
+    boto_session.events.register('before-send', handler)
+    return boto_session
+
+
+def aio_session(handler):
+    """AioSession equivalente a session(), para o modo --async."""
+    from aiobotocore.session import AioSession
+    aio = AioSession()
+    aio.set_credentials('testing', 'testing')
+    aio.register('before-send', handler)
+    return aio
+
+
+def iam_client(retry, tracer, *script):
+    """Cliente IAM do ClientPool (com `retry` e `tracer` registrados) e o Responder que o atende."""
+    def session_factory(profile):
+        return boto3.Session(aws_access_key_id='testing', aws_secret_access_key='testing')
+
+    iam = ClientPool(session_factory=session_factory, retry=retry, tracer=tracer).client(PROFILE, REGION, 'iam')
+    responder = Responder(*script)
+    iam.meta.events.register('before-send', responder)
+    return iam, responder
+
+
+def paged(items, params, size, token_key='NextToken'):
+    """Fatia de `items` da página pedida em `params` e o token da próxima (ou None)."""
+    start = int(params.get(token_key) or 0)
+    end = start + size
+    return items[start:end], (str(end) if end < len(items) else None)
+
+
+def _xml(tag, value):
+    return f"<{tag}>{escape(str(value))}</{tag}>"
+
+
+def _policy_text(document):
+    return quote(json.dumps(document))
+
+
+# EC2
+
+def ec2_instance(instance_id, state='running', name=None, instance_profile_arn=None, tags=None):
+    """Instância no formato de describe_instances (parâmetros de ec2_instances_page)."""
+    tags = dict(tags or {})
+    if name is not None:
+        tags['Name'] = name
+    return {'InstanceId': instance_id, 'State': state, 'Tags': tags, 'InstanceProfileArn': instance_profile_arn}
+
+
+def ec2_instances_page(instances, next_token=None):
+    items = []
+    for instance in instances:
+        tags = ''.join(f"<item>{_xml('key', key)}{_xml('value', value)}</item>"
+                       for key, value in instance['Tags'].items())
+        profile = (f"<iamInstanceProfile>{_xml('arn', instance['InstanceProfileArn'])}<id>AIPA</id>"
+                   f"</iamInstanceProfile>" if instance['InstanceProfileArn'] else '')
+        code = {'pending': 0, 'running': 16, 'stopping': 64, 'stopped': 80, 'terminated': 48}[instance['State']]
+        items.append(f"<item>{_xml('instanceId', instance['InstanceId'])}"
+                     f"<instanceState><code>{code}</code>{_xml('name', instance['State'])}</instanceState>"
+                     f"<tagSet>{tags}</tagSet>{profile}"
+                     f"<launchTime>2026-01-01T00:00:00.000Z</launchTime></item>")
+    token = _xml('nextToken', next_token) if next_token else ''
+    return (f'<DescribeInstancesResponse xmlns="{EC2_NS}"><requestId>r</requestId><reservationSet>'
+            f"<item><reservationId>r-1</reservationId><ownerId>{ACCOUNT_ID}</ownerId>"
+            f"<instancesSet>{''.join(items)}</instancesSet></item></reservationSet>{token}"
+            f"</DescribeInstancesResponse>").encode()
+
+
+def ec2_params_filters(params):
+    """Filters achatados da requisição do EC2 como dict nome -> valores."""
+    filters = {}
+    n = 1
+    while f"Filter.{n}.Name" in params:
+        values = []
+        while f"Filter.{n}.Value.{len(values) + 1}" in params:
+            values.append(params[f"Filter.{n}.Value.{len(values) + 1}"])
+        filters[params[f"Filter.{n}.Name"]] = values
+        n += 1
+    return filters
+
+
+# SSM
+
+def ssm_information(instance_id, ping_status='Online', agent_version='3.3.40.0', platform_type='Linux'):
+    return {'InstanceId': instance_id, 'PingStatus': ping_status, 'AgentVersion': agent_version,
+            'PlatformType': platform_type, 'ResourceType': 'EC2Instance'}
+
+
+def ssm_information_page(items, next_token=None):
+    page = {'InstanceInformationList': items}
+    if next_token:
+        page['NextToken'] = next_token
+    return json.dumps(page).encode()
+
+
+# IAM
+
+def iam_response(operation, result):
+    return (f'<{operation}Response xmlns="{IAM_NS}"><{operation}Result>{result}</{operation}Result>'
+            f"<ResponseMetadata><RequestId>r</RequestId></ResponseMetadata></{operation}Response>").encode()
+
+
+def _attached(policies):
+    return ''.join(f"<member>{_xml('PolicyName', name)}{_xml('PolicyArn', arn)}</member>"
+                   for name, arn in policies)
+
+
+def authorization_details(roles, instance_profiles):
+    """
+    get_account_authorization_details de uma página.
+
+    Args:
+        roles: dict role -> lista de (nome, ARN) das policies anexadas
+        instance_profiles: dict instance profile -> role (ou None)
+    """
+    members = []
+    for role_name, policies in sorted(roles.items()):
+        profiles = ''.join(
+            f"<member>{_xml('InstanceProfileName', name)}{_xml('Arn', instance_profile_arn(name))}"
+            f"<Path>/</Path>{_xml('InstanceProfileId', 'AIPA' + name)}"
+            f"<CreateDate>2024-01-01T00:00:00Z</CreateDate><Roles/></member>"
+            for name, role in sorted(instance_profiles.items()) if role == role_name)
+        members.append(f"<member>{_xml('RoleName', role_name)}{_xml('Arn', role_arn(role_name))}"
+                       f"<InstanceProfileList>{profiles}</InstanceProfileList>"
+                       f"<AttachedManagedPolicies>{_attached(policies)}</AttachedManagedPolicies>"
+                       f"<RolePolicyList/></member>")
+    return iam_response('GetAccountAuthorizationDetails',
+                        f"<RoleDetailList>{''.join(members)}</RoleDetailList><Policies/>"
+                        f"<IsTruncated>false</IsTruncated>")
+
+
+def instance_profile_response(name, role_name):
+    roles = (f"<member><Path>/</Path>{_xml('RoleName', role_name)}<RoleId>AROA</RoleId>"
+             f"{_xml('Arn', role_arn(role_name))}<CreateDate>2024-01-01T00:00:00Z</CreateDate></member>"
+             if role_name else '')
+    return iam_response('GetInstanceProfile',
+                        f"<InstanceProfile><Path>/</Path>{_xml('InstanceProfileName', name)}"
+                        f"<InstanceProfileId>AIPA</InstanceProfileId>{_xml('Arn', instance_profile_arn(name))}"
+                        f"<CreateDate>2024-01-01T00:00:00Z</CreateDate><Roles>{roles}</Roles></InstanceProfile>")
+
+
+def role_response(role_name):
+    return iam_response('GetRole', f"<Role><Path>/</Path>{_xml('RoleName', role_name)}<RoleId>AROA</RoleId>"
+                                   f"{_xml('Arn', role_arn(role_name))}<CreateDate>2024-01-01T00:00:00Z"
+                                   f"</CreateDate></Role>")
+
+
+def attached_policies_response(policies):
+    return iam_response('ListAttachedRolePolicies',
+                        f"<AttachedPolicies>{_attached(policies)}</AttachedPolicies><IsTruncated>false</IsTruncated>")
+
+
+def role_policies_response(names=()):
+    members = ''.join(f"<member>{escape(name)}</member>" for name in names)
+    return iam_response('ListRolePolicies', f"<PolicyNames>{members}</PolicyNames><IsTruncated>false</IsTruncated>")
+
+
+def policy_response(arn, version_id='v1'):
+    return iam_response('GetPolicy', f"<Policy>{_xml('PolicyName', arn.split('/')[-1])}{_xml('Arn', arn)}"
+                                     f"{_xml('DefaultVersionId', version_id)}</Policy>")
+
+
+def policy_version_response(document, version_id='v1'):
+    return iam_response('GetPolicyVersion',
+                        f"<PolicyVersion>{_xml('Document', _policy_text(document))}{_xml('VersionId', version_id)}"
+                        f"<IsDefaultVersion>true</IsDefaultVersion></PolicyVersion>")
+
+
+def role_arn(role_name):
+    return f"arn:aws:iam::{ACCOUNT_ID}:role/{role_name}"
+
+
+def instance_profile_arn(name):
+    return f"arn:aws:iam::{ACCOUNT_ID}:instance-profile/{name}"
+
+
+def managed_policy_arn(name):
+    return f"arn:aws:iam::aws:policy/{name}"
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os scripts são módulos soltos em scripts/, importados pelo nome
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
@@ -0,0 +1,195 @@
+"""scan.py --async (aiobotocore) gera os mesmos CSVs que o modo padrão, com o mesmo cache IAM."""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import types
+
+import pytest
+
+pytest.importorskip('aiobotocore')
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import async_scan  # noqa: E402
+from aws_responses import (PROFILE, REGION, Responder, Router, aio_session, authorization_details,  # noqa: E402
+                           attached_policies_response, ec2_instance, ec2_instances_page, ec2_params_filters,
+                           error, instance_profile_arn, instance_profile_response, managed_policy_arn, paged,
+                           policy_response, policy_version_response, role_policies_response, role_response,
+                           session, ssm_information, ssm_information_page)
+from aws_standin import AWS_MANAGED_POLICIES, SSM_POLICY  # noqa: E402
+
+CSVS = ('ec2-inventory.csv', 'ssm-agent-status.csv', 'missing-from-ssm.csv')
+
+ROLES = {
+    'app-ok': [SSM_POLICY],
+    'app-full': ['AmazonSSMFullAccess'],
+    'app-s3': ['AmazonS3ReadOnlyAccess'],
+    'app-cw': ['CloudWatchAgentServerPolicy'],
+}
+INSTANCE_PROFILES = {'app-ok': 'app-ok', 'app-full': 'app-full', 'app-s3': 'app-s3', 'app-cw': 'app-cw',
+                     'orphan': None}
+
+INSTANCES = [
+    ec2_instance('i-00000000000000001', 'running', 'web-1', instance_profile_arn('app-ok')),
+    ec2_instance('i-00000000000000002', 'running', 'web-2'),
+    ec2_instance('i-00000000000000003', 'stopped', 'batch-3', instance_profile_arn('app-s3')),
+    ec2_instance('i-00000000000000004', 'running', 'orphan-4', instance_profile_arn('orphan')),
+    ec2_instance('i-00000000000000005', 'running', 'web-5', instance_profile_arn('app-ok')),
+    ec2_instance('i-00000000000000006', 'running', 'legacy-6', instance_profile_arn('app-full')),
+    ec2_instance('i-00000000000000007', 'running', 'metrics-7', instance_profile_arn('app-cw')),
+    ec2_instance('i-00000000000000008', 'terminated', 'old-8', instance_profile_arn('app-ok')),
+]
+SSM = [
+    ssm_information('i-00000000000000001'),
+    ssm_information('i-00000000000000005', agent_version='2.3.1319.0', platform_type='Windows'),
+    ssm_information('i-00000000000000006', ping_status='ConnectionLost', agent_version='3.1.0.0'),
+    ssm_information('i-00000000000000099'),
+]
+
+
+def not_found():
+    return 404, error('NoSuchEntity')
+
+
+def describe_instances(params):
+    filters = ec2_params_filters(params)
+    selected = [instance for instance in INSTANCES
+                if instance['State'] in filters.get('instance-state-name', [instance['State']])
+                and instance['InstanceId'] in filters.get('instance-id', [instance['InstanceId']])]
+    items, token = paged(selected, params, 3)
+    return 200, ec2_instances_page(items, token)
+
+
+def describe_instance_information(params):
+    wanted = {value for f in params.get('Filters', []) if f['Key'] == 'InstanceIds' for value in f['Values']}
+    items, token = paged([item for item in SSM if not wanted or item['InstanceId'] in wanted], params, 2)
+    return 200, ssm_information_page(items, token)
+
+
+def attached(role_name):
+    return [(name, managed_policy_arn(name)) for name in ROLES[role_name]]
+
+
+def get_instance_profile(params):
+    name = params['InstanceProfileName']
+    if name not in INSTANCE_PROFILES:
+        return not_found()
+    return 200, instance_profile_response(name, INSTANCE_PROFILES[name])
+
+
+def role_route(build):
+    def route(params):
+        if params['RoleName'] not in ROLES:
+            return not_found()
+        return 200, build(params['RoleName'])
+    return route
+
+
+def get_policy_version(params):
+    return 200, policy_version_response(AWS_MANAGED_POLICIES[params['PolicyArn'].split('/')[-1]],
+                                        params['VersionId'])
+
+
+ROUTES = {
+    'DescribeInstances': describe_instances,
+    'DescribeInstanceInformation': describe_instance_information,
+    'GetAccountAuthorizationDetails': lambda params: (200, authorization_details(
+        {role_name: attached(role_name) for role_name in ROLES}, INSTANCE_PROFILES)),
+    'GetInstanceProfile': get_instance_profile,
+    'GetRole': role_route(role_response),
+    'ListAttachedRolePolicies': role_route(lambda role_name: attached_policies_response(attached(role_name))),
+    'ListRolePolicies': role_route(lambda role_name: role_policies_response()),
+    'GetPolicy': lambda params: (200, policy_response(params['PolicyArn'])),
+    'GetPolicyVersion': get_policy_version,
+}
+
+
+def scan_child(data_dir, argv, settings, conn):
+    """Processo filho: config sintético, clientes respondidos pelo Router e scan.main(argv)."""
+    config = types.ModuleType('config')
+    config.PROFILES = [PROFILE]
+    config.REGIONS = [REGION]
+    config.SSM_POLICIES = ['AmazonSSMManagedInstanceCore', 'AmazonEC2RoleforSSM']
+    config.DATA_DIR = data_dir
+    config.IAM_CACHE_FILE = None
+    for key, value in settings.items():
+        setattr(config, key, value)
+    sys.modules['config'] = config
+    sys.modules.pop('scan', None)
+
+    router = Router(ROUTES)
+    aio_router = Router(ROUTES, aio=True)
+    import aws_clients
+    aws_clients.POOL.session_factory = lambda profile: session(router)
+    async_scan.AioSession = lambda profile: aio_session(aio_router)
+    import scan
+    try:
+        scan.main(argv)
+        conn.send(('ok', router.calls + aio_router.calls))
+    except BaseException as e:
+        conn.send(('error', repr(e)))
+
+
+def run_scan(data_dir, *argv, **settings):
+    """Roda scan.main em um processo novo (estado dos módulos limpo) e retorna as chamadas por operação."""
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=scan_child, args=(str(data_dir), list(argv), settings, sender))
+    process.start()
+    sender.close()
+    status, value = receiver.recv()
+    process.join()
+    assert status == 'ok', value
+    return value
+
+
+def read(data_dir, name):
+    with open(os.path.join(data_dir, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('prefetch', [True, False], ids=['lote', 'por-role'])
+def test_async_csvs_are_identical_to_sync(tmp_path, prefetch):
+    sync_dir, async_dir = tmp_path / 'sync', tmp_path / 'async'
+    sync_dir.mkdir()
+    async_dir.mkdir()
+
+    run_scan(sync_dir, IAM_PREFETCH=prefetch)
+    run_scan(async_dir, '--async', IAM_PREFETCH=prefetch)
+
+    for name in CSVS:
+        assert read(async_dir, name) == read(sync_dir, name), name
+    inventory = read(sync_dir, 'ec2-inventory.csv').decode()
+    assert 'app-ok,OK' in inventory and 'app-full,OK' in inventory and 'app-cw,NO_SSM' in inventory
+    assert 'NO_ROLE,NO_SSM' in inventory and 'ERROR_ROLE,NO_SSM' in inventory
+
+
+def test_async_reads_and_writes_the_iam_disk_cache(tmp_path):
+    settings = {'IAM_PREFETCH': False, 'IAM_CACHE_FILE': 'iam-cache.sqlite'}
+
+    first = run_scan(tmp_path, '--async', **settings)
+    inventory = read(tmp_path, 'ec2-inventory.csv')
+    second = run_scan(tmp_path, '--async', **settings)
+
+    assert first['GetRole'] and first['GetPolicyVersion']
+    for operation in ('GetInstanceProfile', 'GetRole', 'ListAttachedRolePolicies', 'GetPolicy', 'GetPolicyVersion'):
+        assert second[operation] == 0, operation
+    assert read(tmp_path, 'ec2-inventory.csv') == inventory
+
+
+def test_failed_lookup_is_not_memoized():
+    responder = Responder((403, error('AccessDenied')), (200, instance_profile_response('app-ok', 'app-ok')),
+                          aio=True)
+    resolver = async_scan.AsyncIamResolver(prefetch=False)
+    arn = instance_profile_arn('app-ok')
+
+    async def lookups():
+        async with aio_session(responder).create_client('iam', region_name=REGION) as iam:
+            with pytest.raises(ClientError):
+                await resolver.role_for_instance_profile(PROFILE, iam, arn)
+            return await resolver.role_for_instance_profile(PROFILE, iam, arn)
+
+    assert asyncio.run(lookups()) == 'app-ok'
+    assert responder.sent == 2
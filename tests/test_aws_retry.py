@@ -0,0 +1,58 @@
+"""Retry e rate limit do aws_retry.py num cliente botocore de verdade, sem rede."""
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from botocore.exceptions import ClientError, EndpointConnectionError  # noqa: E402
+
+import aws_retry  # noqa: E402
+from aws_responses import PROFILE, ROLE, error, iam_client  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(aws_retry.random, 'uniform', lambda low, high: 0.0)
+
+
+def test_throttling_is_retried_and_slows_the_bucket():
+    retry = aws_retry.AdaptiveRetry()
+    iam, responder = iam_client(retry, None, (400, error('Throttling')), (400, error('Throttling')), (200, ROLE))
+
+    assert iam.get_role(RoleName='app')['Role']['RoleName'] == 'app'
+    assert responder.sent == 3
+    assert (retry.retries, retry.throttles, retry.give_ups) == (2, 2, 0)
+    assert retry.bucket(PROFILE, 'iam').rate < aws_retry.DEFAULT_RATES['iam']
+
+
+def test_definitive_errors_are_not_retried():
+    retry = aws_retry.AdaptiveRetry()
+    iam, responder = iam_client(retry, None, (403, error('AccessDenied')))
+
+    with pytest.raises(ClientError) as raised:
+        iam.get_role(RoleName='app')
+
+    assert raised.value.response['Error']['Code'] == 'AccessDenied'
+    assert responder.sent == 1
+    assert retry.retries == 0
+
+
+def test_gives_up_after_max_attempts():
+    retry = aws_retry.AdaptiveRetry(max_attempts=3)
+    iam, responder = iam_client(retry, None, (400, error('Throttling')))
+
+    with pytest.raises(ClientError):
+        iam.get_role(RoleName='app')
+
+    assert responder.sent == 3
+    assert (retry.retries, retry.throttles, retry.give_ups) == (2, 3, 1)
+
+
+def test_connection_errors_are_retried():
+    retry = aws_retry.AdaptiveRetry()
+    iam, responder = iam_client(retry, None, EndpointConnectionError(endpoint_url='https://iam.amazonaws.com'),
+                                (200, ROLE))
+
+    assert iam.get_role(RoleName='app')['Role']['Arn'].endswith(':role/app')
+    assert responder.sent == 2
+    assert retry.retries == 1
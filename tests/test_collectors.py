@@ -0,0 +1,123 @@
+"""Os coletores de collectors.py percorrem todas as páginas sem acumular memória."""
+
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('boto3')
+
+import collectors  # noqa: E402
+from aws_responses import (REGION, Router, ec2_instance, ec2_instances_page, ec2_params_filters,  # noqa: E402
+                           paged, session, ssm_information, ssm_information_page)
+
+PAGE = 3
+
+
+def ec2_fleet(size):
+    return [ec2_instance(f"i-{n:017x}", 'running' if n % 4 else 'stopped', name=f"app-{n}",
+                         instance_profile_arn=f"arn:aws:iam::123456789012:instance-profile/app-{n % 3}"
+                         if n % 2 else None)
+            for n in range(size)]
+
+
+def selected(instance, filters):
+    """Filtro do lado do servidor: estado, instance-id e tag:<chave>."""
+    values = {'instance-state-name': instance['State'], 'instance-id': instance['InstanceId']}
+    values.update((f"tag:{key}", value) for key, value in instance['Tags'].items())
+    return all(values.get(name) in accepted for name, accepted in filters.items())
+
+
+def ec2_client(instances, page=PAGE):
+    def describe_instances(params):
+        filters = ec2_params_filters(params)
+        items, token = paged([i for i in instances if selected(i, filters)], params, page)
+        return 200, ec2_instances_page(items, token)
+
+    router = Router({'DescribeInstances': describe_instances})
+    return session(router).client('ec2', region_name=REGION), router
+
+
+def ssm_client(items, page=PAGE):
+    def describe_instance_information(params):
+        wanted = {value for f in params.get('Filters', []) if f['Key'] == 'InstanceIds' for value in f['Values']}
+        selected = [item for item in items if not wanted or item['InstanceId'] in wanted]
+        page_items, token = paged(selected, params, page)
+        return 200, ssm_information_page(page_items, token)
+
+    router = Router({'DescribeInstanceInformation': describe_instance_information})
+    return session(router).client('ssm', region_name=REGION), router
+
+
+def test_ec2_instances_come_from_every_page():
+    fleet = ec2_fleet(14)
+    ec2, router = ec2_client(fleet)
+
+    instances = list(collectors.iter_ec2_instances(ec2, collectors.instance_filters(['running', 'stopped'])))
+
+    assert [i.instance_id for i in instances] == [i['InstanceId'] for i in fleet]
+    assert router.calls['DescribeInstances'] == 5
+    assert instances[1].name == 'app-1' and instances[1].state == 'running'
+    assert instances[1].instance_profile_arn.endswith('/app-1') and instances[0].instance_profile_arn is None
+    # Os filtros vão em todas as páginas
+    assert all(ec2_params_filters(params) == {'instance-state-name': ['running', 'stopped']}
+               for _, params in router.requests)
+
+
+def test_ssm_instances_come_from_every_page_and_id_batch():
+    items = [ssm_information(f"i-{n:017x}") for n in range(120)]
+    ssm, router = ssm_client(items, page=50)
+
+    assert [i.instance_id for i in collectors.iter_ssm_instances(ssm)] == [item['InstanceId'] for item in items]
+    assert router.calls['DescribeInstanceInformation'] == 3
+
+    wanted = [item['InstanceId'] for item in items[::2]]
+    selected = list(collectors.iter_ssm_instances(ssm, instance_ids=wanted))
+
+    assert [i.instance_id for i in selected] == wanted
+    # 60 ids: lotes de SSM_FILTER_BATCH (50 + 10), uma página cada
+    assert router.calls['DescribeInstanceInformation'] == 5
+
+
+def test_filters_go_to_the_api_and_only_records_are_kept():
+    fleet = [ec2_instance(f"i-{n:017x}", ('running', 'stopped', 'terminated')[n % 3],
+                          tags={'Env': 'prod' if n % 2 else 'dev'}) for n in range(30)]
+    ec2, router = ec2_client(fleet, page=2)
+
+    instances = list(collectors.iter_ec2_instances(ec2, collectors.instance_filters(['running'], {'Env': ['prod']})))
+
+    expected = [i['InstanceId'] for i in fleet if i['State'] == 'running' and i['Tags']['Env'] == 'prod']
+    assert [i.instance_id for i in instances] == expected
+    assert router.calls['DescribeInstances'] == 3
+    assert all(ec2_params_filters(params) == {'instance-state-name': ['running'], 'tag:Env': ['prod']}
+               for _, params in router.requests)
+    # Registros com __slots__, não os dicts da resposta
+    assert not hasattr(instances[0], '__dict__')
+    assert (instances[0].tags, instances[0].name, instances[0].launch_time.year) == ((('Env', 'prod'),), 'N/A', 2026)
+
+
+def peak(client, pages, page, materialize=False):
+    """Pico de memória (bytes) para percorrer `pages` páginas de `page` instâncias."""
+    tracemalloc.start()
+    try:
+        instances = collectors.iter_ec2_instances(client, page_size=page)
+        kept = list(instances) if materialize else None
+        count = len(kept) if materialize else sum(1 for _ in instances)
+        assert count == pages * page
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_peak_memory_does_not_grow_with_pages():
+    page = 100
+    small, _ = ec2_client(ec2_fleet(2 * page), page)
+    large, _ = ec2_client(ec2_fleet(8 * page), page)
+    # Aquece o cliente: o modelo do serviço e os parsers são carregados na primeira chamada
+    list(collectors.iter_ec2_instances(small, page_size=page))
+    list(collectors.iter_ec2_instances(large, page_size=page))
+
+    streaming = peak(large, 8, page)
+
+    assert streaming < peak(small, 2, page) * 1.25
+    # A medida distingue: guardar a lista inteira passa do pico de uma página
+    assert peak(large, 8, page, materialize=True) > streaming * 1.5
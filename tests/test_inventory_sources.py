@@ -0,0 +1,77 @@
+"""--source direct e --source aggregator geram o mesmo inventário, com os mesmos filtros."""
+
+import csv
+import os
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from aws_standin import FleetSpec, StandInAWS  # noqa: E402
+from benchmark_suite import install_config, run_suite  # noqa: E402
+
+OUTPUTS = 'inventory,missing'
+
+
+def scan_step(name, *args):
+    return (name, 'scan', (['--only', OUTPUTS, *args],), None)
+
+
+def read_rows(data_dir, name):
+    with open(os.path.join(data_dir, name), newline='') as f:
+        return list(csv.reader(f))[1:]
+
+
+def run_both(aws, data_dir, **settings):
+    config = install_config(aws, data_dir)
+    for key, value in settings.items():
+        setattr(config, key, value)
+    direct = run_suite(aws, data_dir, [scan_step('direct')])['direct']
+    inventory = read_rows(data_dir, 'ec2-inventory.csv')
+    aggregated = run_suite(aws, data_dir, [scan_step('aggregator', '--source', 'aggregator')])['aggregator']
+    assert direct['error'] is None and aggregated['error'] is None, (direct['output'], aggregated['output'])
+    return direct, aggregated, inventory
+
+
+@pytest.fixture
+def aws():
+    fleet = StandInAWS(FleetSpec(2, 2, 40))
+    # Metade das instâncias de cada par com Env=prod, o resto com Env=dev
+    for instances in fleet.instances.values():
+        for n, instance in enumerate(instances):
+            instance['Tags'].append({'Key': 'Env', 'Value': 'prod' if n % 2 else 'dev'})
+    return fleet
+
+
+def test_same_csvs_without_filters(aws, tmp_path):
+    direct, aggregated, inventory = run_both(aws, str(tmp_path))
+    assert len(inventory) == 2 * 2 * 40
+    assert aggregated['csv'] == direct['csv']
+
+
+def test_same_csvs_with_state_and_tag_filters(aws, tmp_path):
+    direct, aggregated, inventory = run_both(aws, str(tmp_path), INVENTORY_STATES=['running'],
+                                             INSTANCE_TAG_FILTERS={'Env': ['prod']})
+    expected = sum(1 for instances in aws.instances.values() for n, instance in enumerate(instances)
+                   if n % 2 and instance['State']['Name'] == 'running')
+    assert 0 < len(inventory) == expected
+    assert aggregated['csv'] == direct['csv']
+
+
+def test_wildcard_tag_values_filtered_locally(aws, tmp_path):
+    direct, aggregated, _ = run_both(aws, str(tmp_path), INSTANCE_TAG_FILTERS={'Name': ['ok-*']})
+    inventory = read_rows(str(tmp_path), 'ec2-inventory.csv')
+    assert inventory and all(row[3].startswith('ok-') for row in inventory)
+    assert aggregated['csv']['ec2-inventory.csv'] == direct['csv']['ec2-inventory.csv']
+
+
+def test_aggregator_stops_when_no_profile_has_a_known_account(aws, tmp_path, monkeypatch):
+    monkeypatch.setenv('AWS_CONFIG_FILE', str(tmp_path / 'aws-config'))
+    config = install_config(aws, str(tmp_path))
+    config.AGGREGATOR_ACCOUNTS = {}
+
+    result = run_suite(aws, str(tmp_path), [scan_step('aggregator', '--source', 'aggregator')])['aggregator']
+
+    assert result['error'] == 'SystemExit(1)'
+    assert 'AGGREGATOR_ACCOUNTS' in result['output'] and 'account000' in result['output']
+    assert not result['csv']
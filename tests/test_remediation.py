@@ -0,0 +1,118 @@
+"""enable_ssm.py só anexa a policy SSM onde o attach resolve (remediation.py)."""
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from aws_standin import SSM_POLICY, FleetSpec, StandInAWS  # noqa: E402
+from remediation import DEFAULT_PROFILE_NAME, AccountPlan, Remediator, build_plan  # noqa: E402
+from snapshot import InventoryRecord  # noqa: E402
+
+PROFILE = 'account000'
+REGION = 'region-0'
+
+
+@pytest.fixture
+def aws():
+    fleet = StandInAWS(FleetSpec(1, 1, 10), propagation=0)
+    iam = fleet.iam[PROFILE]
+    # app-legacy-0: boundary sem SSM; app-legacy-1: Deny inline; app-extra: só falta a policy
+    iam['policies']['NoSsmBoundary'] = {'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Allow', 'Action': 's3:*', 'Resource': '*'}]}
+    iam['boundaries']['app-legacy-0'] = f"arn:aws:iam::{iam['account_id']}:policy/NoSsmBoundary"
+    iam['inline']['app-legacy-1'] = {'DenySessions': {'Version': '2012-10-17', 'Statement': [
+        {'Effect': 'Deny', 'Action': 'ssmmessages:*', 'Resource': '*'}]}}
+    iam['roles']['app-extra'] = ['AmazonS3ReadOnlyAccess']
+    return fleet
+
+
+def run(aws, roles):
+    plan = AccountPlan(PROFILE)
+    for n, role_name in enumerate(roles):
+        plan.attach[role_name] = [(REGION, f"i-{n:017x}")]
+
+    def client_fn(profile, region, service):
+        return aws.session(profile).client(service, region_name=region)
+
+    return {action.target: action for action in Remediator(client_fn, sleep=lambda delay: None).run({PROFILE: plan})}
+
+
+def test_roles_an_attach_cannot_fix_are_skipped(aws):
+    actions = run(aws, ['app-legacy-0', 'app-legacy-1', 'app-extra'])
+
+    assert actions['app-legacy-0'].kind == 'skip' and 'NoSsmBoundary' in actions['app-legacy-0'].detail
+    assert actions['app-legacy-1'].kind == 'skip' and 'ssmmessages:' in actions['app-legacy-1'].detail
+    assert actions['app-extra'].kind == 'attach' and actions['app-extra'].ok
+    roles = aws.iam[PROFILE]['roles']
+    assert SSM_POLICY not in roles['app-legacy-0'] and SSM_POLICY not in roles['app-legacy-1']
+    assert SSM_POLICY in roles['app-extra']
+
+
+def test_compliant_role_is_not_attached_again(aws):
+    run(aws, ['app-extra'])
+    attached = aws.calls['iam:AttachRolePolicy']
+
+    action = run(aws, ['app-extra'])['app-extra']
+
+    assert action.ok and action.detail
+    assert aws.calls['iam:AttachRolePolicy'] == attached
+
+
+def record(profile, region, instance_id, iam_role, state='running', ssm_status='NO_SSM'):
+    return InventoryRecord(profile, region, instance_id, f"name-{instance_id}", state, iam_role, ssm_status)
+
+
+def test_plan_lists_each_role_once_per_account():
+    records = [
+        record('a', 'r1', 'i-1', 'NO_ROLE'),
+        record('a', 'r2', 'i-2', 'NO_ROLE'),
+        record('a', 'r1', 'i-3', 'app'),
+        record('a', 'r2', 'i-4', 'app'),
+        record('b', 'r1', 'i-5', 'app'),
+        record('a', 'r1', 'i-6', 'app', state='stopped'),
+        record('a', 'r1', 'i-7', 'ERROR_ROLE'),
+        record('a', 'r1', 'i-8', 'NO_ROLE', ssm_status='OK'),
+    ]
+
+    plans, skipped = build_plan(records)
+
+    assert list(plans) == ['a', 'b']
+    assert plans['a'].associate == [('r1', 'i-1', 'name-i-1'), ('r2', 'i-2', 'name-i-2')]
+    assert plans['a'].attach == {'app': [('r1', 'i-3'), ('r2', 'i-4')]}
+    assert plans['b'].attach == {'app': [('r1', 'i-5')]} and not plans['b'].associate
+    assert [r.instance_id for r, _ in skipped] == ['i-6', 'i-7']
+
+
+def test_fleet_is_fixed_with_one_shared_profile_per_account():
+    aws = StandInAWS(FleetSpec(2, 2, 30), propagation=2)
+    records = []
+    for (profile, region), instances in aws.instances.items():
+        for instance in instances:
+            arn = instance.get('IamInstanceProfile', {}).get('Arn', '')
+            if instance['State']['Name'] == 'running' and 'app-ok' not in arn:
+                records.append(record(profile, region, instance['InstanceId'],
+                                      arn.split('/')[-1] if arn else 'NO_ROLE'))
+    no_role = [r for r in records if r.iam_role == 'NO_ROLE']
+    roles = {(r.profile, r.iam_role) for r in records if r.iam_role != 'NO_ROLE'}
+    assert no_role and roles
+
+    def client_fn(profile, region, service):
+        return aws.session(profile).client(service, region_name=region)
+
+    waited = []
+    plans, _ = build_plan(records)
+    actions = list(Remediator(client_fn, sleep=waited.append).run(plans))
+
+    assert all(action.ok for action in actions), [action.detail for action in actions if not action.ok]
+    assert sorted(a.instance_id for a in actions if a.kind == 'associate') == \
+        sorted(r.instance_id for r in no_role)
+    accounts = len(aws.spec.profiles)
+    # Uma role e um instance profile por conta; cada role existente recebe a policy uma vez
+    assert aws.calls['iam:CreateRole'] == aws.calls['iam:CreateInstanceProfile'] == accounts
+    assert aws.calls['iam:AttachRolePolicy'] == accounts + len(roles)
+    # Uma associação por instância, mais as recusadas enquanto o instance profile propaga
+    assert aws.calls['ec2:AssociateIamInstanceProfile'] == len(no_role) + 2 * accounts
+    assert len(waited) == 2 * accounts
+    for r in no_role:
+        instance = next(i for i in aws.instances[(r.profile, r.region)] if i['InstanceId'] == r.instance_id)
+        assert instance['IamInstanceProfile']['Arn'].endswith(f"/{DEFAULT_PROFILE_NAME}")
@@ -0,0 +1,136 @@
+"""run_command.py envia em lote e devolve um resultado por instância, com poucas chamadas por região."""
+
+import json
+from collections import Counter
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from aws_responses import REGION, Router, json_error, paged, session  # noqa: E402
+from run_command import BATCH_SIZE, NO_INVOCATION, SEND_FAILED, Dispatcher, Target, group_targets  # noqa: E402
+
+REGIONS = [REGION, 'us-west-2']
+DOCUMENT = {'DocumentName': 'AWS-RunShellScript'}
+
+
+class SsmCommands:
+    """
+    Run Command de uma região: cada comando termina depois de `rounds` consultas
+    a list_commands; instâncias cujo id termina em 7 falham.
+    """
+
+    def __init__(self, rounds=2, fail_send=False):
+        self.rounds = rounds
+        self.fail_send = fail_send
+        self.commands = {}
+        self.router = Router({
+            'SendCommand': self.send_command,
+            'ListCommands': self.list_commands,
+            'ListCommandInvocations': self.list_command_invocations,
+        })
+
+    def status(self, command_id):
+        return 'Success' if self.commands[command_id]['polls'] >= self.rounds else 'InProgress'
+
+    def send_command(self, params):
+        if self.fail_send:
+            return 400, json_error('AccessDeniedException')
+        command_id = f"{len(self.commands):08x}-0000-4000-8000-000000000000"
+        self.commands[command_id] = {'instances': params['InstanceIds'], 'polls': 0}
+        return 200, json.dumps({'Command': {'CommandId': command_id, 'Status': 'Pending'}}).encode()
+
+    def list_commands(self, params):
+        if not params.get('NextToken'):
+            for command in self.commands.values():
+                command['polls'] += 1
+        items, token = paged([{'CommandId': command_id, 'Status': self.status(command_id)}
+                              for command_id in self.commands], params, params['MaxResults'])
+        return 200, json.dumps(dict({'Commands': items}, **({'NextToken': token} if token else {}))).encode()
+
+    def list_command_invocations(self, params):
+        command_id = params['CommandId']
+        status = self.status(command_id)
+        invocations = [{'InstanceId': instance_id, 'CommandId': command_id,
+                        'Status': 'Failed' if status == 'Success' and instance_id.endswith('7') else status}
+                       for instance_id in self.commands[command_id]['instances']]
+        items, token = paged(invocations, params, params['MaxResults'])
+        return 200, json.dumps(dict({'CommandInvocations': items},
+                                    **({'NextToken': token} if token else {}))).encode()
+
+
+def dispatcher(regions):
+    """Dispatcher com um cliente SSM por (profile, região), respondido pelo SsmCommands da região."""
+    clients = {}
+
+    def client_fn(profile, region, service):
+        key = (profile, region)
+        if key not in clients:
+            clients[key] = session(regions[key].router).client(service, region_name=region)
+        return clients[key]
+
+    return Dispatcher(client_fn, poll_interval=0, sleep=lambda seconds: None)
+
+
+def fleet(profiles, instances):
+    return [Target(profile, region, 'Windows' if n % 4 == 0 else 'Linux', f"i-{p:04x}{n:013x}")
+            for p, profile in enumerate(profiles) for region in REGIONS for n in range(instances)]
+
+
+def test_every_target_gets_one_result_with_batched_calls():
+    profiles = ['account000', 'account001']
+    targets = fleet(profiles, 130)
+    regions = {(profile, region): SsmCommands() for profile in profiles for region in REGIONS}
+    runner = dispatcher(regions)
+
+    # Alvos repetidos viram uma instância só
+    dispatches, results = runner.send(group_targets(targets + targets[:10]), lambda platform: DOCUMENT)
+    results.extend(runner.track(dispatches))
+
+    assert sorted(result.instance_id for result in results) == sorted(target.instance_id for target in targets)
+    statuses = Counter(result.status for result in results)
+    failed = sum(1 for target in targets if target.instance_id.endswith('7'))
+    assert statuses == {'Success': len(targets) - failed, 'Failed': failed}
+    for commands in regions.values():
+        calls = commands.router.calls
+        # Por região: 33 Windows e 97 Linux -> 1 + 2 lotes; uma listagem por rodada até concluir
+        assert calls['SendCommand'] == 3 == len(commands.commands)
+        assert calls['ListCommands'] == commands.rounds
+        assert calls['ListCommandInvocations'] == len(commands.commands)
+        assert all(len(command['instances']) <= BATCH_SIZE for command in commands.commands.values())
+
+
+def test_failed_sends_and_unsupported_platforms_are_reported_per_instance():
+    targets = fleet(['account000'], 8)
+    regions = {('account000', REGION): SsmCommands(fail_send=True), ('account000', 'us-west-2'): SsmCommands()}
+    runner = dispatcher(regions)
+
+    dispatches, results = runner.send(group_targets(targets),
+                                      lambda platform: DOCUMENT if platform == 'Linux' else None)
+    results.extend(runner.track(dispatches))
+
+    by_instance = {(result.region, result.instance_id): result for result in results}
+    assert len(by_instance) == len(results) == len(targets)
+    for target in targets:
+        result = by_instance[(target.region, target.instance_id)]
+        if target.platform == 'Windows':
+            assert (result.status, result.detail) == (SEND_FAILED, "plataforma não suportada")
+        elif target.region == REGION:
+            assert result.status == SEND_FAILED and 'AccessDenied' in result.detail
+        else:
+            assert result.status in ('Success', 'Failed')
+    assert regions[('account000', REGION)].router.calls['ListCommands'] == 0
+
+
+def test_instances_without_invocation_are_reported():
+    targets = fleet(['account000'], 3)[:3]
+    commands = SsmCommands(rounds=1)
+    runner = dispatcher({('account000', REGION): commands})
+    dispatches, _ = runner.send(group_targets(targets), lambda platform: DOCUMENT)
+    # O SSM só registra a invocação da primeira instância de cada comando
+    for command in commands.commands.values():
+        command['instances'] = command['instances'][:1]
+
+    results = list(runner.track(dispatches))
+
+    assert sorted(result.status for result in results) == sorted(['Success', 'Success', NO_INVOCATION])
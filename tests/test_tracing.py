@@ -0,0 +1,67 @@
+"""Trace do tracing.py num cliente botocore de verdade, sem rede."""
+
+import json
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from botocore.exceptions import ClientError, EndpointConnectionError  # noqa: E402
+
+import aws_retry  # noqa: E402
+from aws_responses import PROFILE, ROLE, error, iam_client  # noqa: E402
+from tracing import Tracer  # noqa: E402
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    tracer = Tracer(path=str(tmp_path / 'trace.jsonl'), script='test')
+    yield tracer
+    tracer.close()
+
+
+def calls(tracer):
+    tracer.close()
+    with open(tracer.path) as f:
+        return [event for event in map(json.loads, f) if event['type'] == 'call']
+
+
+def test_call_with_retries_is_one_line(tracer, monkeypatch):
+    monkeypatch.setattr(aws_retry.random, 'uniform', lambda low, high: 0.0)
+    iam, _ = iam_client(aws_retry.AdaptiveRetry(), tracer, (400, error('Throttling')), (200, ROLE))
+
+    iam.get_role(RoleName='app')
+
+    [call] = calls(tracer)
+    assert (call['profile'], call['service'], call['operation']) == (PROFILE, 'iam', 'GetRole')
+    assert call['region'] == iam.meta.region_name
+    assert (call['attempts'], call['throttles'], call['status'], call['error']) == (2, 1, 200, None)
+    assert call['request_bytes'] > 0 and call['response_bytes'] == len(ROLE)
+    stats = tracer.calls[('iam', 'GetRole')]
+    assert (stats.count, stats.retries, stats.throttles, stats.errors) == (1, 1, 1, 0)
+
+
+def test_api_error_is_recorded(tracer):
+    iam, _ = iam_client(None, tracer, (404, error('NoSuchEntity')))
+
+    with pytest.raises(ClientError):
+        iam.get_role(RoleName='missing')
+
+    [call] = calls(tracer)
+    assert (call['operation'], call['status'], call['error']) == ('GetRole', 404, 'NoSuchEntity')
+    assert tracer.calls[('iam', 'GetRole')].errors == 1
+
+
+def test_connection_error_is_recorded(tracer, monkeypatch):
+    monkeypatch.setattr(aws_retry.random, 'uniform', lambda low, high: 0.0)
+    failure = EndpointConnectionError(endpoint_url='https://iam.amazonaws.com')
+    iam, responder = iam_client(aws_retry.AdaptiveRetry(max_attempts=2), tracer, failure)
+
+    with pytest.raises(EndpointConnectionError):
+        iam.get_role(RoleName='app')
+
+    [call] = calls(tracer)
+    assert responder.sent == 2
+    assert (call['operation'], call['attempts'], call['status'], call['error']) == \
+        ('GetRole', 2, None, 'EndpointConnectionError')
+    assert tracer.calls[('iam', 'GetRole')].errors == 1
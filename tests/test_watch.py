@@ -0,0 +1,144 @@
+"""watch.py: eventos repetidos, fora de ordem ou que falham, e instâncias ainda não buscadas."""
+
+import importlib
+import json
+import sys
+import types
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from aws_responses import (ACCOUNT_ID, PROFILE, REGION, Router, ec2_instance, ec2_instances_page,  # noqa: E402
+                           ec2_params_filters, instance_profile_arn, session)
+
+INSTANCE_ID = 'i-00000000000000001'
+
+
+@pytest.fixture(scope='module')
+def watch():
+    config = types.ModuleType('config')
+    config.PROFILES = [PROFILE]
+    config.REGIONS = [REGION]
+    config.SSM_POLICIES = ['AmazonSSMManagedInstanceCore']
+    sys.modules.setdefault('config', config)
+    return importlib.import_module('watch')
+
+
+def state_event(event_id, state, time='2026-10-18T12:00:00Z'):
+    return json.dumps({'id': event_id, 'detail-type': 'EC2 Instance State-change Notification',
+                       'account': ACCOUNT_ID, 'region': REGION, 'time': time,
+                       'detail': {'instance-id': INSTANCE_ID, 'state': state}})
+
+
+def ssm_event(event_id, name, time):
+    return json.dumps({'id': event_id, 'detail-type': 'AWS API Call via CloudTrail', 'account': ACCOUNT_ID,
+                       'region': REGION, 'time': time,
+                       'detail': {'eventName': name, 'requestParameters': {'instanceId': INSTANCE_ID}}})
+
+
+def make_watcher(watch, client_fn=None):
+    watcher = watch.Watcher(client_fn, [PROFILE], [REGION], queue_url='https://sqs.us-east-1.amazonaws.com/1/q',
+                            log=lambda line: None)
+    watcher.accounts[ACCOUNT_ID] = PROFILE
+    return watcher
+
+
+def ec2_client_fn(instances):
+    def describe_instances(params):
+        wanted = ec2_params_filters(params).get('instance-id', [])
+        return 200, ec2_instances_page([i for i in instances if i['InstanceId'] in wanted])
+
+    router = Router({'DescribeInstances': describe_instances})
+    return lambda profile, region, service: session(router).client(service, region_name=region)
+
+
+def test_failed_event_is_applied_when_redelivered(watch, monkeypatch):
+    watcher = make_watcher(watch)
+    apply = watcher.model.apply
+    failures = iter([RuntimeError('falhou')])
+
+    def flaky_apply(*args):
+        for error in failures:
+            raise error
+        return apply(*args)
+
+    monkeypatch.setattr(watcher.model, 'apply', flaky_apply)
+    body = state_event('e-1', 'running')
+
+    with pytest.raises(RuntimeError):
+        watcher.handle(body)
+    watcher.handle(body)
+    watcher.handle(body)
+
+    assert (watcher.stats['refresh'], watcher.stats['duplicates']) == (1, 1)
+    assert watcher.model.missing_ids() == {(PROFILE, REGION): {INSTANCE_ID}}
+
+
+def test_failed_message_stays_in_the_queue(watch):
+    watcher = make_watcher(watch)
+    deleted = []
+
+    class Queue:
+        def receive_message(self, **kwargs):
+            watcher.stop()
+            return {'Messages': [{'Body': state_event('e-1', 'running'), 'ReceiptHandle': 'ok'},
+                                 {'Body': json.dumps(['não é um evento']), 'ReceiptHandle': 'falhou'}]}
+
+        def delete_message_batch(self, QueueUrl, Entries):
+            deleted.extend(entry['ReceiptHandle'] for entry in Entries)
+
+    watcher.client_fn = lambda profile, region, service: Queue()
+    watcher.consume()
+
+    assert deleted == ['ok']
+    assert (watcher.stats['refresh'], watcher.stats['failed']) == (1, 1)
+
+
+def test_instance_is_left_out_until_fetched(watch):
+    watcher = make_watcher(watch)
+    watcher.handle(state_event('e-1', 'running'))
+
+    assert watcher.model.totals()['missing'] == 1
+    assert watcher.model.missing_rows() == []
+
+    def unavailable(profile, region, service):
+        raise RuntimeError('sem rede')
+
+    watcher.client_fn = unavailable
+    watcher.refresh_pending()
+
+    assert watcher.model.missing_rows() == []
+    assert watcher.pending_refresh() == 1
+
+    watcher.client_fn = ec2_client_fn([ec2_instance(INSTANCE_ID, name='web-1',
+                                                    instance_profile_arn=instance_profile_arn('app'))])
+    watcher.refresh_pending()
+
+    assert watcher.model.missing_rows() == [[PROFILE, REGION, INSTANCE_ID, 'web-1', 'Yes']]
+    assert watcher.pending_refresh() == 0
+
+
+def test_reconciliation_fills_in_an_unfetched_instance(watch):
+    watcher = make_watcher(watch)
+    watcher.handle(state_event('e-1', 'running'))
+
+    watcher.model.replace(PROFILE, REGION, {INSTANCE_ID: ('web-1', 'No')}, {}, since=0)
+
+    assert watcher.model.missing_rows() == [[PROFILE, REGION, INSTANCE_ID, 'web-1', 'No']]
+
+
+@pytest.mark.parametrize('events, in_ssm', [
+    ([('Update', '12:00'), ('Deregister', '11:00')], True),
+    ([('Deregister', '12:00'), ('Update', '11:00')], False),
+])
+def test_out_of_order_ssm_event_is_stale(watch, events, in_ssm):
+    watcher = make_watcher(watch)
+    watcher.handle(state_event('e-0', 'running'))
+    names = {'Update': 'UpdateInstanceInformation', 'Deregister': 'DeregisterManagedInstance'}
+
+    for n, (name, time) in enumerate(events, 1):
+        watcher.handle(ssm_event(f"e-{n}", names[name], f"2026-10-18T{time}:00Z"))
+
+    assert watcher.stats['stale'] == 1
+    assert (INSTANCE_ID in watcher.model.missing_ids()[(PROFILE, REGION)]) is not in_ssm